@@ -40,6 +40,7 @@ interface KPI {
 }
 
 interface SupervisorStats {
+    employeeId: string | null;
     fast: number;
     slow5: number;
     slow10: number;
@@ -71,6 +72,8 @@ export default function FatigueValidationDashboard() {
     const [month, setMonth] = useState<string>("all");
     const [shift, setShift] = useState<string>("all");
     const [supervisor, setSupervisor] = useState<string>("all");
+    // Employee the selected supervisor name was resolved to at ingest, if any
+    const [supervisorId, setSupervisorId] = useState<string | null>(null);
 
     // Link Sync State
     const [linkUrl, setLinkUrl] = useState("");
@@ -79,13 +82,14 @@ export default function FatigueValidationDashboard() {
 
     // Fetch Data
     const { data, isLoading, refetch } = useQuery<FatigueSummary>({
-        queryKey: ["fatigue-summary", week, month, shift, supervisor],
+        queryKey: ["fatigue-summary", week, month, shift, supervisor, supervisorId],
         queryFn: async () => {
             const params = new URLSearchParams();
             if (week !== "all") params.append("week", week);
             if (month !== "all") params.append("month", month);
             if (shift !== "all") params.append("shift", shift);
-            if (supervisor !== "all") params.append("supervisor", supervisor);
+            if (supervisorId) params.append("supervisorId", supervisorId);
+            else if (supervisor !== "all") params.append("supervisor", supervisor);
 
             const res = await fetch(`/api/fms/fatigue/summary?${params}`);
             if (!res.ok) throw new Error("Failed to fetch summary");
@@ -201,7 +205,10 @@ export default function FatigueValidationDashboard() {
                     </div>
 
                     {/* Supervisor */}
-                    <Select value={supervisor} onValueChange={setSupervisor}>
+                    <Select value={supervisor} onValueChange={(sup) => {
+                        setSupervisor(sup);
+                        setSupervisorId(data?.supervisorLeaderboard[sup]?.employeeId ?? null);
+                    }}>
                         <SelectTrigger className="h-10 bg-white border-slate-200/80 rounded-xl text-xs font-semibold text-slate-600 min-w-[180px] shadow-sm hover:border-indigo-300 transition-colors focus:ring-2 focus:ring-indigo-100">
                             <SelectValue placeholder="All Supervisors" />
                         </SelectTrigger>
@@ -246,6 +253,7 @@ export default function FatigueValidationDashboard() {
                             className="text-slate-400 hover:text-red-500 hover:bg-red-50 rounded-lg text-xs"
                             onClick={() => {
                                 setSupervisor("all");
+                                setSupervisorId(null);
                                 setWeek("all");
                                 setShift("all");
                             }}
@@ -0,0 +1,2 @@
+# The .txt files at the root are logs, not doctests
+collect_ignore_glob = ["*.txt"]
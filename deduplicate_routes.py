@@ -2,10 +2,90 @@
 """
 Script to remove duplicate route definitions from routes.ts
 Keeps the first occurrence of each route and removes duplicates.
+
+The file is read in one pass by a small TypeScript tokenizer (strings, template
+literals, regex literals and comments are skipped as units, so braces inside them
+don't matter) that builds an index of every app.METHOD("path", ...) call with its
+offsets and a hash of its handler. From the index:
+
+  - duplicate: same method and path as an earlier route (parameter names, case,
+    repeated and trailing slashes ignored); Express only ever runs the first one.
+    Duplicates with an identical handler are reported as "exact".
+  - shadowed: an earlier route with parameters or a wildcard also matches this
+    path (e.g. GET /api/items/:id registered before GET /api/items/export).
+    Reported only: the earlier handler may call next().
+
+Duplicates are removed by cutting their offsets out of the original text.
+
+Usage:
+  python deduplicate_routes.py                    # dedupe server/routes.ts in place
+  python deduplicate_routes.py --check            # report only; exit 1 if there are duplicates (pre-commit)
+  python deduplicate_routes.py --report dup.json  # also write the JSON report ('-' for stdout)
 """
 
+import argparse
+import bisect
+import hashlib
+import json
 import re
 import sys
+import time
+
+ROUTE_TAIL = r"pp\s*\.\s*(?P<method>get|post|put|delete|patch|all)\s*\("
+
+def token_pattern(brackets, routes):
+    """Pattern for the next token that matters, skipping the text before it in one regex step.
+
+    Only the brackets the innermost open construct is waiting for are tokens: none at the
+    top level, '()' inside a route call, '{}' inside a template substitution. Order of the
+    alternatives matters: comments before the lone slash.
+    """
+    special = "/'\"`" + brackets + ('a' if routes else '')
+    gap = f"[^{re.escape(special)}]*"
+    if routes:
+        # 'a' only starts a token as the 'a' of a standalone app.METHOD(
+        gap += f"(?:(?:\\Ba|a(?!{ROUTE_TAIL.replace('?P<method>', '?:')})){gap})*"
+    alternatives = [
+        r"(?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))",
+        r"""(?P<string>'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*")""",
+        r"(?P<template>`)",
+        r"(?P<slash>/)",
+    ]
+    if routes:
+        alternatives.append(f"(?P<route>a{ROUTE_TAIL})")
+    if brackets:
+        alternatives += [f"(?P<open>{re.escape(brackets[0])})", f"(?P<close>{re.escape(brackets[1])})"]
+    # Anything else (e.g. a quote that opens no valid string) is stepped over
+    alternatives.append(r"(?P<other>.)")
+    return re.compile(gap + "(?:" + "|".join(alternatives) + ")", re.S)
+
+TOP_LEVEL = token_pattern('', routes=True)
+IN_CALL = token_pattern('()', routes=False)
+IN_SUBSTITUTION = token_pattern('{}', routes=False)
+
+# Rest of a template literal after '`' or after the '}' closing a ${...}
+TEMPLATE_REST = re.compile(r"(?:[^`\\$]|\\.|\$(?!\{))*(`|\$\{|\Z)", re.S)
+REGEX_LITERAL = re.compile(r"/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*")
+# A plain string (or substitution-free template) as the first argument of a route call
+PATH_ARG = re.compile(r"""\s*(?:"((?:[^"\\\n]|\\.)*)"|'((?:[^'\\\n]|\\.)*)'|`([^`$\\]*)`)""")
+# The ';' after a route call, and the line break when nothing else follows on the line
+STATEMENT_END = re.compile(r"[ \t]*;?(?:[ \t]*(?:\r?\n|\Z))?")
+
+# After one of these, a '/' starts a regex literal rather than a division
+REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete',
+                  'void', 'throw', 'instanceof', 'yield', 'await'}
+IDENT_TAIL = re.compile(r"[A-Za-z_$][\w$]*$")
+
+def regex_allowed(src, pos):
+    """Whether a '/' at pos starts a regex literal, judged from the preceding token."""
+    j = pos - 1
+    while j >= 0 and src[j] in ' \t\r\n':
+        j -= 1
+    if j < 0 or src[j] in REGEX_PRECEDERS:
+        return True
+    word = IDENT_TAIL.search(src, max(0, j - 15), j + 1)
+    return bool(word) and word.group() in REGEX_KEYWORDS
 
 def normalize_path(path):
     """Normalize route path for comparison."""
@@ -13,89 +93,213 @@ def normalize_path(path):
     path = path.replace('\\', '/')
     # Remove multiple slashes
     path = re.sub(r'/+', '/', path)
-    return path
-
-def extract_route_signature(line):
-    """Extract route method and path for comparison."""
-    # Match: app.METHOD("PATH" or `PATH` or 'PATH')
-    match = re.match(r'\s*app\.(get|post|put|delete|patch)\s*\(\s*["\'\`]([^"\'\`]+)["\'\`]', line)
-    if match:
-        method = match.group(1)
-        path = normalize_path(match.group(2))
-        return f"{method}:{path}"
-    return None
-
-def deduplicate_routes(input_file, output_file):
-    """Remove duplicate route definitions."""
-
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+    # Express matches case-insensitively and ignores a trailing slash
+    if len(path) > 1:
+        path = path.rstrip('/')
+    # Parameter names don't change what a route matches
+    return re.sub(r':\w+', ':', path.lower())
+
+def body_hash(text):
+    return hashlib.sha1(' '.join(text.split()).encode('utf-8')).hexdigest()[:16]
+
+def scan_routes(src):
+    """Tokenize src once and return the route index, in source order.
 
-    lines = content.split('\n')
-
-    seen_routes = {}  # signature -> first line number
-    output_lines = []
-    i = 0
-    total_lines = len(lines)
-    duplicates_removed = 0
-
-    while i < total_lines:
-        line = lines[i]
-
-        # Check if this line starts a route definition
-        route_sig = extract_route_signature(line)
-
-        if route_sig:
-            # This is a route definition
-            if route_sig in seen_routes:
-                # Duplicate found - skip this entire handler block
-                print(f"Line {i+1}: Duplicate {route_sig} (first at line {seen_routes[route_sig]})")
-
-                # Skip until we find the closing }); of this handler
-                brace_count = line.count('{') - line.count('}')
-                i += 1
-
-                # Keep skipping lines until braces are balanced
-                while i < total_lines:
-                    current_line = lines[i]
-                    brace_count += current_line.count('{') - current_line.count('}')
-
-                    # Check if this line ends the handler
-                    if brace_count <= 0 and '});' in current_line:
-                        duplicates_removed += 1
-                        i += 1  # Skip the closing line too
-                        break
-                    i += 1
+    Each route: method, path (as written, None if not a literal), normalized path,
+    start/end offsets of the whole statement, line, and a hash of everything after the path.
+    """
+    routes = []
+    # Open route calls and template substitutions, innermost last: [pattern, depth, route]
+    frames = []
+    pos = 0
+    while True:
+        frame = frames[-1] if frames else None
+        m = (frame[0] if frame else TOP_LEVEL).match(src, pos)
+        if m is None:
+            break
+        kind = m.lastgroup
+        pos = m.end()
+        if kind == 'open':
+            frame[1] += 1
+        elif kind == 'close':
+            if frame[1]:
+                frame[1] -= 1
                 continue
+            frames.pop()
+            if frame[2] is None:
+                pos = skip_template(src, pos, frames)
+            else:
+                frame[2]['call_end'] = pos
+                routes.append(frame[2])
+        elif kind == 'route':
+            route = {'method': m.group('method'), 'start': m.start(kind), 'path': None, 'path_end': pos}
+            arg = PATH_ARG.match(src, pos)
+            if arg:
+                route['path'] = next(g for g in arg.groups() if g is not None)
+                route['path_end'] = pos = arg.end()
+            frames.append([IN_CALL, 0, route])
+        elif kind == 'template':
+            pos = skip_template(src, pos, frames)
+        elif kind == 'slash' and regex_allowed(src, m.start(kind)):
+            literal = REGEX_LITERAL.match(src, m.start(kind))
+            if literal:
+                pos = literal.end()
+        # comments, strings, divisions and stray characters need nothing more
+
+    newlines = [m.start() for m in re.finditer('\n', src)]
+    for route in routes:
+        finish_route(src, route, newlines)
+    return routes
+
+def skip_template(src, pos, frames):
+    """Skip template text from pos; on '${' open a frame so the matching '}' resumes it."""
+    m = TEMPLATE_REST.match(src, pos)
+    if m.group(1) == '${':
+        frames.append([IN_SUBSTITUTION, 0, None])
+    return m.end()
+
+def finish_route(src, route, newlines):
+    """Widen a route call to its whole statement and fill in line, normalized path and hash."""
+    call_end = route.pop('call_end')
+    line_start = src.rfind('\n', 0, route['start']) + 1
+    if not src[line_start:route['start']].strip():
+        route['start'] = line_start
+    route['end'] = STATEMENT_END.match(src, call_end).end()
+    route['line'] = bisect.bisect_left(newlines, route['start']) + 1
+    route['normalized'] = normalize_path(route['path']) if route['path'] is not None else None
+    route['hash'] = body_hash(src[route.pop('path_end'):call_end])
+
+def shadows(pattern, path):
+    """Whether the normalized pattern (with ':' params or '*') matches the literal normalized path."""
+    p, s = pattern.split('/'), path.split('/')
+    for i, seg in enumerate(p):
+        if seg == '*' and i == len(p) - 1:
+            return True
+        if i >= len(s):
+            return False
+        if seg == ':' or seg == '*':
+            # A parameter matches a non-empty literal segment, not another parameter
+            if s[i] in (':', '*', ''):
+                return False
+            continue
+        if seg != s[i]:
+            return False
+    return len(p) == len(s)
+
+def find_duplicates(routes):
+    """Classify routes. Returns (duplicates, shadowed) lists of report entries."""
+    first = {}
+    patterns = {}
+    duplicates, shadowed = [], []
+    for route in routes:
+        if route['normalized'] is None:
+            continue
+        key = (route['method'], route['normalized'])
+        if key in first:
+            original = first[key]
+            duplicates.append(entry(route, original, 'exact' if route['hash'] == original['hash'] else 'duplicate'))
+            continue
+        first[key] = route
+        for method in {route['method'], 'all'}:
+            for earlier in patterns.get(method, ()):
+                if shadows(earlier['normalized'], route['normalized']):
+                    shadowed.append(entry(route, earlier, 'shadowed'))
+                    break
             else:
-                # First occurrence - keep it
-                seen_routes[route_sig] = i + 1
-                output_lines.append(line)
-                i += 1
                 continue
+            break
+        if ':' in route['normalized'] or '*' in route['normalized']:
+            patterns.setdefault(route['method'], []).append(route)
+    return duplicates, shadowed
+
+def entry(route, earlier, kind):
+    return {
+        'kind': kind,
+        'method': route['method'].upper(),
+        'path': route['path'],
+        'line': route['line'],
+        'start': route['start'],
+        'end': route['end'],
+        'hash': route['hash'],
+        'first': {'path': earlier['path'], 'line': earlier['line'], 'hash': earlier['hash']},
+    }
 
-        # Not a route definition, keep the line
-        output_lines.append(line)
-        i += 1
+def remove_ranges(src, ranges):
+    """src without the given (start, end) ranges."""
+    out, pos = [], 0
+    for start, end in sorted(ranges):
+        out.append(src[pos:start])
+        pos = max(pos, end)
+    out.append(src[pos:])
+    return ''.join(out)
 
-    # Write cleaned file
-    output_content = '\n'.join(output_lines)
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(output_content)
+def deduplicate_routes(input_file, output_file, check=False):
+    """Remove duplicate route definitions. Returns the JSON report dict."""
+    started = time.perf_counter()
+    with open(input_file, 'r', encoding='utf-8', newline='') as f:
+        content = f.read()
+
+    routes = scan_routes(content)
+    duplicates, shadowed = find_duplicates(routes)
+
+    for d in duplicates + shadowed:
+        print(f"Line {d['line']}: {d['kind'].capitalize()} {d['method']} {d['path']} "
+              f"(first at line {d['first']['line']}{'' if d['kind'] != 'shadowed' else ' ' + d['first']['path']})")
+
+    cleaned = remove_ranges(content, [(d['start'], d['end']) for d in duplicates])
+    total_lines = content.count('\n') + 1
+    cleaned_lines = cleaned.count('\n') + 1
+    if duplicates and not check:
+        with open(output_file, 'w', encoding='utf-8', newline='') as f:
+            f.write(cleaned)
 
-    print(f"\n[OK] Analysis complete:")
-    print(f"  - Found {len(seen_routes)} unique routes")
-    print(f"  - Removed {duplicates_removed} duplicate route handlers")
+    print("\n[OK] Analysis complete:")
+    print(f"  - Found {len(routes)} routes, {len({(r['method'], r['normalized']) for r in routes})} unique")
+    print(f"  - {'Found' if check else 'Removed'} {len(duplicates)} duplicate route handlers "
+          f"({sum(d['kind'] == 'exact' for d in duplicates)} exact)")
+    print(f"  - Shadowed by an earlier pattern: {len(shadowed)}")
     print(f"  - Original: {total_lines} lines")
-    print(f"  - Cleaned: {len(output_lines)} lines")
-    print(f"  - Reduction: {total_lines - len(output_lines)} lines ({((total_lines - len(output_lines))/total_lines*100):.1f}%)")
+    print(f"  - Cleaned: {cleaned_lines} lines")
+    print(f"  - Reduction: {total_lines - cleaned_lines} lines ({(total_lines - cleaned_lines) / total_lines * 100:.1f}%)")
+
+    return {
+        'file': input_file,
+        'routes': len(routes),
+        'dynamic_paths': sum(r['path'] is None for r in routes),
+        'duplicates': duplicates,
+        'shadowed': shadowed,
+        'lines_removed': total_lines - cleaned_lines if duplicates else 0,
+        'written': bool(duplicates) and not check,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
 
 if __name__ == "__main__":
-    input_file = "server/routes.ts"
-    output_file = "server/routes.ts"
+    parser = argparse.ArgumentParser(description="Remove duplicate Express route definitions")
+    parser.add_argument("input", nargs='?', default="server/routes.ts", help="routes file (default server/routes.ts)")
+    parser.add_argument("--output", help="write the cleaned file here instead of in place")
+    parser.add_argument("--check", action="store_true",
+                        help="don't write anything; exit 1 if duplicates are found (for pre-commit)")
+    parser.add_argument("--report", metavar="PATH", help="write the JSON report to PATH ('-' for stdout)")
+    args = parser.parse_args()
+
+    input_file = args.input
+    output_file = args.output or args.input
 
+    if args.report == '-':
+        # Keep stdout for the JSON
+        sys.stdout = sys.stderr
     print("Starting route deduplication...")
     print("=" * 60)
-    deduplicate_routes(input_file, output_file)
+    report = deduplicate_routes(input_file, output_file, check=args.check)
     print("=" * 60)
     print("[OK] Done!")
+
+    if args.report:
+        body = json.dumps(report, indent=2)
+        if args.report == '-':
+            sys.__stdout__.write(body + '\n')
+        else:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                f.write(body)
+    if args.check and report['duplicates']:
+        sys.exit(1)
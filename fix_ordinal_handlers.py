@@ -1,108 +1,214 @@
 #!/usr/bin/env python3
 """
-Script to fix all SIDAK POST record handlers to auto-generate ordinal field
+Script to make all SIDAK record insert handlers number their records atomically
+
+Handlers used to load every record of the session to compute `existing.length + 1`,
+which costs a full read per insert and hands out duplicate ordinals under concurrent
+inserts. They are rewritten to take the ordinal from the INSERT itself:
+
+  withOrdinalRetry(() => storage.createX({ ...validatedData, ordinal: nextOrdinal("table", id) }))
+
+where nextOrdinal() (server/sidak-ordinal.ts) renders COALESCE(MAX(ordinal), 0) + 1 of the
+session as a subquery, and the unique (session_id, ordinal) index from
+migrations/add_sidak_ordinal_unique.sql plus the retry cover concurrent inserts. Fatigue,
+roster and seatbelt are numbered by their storage methods already and are only checked.
+
+Runs as a transform of the route codemod engine (route_codemod.py): routes.ts is
+parsed once and each insert handler is rewritten in place, so a pattern can never run
+past the end of its own handler. Afterwards every one of the SIDAK types is verified
+against the rewritten file; the script exits with 1 if any type is not compliant.
+
+Usage:
+  python fix_ordinal_handlers.py             # rewrite server/routes.ts
+  python fix_ordinal_handlers.py --dry-run   # report what would change
+  python fix_ordinal_handlers.py --diff      # print a unified diff instead of writing
 """
 
+import argparse
 import re
+import sys
+
+from deduplicate_routes import scan_routes, normalize_path
+from route_codemod import Codemod, changed, skipped, manual
 
-# List of SIDAK types that need ordinal fix
+# SIDAK types: (api path, insert route suffix, storage method, table).
+# table None means the storage method assigns the ordinal itself.
 sidak_types = [
-    ('sidak-fatigue', 'SidakFatigue'),
-    ('sidak-roster', 'SidakRoster'),
-    ('sidak-seatbelt', 'SidakSeatbelt'),
-    ('sidak-rambu', 'SidakRambu'),
-    ('sidak-antrian', 'SidakAntrian'),
-    ('sidak-apd', 'SidakApd'),
-    ('sidak-jarak', 'SidakJarak'),
-    ('sidak-kecepatan', 'SidakKecepatan'),
-    ('sidak-pencahayaan', 'SidakPencahayaan'),
-    ('sidak-loto', 'SidakLoto'),
-    ('sidak-digital', 'SidakDigital'),
-    ('sidak-workshop', 'SidakWorkshop'),
+    ('sidak-fatigue', 'records', 'createSidakFatigueRecord', None),
+    ('sidak-roster', 'records', 'createSidakRosterRecord', None),
+    ('sidak-seatbelt', 'records', 'createSidakSeatbeltRecord', None),
+    ('sidak-rambu', 'observations', 'createSidakRambuObservation', 'sidak_rambu_observations'),
+    ('sidak-antrian', 'records', 'createSidakAntrianRecord', 'sidak_antrian_records'),
+    ('sidak-apd', 'records', 'createSidakApdRecord', 'sidak_apd_records'),
+    ('sidak-jarak', 'records', 'createSidakJarakRecord', 'sidak_jarak_records'),
+    ('sidak-kecepatan', 'records', 'createSidakKecepatanRecord', 'sidak_kecepatan_records'),
+    ('sidak-pencahayaan', 'records', 'createSidakPencahayaanRecord', 'sidak_pencahayaan_records'),
+    ('sidak-loto', 'records', 'createSidakLotoRecord', 'sidak_loto_records'),
+    ('sidak-digital', 'records', 'createSidakDigitalRecord', 'sidak_digital_records'),
+    ('sidak-workshop', 'equipment', 'createSidakWorkshopEquipment', 'sidak_workshop_equipment'),
 ]
 
-def fix_record_handler(content, api_path, storage_method):
-    """Fix a single record POST handler to include ordinal generation."""
-
-    # Pattern to match the handler
-    # Matches: app.post("/api/sidak-xxx/:id/records", async (req, res) => {
-    #   try {
-    #     ... validation ...
-    #     const record = await storage.createXxxRecord(validatedData);
-    #     res...
-    #   } catch ...
-    # });
-
-    pattern = rf'(app\.post\("{api_path}/:id/records",\s*async\s*\(req,\s*res\)\s*=>\s*\{{\s*try\s*\{{)'
-    pattern += r'(.*?)'
-    pattern += rf'(const\s+record\s*=\s*await\s+storage\.{storage_method}\(validatedData\);)'
-    pattern += r'(.*?)'
-    pattern += r'(\}\s*\}\);)'
-
-    regex = re.compile(pattern, re.DOTALL)
-
-    def replacer(match):
-        start = match.group(1)
-        middle = match.group(2)
-        create_line = match.group(3)
-        end_part = match.group(4)
-        closing = match.group(5)
-
-        # Check if ordinal is already being set
-        if 'ordinal' in middle or 'existingRecords' in middle:
-            print(f"  [SKIP] {api_path} - already has ordinal logic")
-            return match.group(0)  # Return unchanged
-
-        # Generate new middle section with ordinal logic
-        # Extract sessionId extraction
-        session_id_match = re.search(r'(const\s+\{\s*id\s*\}\s*=\s*req\.params;|const\s+sessionId\s*=\s*req\.params\.id;)', middle)
-
-        if session_id_match:
-            # Build new middle section
-            new_middle = f"""
-      const sessionId = req.params.id;
-      const existingRecords = await storage.get{storage_method.replace('create', '').replace('Record', 'Records')}(sessionId);
-      const ordinal = existingRecords.length + 1;
-      const validatedData = insert{storage_method.replace('create', '').replace('Record', 'RecordSchema')}.parse({{ ...req.body, sessionId, ordinal }});
-"""
-            print(f"  [FIX] {api_path}")
-            return start + new_middle + "\n      " + create_line + end_part + closing
+IMPORT_LINE = 'import { nextOrdinal, withOrdinalRetry } from "./sidak-ordinal";\n'
+STORAGE_IMPORT = re.compile(r'^import \{ storage \} from "\./storage";\n', re.M)
+
+codemod = Codemod()
+
+# `const existing = await storage.getX(sessionId); const ordinal = existing.length + 1;`
+# with an optional comment line above and blank line below
+ORDINAL_LOAD = re.compile(
+    r'(?:[ \t]*//[^\n]*ordinal[^\n]*\n)?'
+    r'[ \t]*const\s+(\w+)\s*=\s*await\s+storage\.\w+\(([^()]*)\);\n'
+    r'[ \t]*const\s+ordinal\s*=\s*\1\.length\s*\+\s*1;\n'
+    r'(?:[ \t]*\n)?')
+LENGTH_ORDINAL = re.compile(r'\.length\s*\+\s*1')
+# `ordinal` as a shorthand property: `{ ..., ordinal }` or an `ordinal,` line
+ORDINAL_SHORTHAND = re.compile(r',[ \t]*ordinal(?=[ \t]*\})|^[ \t]*ordinal,[ \t]*\n', re.M)
+ORDINAL_LOG = re.compile(r' for ordinal \$\{ordinal\}')
+SCHEMA_PARSE = re.compile(r'\b(insert\w+Schema)\.parse\(')
+SESSION_VARS = [
+    (re.compile(r'const\s+\{\s*(id|sessionId)\s*\}\s*=\s*req\.params;'), 1),
+    (re.compile(r'const\s+(\w+)\s*=\s*req\.params\.(?:id|sessionId);'), 1),
+]
+ROUTE_PARAM = re.compile(r'/:(\w+)/')
+
+def session_expr(handler, load):
+    """Expression holding the session id inside the handler."""
+    if load is not None:
+        return load.group(2).strip()
+    for pattern, group in SESSION_VARS:
+        m = pattern.search(handler.text)
+        if m:
+            return m.group(group)
+    param = ROUTE_PARAM.search(handler.path)
+    return f"req.params.{param.group(1)}" if param else None
+
+def atomic_transform(storage_method, table):
+    create_call = re.compile(rf'await\s+storage\.{storage_method}\((\w+)\)')
+
+    def fix_insert_handler(handler):
+        """Compute the ordinal inside the INSERT instead of from the loaded session records."""
+        if f'nextOrdinal("{table}"' in handler.text:
+            return skipped("ordinal already assigned by the INSERT")
+        if create_call.search(handler.text) is None:
+            return manual(f"no storage.{storage_method}(...) call to rewrite")
+
+        load = ORDINAL_LOAD.search(handler.text)
+        session = session_expr(handler, load)
+        if session is None:
+            return manual("session id is not read from the route")
+
+        text = handler.text
+        if load is not None:
+            text = text[:load.start()] + text[load.end():]
+        text = ORDINAL_SHORTHAND.sub('', text)
+        text = ORDINAL_LOG.sub('', text)
+        if LENGTH_ORDINAL.search(text) or re.search(r'\bordinal\b', text):
+            return manual("ordinal is computed in a way this transform doesn't recognize")
+        # The ordinal isn't known before the INSERT, so it is not part of the validated payload
+        text = SCHEMA_PARSE.sub(r'\1.omit({ ordinal: true }).parse(', text)
+        text = create_call.sub(
+            lambda m: (f'await withOrdinalRetry(() => storage.{storage_method}'
+                       f'({{ ...{m.group(1)}, ordinal: nextOrdinal("{table}", {session}) }}))'),
+            text)
+        return changed(text)
+
+    return fix_insert_handler
+
+def storage_numbered_check(storage_method):
+    def check_handler(handler):
+        if LENGTH_ORDINAL.search(handler.text):
+            return manual("computes the ordinal from the loaded records")
+        if f'storage.{storage_method}(' not in handler.text:
+            return manual(f"doesn't insert through storage.{storage_method}")
+        return skipped(f"ordinal assigned by storage.{storage_method} under the unique index")
+    return check_handler
+
+def insert_route(api_path, suffix):
+    return f'/api/{api_path}/:id/{suffix}'
+
+for api_path, suffix, storage_method, table in sidak_types:
+    rewrite = storage_numbered_check(storage_method) if table is None else atomic_transform(storage_method, table)
+    codemod.transform('ordinal', routes=[('post', insert_route(api_path, suffix))])(rewrite)
+
+def verify(content):
+    """Check every SIDAK type against content. Returns [(api path, ok, note)]."""
+    handlers = {}
+    for route in scan_routes(content):
+        if route['method'] == 'post' and route['normalized'] is not None:
+            handlers.setdefault(route['normalized'], []).append(content[route['start']:route['end']])
+
+    results = []
+    for api_path, suffix, storage_method, table in sidak_types:
+        found = handlers.get(normalize_path(insert_route(api_path, suffix)))
+        if not found:
+            results.append((api_path, False, "no insert route"))
+            continue
+        bad = [text for text in found
+               if LENGTH_ORDINAL.search(text)
+               or (table is not None and f'nextOrdinal("{table}"' not in text)]
+        if bad:
+            results.append((api_path, False, f"{len(bad)} of {len(found)} handler(s) not atomic"))
         else:
-            # Try alternative pattern
-            print(f"  [PARTIAL] {api_path} - manual review needed")
-            return match.group(0)
+            how = f"storage.{storage_method}" if table is None else f"nextOrdinal({table})"
+            results.append((api_path, True, how))
+    return results
 
-    return regex.sub(replacer, content)
+LABELS = {'changed': 'FIX', 'skipped': 'SKIP', 'manual': 'PARTIAL', 'missing': 'MISSING'}
 
 def main():
-    input_file = "server/routes.ts"
-    output_file = "server/routes.ts"
-
-    print("=" * 70)
-    print("Fixing SIDAK record handlers to auto-generate ordinal...")
-    print("=" * 70)
-
-    with open(input_file, 'r', encoding='utf-8') as f:
+    parser = argparse.ArgumentParser(description="Make the SIDAK insert handlers number records atomically")
+    parser.add_argument("input", nargs='?', default="server/routes.ts", help="routes file (default server/routes.ts)")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--diff", action="store_true", help="print a unified diff instead of writing")
+    args = parser.parse_args()
+
+    input_file = args.input
+    output_file = args.input
+    # With --diff, stdout is only the patch
+    log = sys.stderr if args.diff else sys.stdout
+
+    print("=" * 70, file=log)
+    print("Making SIDAK insert handlers assign ordinals atomically...", file=log)
+    print("=" * 70, file=log)
+
+    with open(input_file, 'r', encoding='utf-8', newline='') as f:
         content = f.read()
 
-    original_content = content
-
-    # Fix each SIDAK type
-    for api_path, class_name in sidak_types:
-        storage_method = f'create{class_name}Record'
-        content = fix_record_handler(content, f'/api/{api_path}', storage_method)
-
-    # Write result
-    if content != original_content:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print("=" * 70)
-        print("[OK] Handlers fixed successfully!")
-        print("=" * 70)
+    result = codemod.run(content)
+    for entry in result.report:
+        where = f" (line {entry['line']})" if entry['line'] else ''
+        note = f" - {entry['note']}" if entry['status'] != 'changed' else ''
+        print(f"  [{LABELS[entry['status']]}] {entry['method']} {entry['path']}{where}{note}", file=log)
+
+    if result.edits and IMPORT_LINE not in content:
+        storage_import = STORAGE_IMPORT.search(content)
+        if storage_import is None:
+            print("[ERROR] storage import not found; can't add the sidak-ordinal import", file=log)
+            sys.exit(1)
+        result.insert(storage_import.end(), IMPORT_LINE)
+
+    print("-" * 70, file=log)
+    verified = verify(result.content)
+    for api_path, ok, note in verified:
+        print(f"  [{'OK' if ok else 'FAIL'}] {api_path} - {note}", file=log)
+    failed = sum(1 for _, ok, _ in verified if not ok)
+    print(f"Verified {len(verified) - failed} of {len(verified)} SIDAK types", file=log)
+
+    print("=" * 70, file=log)
+    if args.diff:
+        sys.stdout.write(result.diff(input_file))
+    elif not result.edits:
+        print("[INFO] No changes needed", file=log)
+    elif args.dry_run:
+        print(f"[DRY RUN] {len(result.edits)} edit(s) would be applied", file=log)
     else:
-        print("=" * 70)
-        print("[INFO] No changes needed")
-        print("=" * 70)
+        # Write result
+        with open(output_file, 'w', encoding='utf-8', newline='') as f:
+            f.write(result.content)
+        print(f"[OK] {len(result.edits)} edit(s) applied successfully!", file=log)
+    print("=" * 70, file=log)
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
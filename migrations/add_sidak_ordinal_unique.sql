@@ -0,0 +1,96 @@
+-- Migration: Unique (session_id, ordinal) on the remaining SIDAK record tables
+-- Safe to run multiple times (IF NOT EXISTS)
+--
+-- Record handlers now take the ordinal from MAX(ordinal) + 1 inside the INSERT and retry
+-- on a unique violation, like sidak_fatigue/roster/seatbelt already do. Sessions that
+-- picked up duplicate ordinals from the old length + 1 logic are renumbered first.
+
+-- sidak_rambu_observations
+UPDATE sidak_rambu_observations r SET ordinal = n.rn
+FROM (
+  SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY ordinal, created_at, id) AS rn
+  FROM sidak_rambu_observations
+  WHERE session_id IN (SELECT session_id FROM sidak_rambu_observations GROUP BY session_id, ordinal HAVING COUNT(*) > 1)
+) n
+WHERE r.id = n.id AND r.ordinal <> n.rn;
+CREATE UNIQUE INDEX IF NOT EXISTS sidak_rambu_session_ordinal_unique ON sidak_rambu_observations (session_id, ordinal);
+
+-- sidak_antrian_records
+UPDATE sidak_antrian_records r SET ordinal = n.rn
+FROM (
+  SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY ordinal, created_at, id) AS rn
+  FROM sidak_antrian_records
+  WHERE session_id IN (SELECT session_id FROM sidak_antrian_records GROUP BY session_id, ordinal HAVING COUNT(*) > 1)
+) n
+WHERE r.id = n.id AND r.ordinal <> n.rn;
+CREATE UNIQUE INDEX IF NOT EXISTS sidak_antrian_session_ordinal_unique ON sidak_antrian_records (session_id, ordinal);
+
+-- sidak_apd_records
+UPDATE sidak_apd_records r SET ordinal = n.rn
+FROM (
+  SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY ordinal, created_at, id) AS rn
+  FROM sidak_apd_records
+  WHERE session_id IN (SELECT session_id FROM sidak_apd_records GROUP BY session_id, ordinal HAVING COUNT(*) > 1)
+) n
+WHERE r.id = n.id AND r.ordinal <> n.rn;
+CREATE UNIQUE INDEX IF NOT EXISTS sidak_apd_session_ordinal_unique ON sidak_apd_records (session_id, ordinal);
+
+-- sidak_jarak_records
+UPDATE sidak_jarak_records r SET ordinal = n.rn
+FROM (
+  SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY ordinal, created_at, id) AS rn
+  FROM sidak_jarak_records
+  WHERE session_id IN (SELECT session_id FROM sidak_jarak_records GROUP BY session_id, ordinal HAVING COUNT(*) > 1)
+) n
+WHERE r.id = n.id AND r.ordinal <> n.rn;
+CREATE UNIQUE INDEX IF NOT EXISTS sidak_jarak_session_ordinal_unique ON sidak_jarak_records (session_id, ordinal);
+
+-- sidak_kecepatan_records
+UPDATE sidak_kecepatan_records r SET ordinal = n.rn
+FROM (
+  SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY ordinal, created_at, id) AS rn
+  FROM sidak_kecepatan_records
+  WHERE session_id IN (SELECT session_id FROM sidak_kecepatan_records GROUP BY session_id, ordinal HAVING COUNT(*) > 1)
+) n
+WHERE r.id = n.id AND r.ordinal <> n.rn;
+CREATE UNIQUE INDEX IF NOT EXISTS sidak_kecepatan_session_ordinal_unique ON sidak_kecepatan_records (session_id, ordinal);
+
+-- sidak_loto_records
+UPDATE sidak_loto_records r SET ordinal = n.rn
+FROM (
+  SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY ordinal, created_at, id) AS rn
+  FROM sidak_loto_records
+  WHERE session_id IN (SELECT session_id FROM sidak_loto_records GROUP BY session_id, ordinal HAVING COUNT(*) > 1)
+) n
+WHERE r.id = n.id AND r.ordinal <> n.rn;
+CREATE UNIQUE INDEX IF NOT EXISTS sidak_loto_session_ordinal_unique ON sidak_loto_records (session_id, ordinal);
+
+-- sidak_digital_records
+UPDATE sidak_digital_records r SET ordinal = n.rn
+FROM (
+  SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY ordinal, created_at, id) AS rn
+  FROM sidak_digital_records
+  WHERE session_id IN (SELECT session_id FROM sidak_digital_records GROUP BY session_id, ordinal HAVING COUNT(*) > 1)
+) n
+WHERE r.id = n.id AND r.ordinal <> n.rn;
+CREATE UNIQUE INDEX IF NOT EXISTS sidak_digital_session_ordinal_unique ON sidak_digital_records (session_id, ordinal);
+
+-- sidak_pencahayaan_records
+UPDATE sidak_pencahayaan_records r SET ordinal = n.rn
+FROM (
+  SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY ordinal, created_at, id) AS rn
+  FROM sidak_pencahayaan_records
+  WHERE session_id IN (SELECT session_id FROM sidak_pencahayaan_records GROUP BY session_id, ordinal HAVING COUNT(*) > 1)
+) n
+WHERE r.id = n.id AND r.ordinal <> n.rn;
+CREATE UNIQUE INDEX IF NOT EXISTS sidak_pencahayaan_session_ordinal_unique ON sidak_pencahayaan_records (session_id, ordinal);
+
+-- sidak_workshop_equipment
+UPDATE sidak_workshop_equipment r SET ordinal = n.rn
+FROM (
+  SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY ordinal, created_at, id) AS rn
+  FROM sidak_workshop_equipment
+  WHERE session_id IN (SELECT session_id FROM sidak_workshop_equipment GROUP BY session_id, ordinal HAVING COUNT(*) > 1)
+) n
+WHERE r.id = n.id AND r.ordinal <> n.rn;
+CREATE UNIQUE INDEX IF NOT EXISTS sidak_workshop_session_ordinal_unique ON sidak_workshop_equipment (session_id, ordinal);
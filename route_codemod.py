@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Codemod engine for server/routes.ts.
+
+The file is parsed once into route handler spans with the route index from
+deduplicate_routes.py. Registered transforms are then looked up per handler and
+applied in a single pass, and the edited spans are spliced back into the original
+text. The cost is one tokenizer pass plus work proportional to the handlers that
+transforms actually touch, however many transforms are registered.
+
+  codemod = Codemod()
+
+  @codemod.transform('my-fix', routes=[('post', '/api/things/:id/records')])
+  def my_fix(handler):
+      if 'done' in handler.text:
+          return skipped('already done')
+      return changed(handler.text.replace(...))
+
+  result = codemod.run(content)
+  print(result.diff('server/routes.ts'))
+
+A transform receives a Handler (method, path, normalized path, line, text of the
+whole statement) and returns changed(text), skipped(note) or manual(note); None
+means it doesn't apply. Transforms matching the same handler are chained in
+registration order.
+"""
+
+import bisect
+import difflib
+import re
+from collections import namedtuple
+
+from deduplicate_routes import scan_routes, normalize_path
+
+Handler = namedtuple('Handler', ['method', 'path', 'normalized', 'line', 'start', 'end', 'text'])
+Outcome = namedtuple('Outcome', ['status', 'text', 'note'])
+Transform = namedtuple('Transform', ['name', 'rewrite', 'routes', 'match'])
+
+# Lines split on '\n' only, to agree with the offsets (str.splitlines also splits on \r, \x0b, ...)
+LINE = re.compile(r"[^\n]*\n|[^\n]+$")
+
+def changed(text, note=''):
+    return Outcome('changed', text, note)
+
+def skipped(note=''):
+    return Outcome('skipped', None, note)
+
+def manual(note=''):
+    """The transform applies but can't rewrite this handler safely; it needs a manual edit."""
+    return Outcome('manual', None, note)
+
+class Codemod:
+    def __init__(self):
+        self.transforms = []
+        # (method, normalized path) -> transforms registered for exactly that route
+        self.by_route = {}
+        # Transforms with a predicate, tried on every handler
+        self.predicates = []
+
+    def transform(self, name, routes=None, match=None):
+        """Register a transform for explicit (method, path) routes and/or a match(handler) predicate."""
+        def register(rewrite):
+            t = Transform(name, rewrite, list(routes or ()), match)
+            self.transforms.append(t)
+            for method, path in t.routes:
+                self.by_route.setdefault((method.lower(), normalize_path(path)), []).append(t)
+            if match is not None:
+                self.predicates.append(t)
+            return rewrite
+        return register
+
+    def transforms_for(self, route):
+        found = list(self.by_route.get((route['method'], route['normalized']), ()))
+        found += [t for t in self.predicates if t not in found and t.match(route)]
+        # Registration order, whichever way they matched
+        return sorted(found, key=self.transforms.index) if len(found) > 1 else found
+
+    def run(self, content):
+        """Apply every registered transform to content. Returns a CodemodResult."""
+        routes = scan_routes(content)
+        edits, report = [], []
+        seen_keys = set()
+        for route in routes:
+            if route['normalized'] is None:
+                continue
+            seen_keys.add((route['method'], route['normalized']))
+            transforms = self.transforms_for(route)
+            if not transforms:
+                continue
+            text = content[route['start']:route['end']]
+            for t in transforms:
+                handler = Handler(route['method'], route['path'], route['normalized'], route['line'],
+                                  route['start'], route['end'], text)
+                outcome = t.rewrite(handler)
+                if outcome is None:
+                    continue
+                report.append({'transform': t.name, 'method': route['method'].upper(), 'path': route['path'],
+                               'line': route['line'], 'status': outcome.status, 'note': outcome.note})
+                if outcome.status == 'changed' and outcome.text != text:
+                    text = outcome.text
+            if text != content[route['start']:route['end']]:
+                edits.append((route['start'], route['end'], text))
+
+        for t in self.transforms:
+            for method, path in t.routes:
+                if (method.lower(), normalize_path(path)) not in seen_keys:
+                    report.append({'transform': t.name, 'method': method.upper(), 'path': path,
+                                   'line': None, 'status': 'missing', 'note': 'route not found'})
+        return CodemodResult(content, edits, report)
+
+class CodemodResult:
+    def __init__(self, original, edits, report):
+        self.original = original
+        self.edits = edits
+        self.report = report
+
+    @property
+    def content(self):
+        """The rewritten file."""
+        out, pos = [], 0
+        for start, end, text in self.edits:
+            out.append(self.original[pos:start])
+            out.append(text)
+            pos = end
+        out.append(self.original[pos:])
+        return ''.join(out)
+
+    def insert(self, offset, text):
+        """Add text at offset outside any handler (e.g. an import), keeping the edits in order."""
+        bisect.insort(self.edits, (offset, offset, text))
+
+    def counts(self):
+        counts = {}
+        for entry in self.report:
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+        return counts
+
+    def diff(self, path, context=3):
+        """Unified diff of the edits, built per edited span (no whole-file comparison)."""
+        src = self.original
+        line_starts = [0] + [m.end() for m in re.finditer('\n', src)]
+        total_lines = len(line_starts) - 1 if src.endswith('\n') else len(line_starts)
+
+        def line_of(offset):
+            # 0-based line containing offset
+            return bisect.bisect_right(line_starts, offset) - 1
+
+        # Each edit widened to whole lines: (first line, end line, new lines)
+        spans = []
+        for start, end, text in self.edits:
+            first = line_of(start)
+            last = line_of(end - 1) + 1 if end > start else first
+            head = src[line_starts[first]:start]
+            tail = src[end:line_starts[last] if last < len(line_starts) else len(src)]
+            spans.append((first, last, LINE.findall(head + text + tail)))
+
+        old_lines = LINE.findall(src)
+        out = [f"--- a/{path}\n", f"+++ b/{path}\n"]
+        shift = 0
+        i = 0
+        while i < len(spans):
+            # Group edits whose context would overlap into one hunk
+            j = i
+            while j + 1 < len(spans) and spans[j + 1][0] - spans[j][1] <= 2 * context:
+                j += 1
+            lo = max(0, spans[i][0] - context)
+            hi = min(total_lines, spans[j][1] + context)
+            body, old_count, new_count = [], 0, 0
+            pos = lo
+            for first, last, new in spans[i:j + 1]:
+                for line in old_lines[pos:first]:
+                    body.append(' ' + line)
+                old_count += first - pos
+                new_count += first - pos
+                matcher = difflib.SequenceMatcher(None, old_lines[first:last], new, autojunk=False)
+                for tag, a0, a1, b0, b1 in matcher.get_opcodes():
+                    if tag == 'equal':
+                        body.extend(' ' + line for line in old_lines[first + a0:first + a1])
+                    else:
+                        body.extend('-' + line for line in old_lines[first + a0:first + a1])
+                        body.extend('+' + line for line in new[b0:b1])
+                old_count += last - first
+                new_count += len(new)
+                pos = last
+            for line in old_lines[pos:hi]:
+                body.append(' ' + line)
+            old_count += hi - pos
+            new_count += hi - pos
+            out.append(f"@@ -{lo + 1},{old_count} +{lo + 1 + shift},{new_count} @@\n")
+            out.extend(line if line.endswith('\n') else line + '\n\\ No newline at end of file\n' for line in body)
+            shift += new_count - old_count
+            i = j + 1
+        return ''.join(out) if self.edits else ''
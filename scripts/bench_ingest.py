@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Benchmark harness for scripts/ingest_fatigue.py.
+#
+# Generates synthetic exports with generate_dummy_excel.py, then runs the ingester
+# end-to-end once per configuration, each in a fresh process so peak RSS is per run.
+# Replace-mode runs TRUNCATE fms_fatigue_alerts, so the target database must be given
+# explicitly (--database-url or BENCH_DATABASE_URL) and should be a local scratch Postgres.
+# Without one, --parse-only measures read + transform alone.
+#
+#   python scripts/bench_ingest.py --rows 10000 100000 --database-url postgresql://postgres@localhost/bench
+#   python scripts/bench_ingest.py --rows 1000000 --parse-only --stream
+#   python scripts/bench_ingest.py --rows 100000 --baseline bench_before.json
+#
+# With --baseline, each row also shows the baseline run's peak RSS next to its own, e.g. to
+# check a memory change such as the compact ingest dtypes on the same dataset.
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+INGEST_SCRIPT = os.path.join(SCRIPTS_DIR, "ingest_fatigue.py")
+sys.path.insert(0, SCRIPTS_DIR)
+
+def dataset_path(work_dir, rows, fmt, seed):
+    return os.path.join(work_dir, f"fms_{rows}_{seed}.{fmt}")
+
+def ensure_dataset(work_dir, rows, fmt, seed, messy_rate):
+    """Generate the synthetic export once; later runs reuse it."""
+    from generate_dummy_excel import generate
+
+    path = dataset_path(work_dir, rows, fmt, seed)
+    if not os.path.exists(path):
+        print(f"Generating {path}...")
+        started = time.perf_counter()
+        partial = dataset_path(work_dir, rows, "partial." + fmt, seed)
+        generate(partial, rows, seed=seed, messy_rate=messy_rate)
+        os.replace(partial, path)
+        print(f"  {rows} rows in {time.perf_counter() - started:.1f}s")
+    return path
+
+def parse_only(path, chunk_size):
+    """Read + transform a file without a database; prints the result JSON (child process)."""
+    import ingest_fatigue as ingest
+
+    stats = ingest.IngestStats()
+    ctx = {'stats': stats, 'date_formats': {}, 'skipped': 0, 'rejected': 0}
+    result = ingest.new_result(path, 'parse-only')
+    chunks = ingest.read_chunks(path, chunk_size) if chunk_size else ingest.read_file(path)
+    while True:
+        with stats.stage('read') as st:
+            df = next(chunks, None)
+            st.rows_out = 0 if df is None else len(df)
+        if df is None:
+            break
+        result['rows_read'] += len(df)
+        with stats.stage('transform', len(df)) as st:
+            frame = ingest.transform_chunk(df, ctx, verbose=False)
+            st.rows_out = len(frame)
+        result['rows_written'] += len(frame)
+    result['rows_rejected'] = ctx['rejected']
+    print(json.dumps(ingest.finish(result, stats), default=str))
+
+def run_case(path, case, database_url):
+    """Run one configuration in a child process and return its result dict plus wall time."""
+    if case['parse_only']:
+        cmd = [sys.executable, os.path.abspath(__file__), "--parse-only-file", path]
+    else:
+        cmd = [sys.executable, INGEST_SCRIPT, path, "--json", "--force",
+               "--loader", case['loader'], "--mode", case['mode']]
+    if case['stream']:
+        cmd += ["--stream", "--chunk-size", str(case['chunk_size'])]
+    if not case['parse_only'] and not case['parse_cache']:
+        cmd.append("--no-parse-cache")
+
+    env = dict(os.environ)
+    if database_url:
+        env["DATABASE_URL"] = database_url
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env)
+    wall = time.perf_counter() - started
+
+    lines = proc.stdout.strip().splitlines()
+    try:
+        result = json.loads(lines[-1])
+    except (IndexError, ValueError):
+        result = {'status': 'error', 'error': (proc.stderr or proc.stdout).strip()[-500:]}
+    result['process_wall_s'] = round(wall, 3)
+    return result
+
+def summarize(case, result):
+    stages = result.get('stages') or {}
+    ingest_s = sum(rec['wall_s'] for name, rec in stages.items() if name in ('hash', 'read', 'transform', 'write', 'merge'))
+    rows = result.get('rows_read', 0)
+    write = stages.get('write')
+    return {
+        **case,
+        'status': result.get('status'),
+        'rows_read': rows,
+        'rows_written': result.get('rows_written', 0),
+        'ingest_s': round(ingest_s, 3),
+        'process_wall_s': result.get('process_wall_s'),
+        'rows_per_s': round(rows / ingest_s) if ingest_s else None,
+        'write_rows_per_s': round(write['rows_in'] / write['wall_s']) if write and write['wall_s'] else None,
+        'peak_rss_mb': result.get('peak_rss_mb'),
+        'stages': {name: rec['wall_s'] for name, rec in stages.items()},
+        'db_batches': result.get('db_batches'),
+        'error': result.get('error'),
+    }
+
+def case_key(case):
+    return (case['rows'], case['format'], case['loader'], case['mode'], case['stream'], case['parse_only'])
+
+def print_table(rows, baseline):
+    header = f"{'rows':>9} {'fmt':<4} {'loader':<11} {'mode':<11} {'stream':<6} {'status':<7} {'ingest s':>9} {'rows/s':>9} {'write r/s':>10} {'RSS MB':>7}"
+    if baseline:
+        header += f" {'vs base':>8} {'base RSS':>9}"
+    print(header)
+    print("-" * len(header))
+    base = {case_key(b): b for b in baseline or []}
+    for r in rows:
+        line = (f"{r['rows']:>9} {r['format']:<4} {r['loader']:<11} {r['mode']:<11} {str(r['stream']):<6} {str(r['status']):<7} "
+                f"{r['ingest_s']:>9.2f} {r['rows_per_s'] or 0:>9} {r['write_rows_per_s'] or 0:>10} {r['peak_rss_mb'] or 0:>7}")
+        if baseline:
+            b = base.get(case_key(r))
+            line += f" {b['ingest_s'] / r['ingest_s']:>7.2f}x" if b and r['ingest_s'] else f" {'-':>8}"
+            line += f" {b['peak_rss_mb'] or 0:>9}" if b else f" {'-':>9}"
+        print(line)
+        if r['status'] == 'error':
+            print(f"    error: {r['error']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingest_fatigue.py on synthetic FMS exports")
+    parser.add_argument("--rows", type=int, nargs='+', default=[10000, 100000], help="dataset sizes (default 10000 100000)")
+    parser.add_argument("--formats", nargs='+', choices=['csv', 'xlsx'], default=['csv'], help="export formats (default csv)")
+    parser.add_argument("--loaders", nargs='+', choices=['copy', 'executemany'], default=['copy'], help="write paths (default copy)")
+    parser.add_argument("--modes", nargs='+', choices=['replace', 'incremental'], default=['replace'], help="ingest modes (default replace)")
+    parser.add_argument("--stream", action="store_true", help="ingest in chunks (--stream)")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="rows per chunk when streaming (default 50000)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per configuration; the fastest is kept (default 1)")
+    parser.add_argument("--seed", type=int, default=42, help="generator seed (default 42)")
+    parser.add_argument("--messy-rate", type=float, default=0.05, help="generator messy-row share (default 0.05)")
+    parser.add_argument("--work-dir", default=os.path.join(SCRIPTS_DIR, "..", ".bench"), help="where datasets are cached (default .bench/)")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"),
+                        help="scratch Postgres to ingest into (default $BENCH_DATABASE_URL); its fms_fatigue_alerts is overwritten")
+    parser.add_argument("--parse-only", action="store_true", help="measure read + transform only, no database")
+    parser.add_argument("--parse-cache", action="store_true",
+                        help="let ingest runs use the Parquet parse cache (measures re-ingest of an already parsed file)")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--parse-only-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.parse_only_file:
+        parse_only(args.parse_only_file, args.chunk_size if args.stream else None)
+        return
+
+    if not args.parse_only and not args.database_url:
+        parser.error("give a scratch database with --database-url (or BENCH_DATABASE_URL), or use --parse-only")
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    if any(f == 'xlsx' and n > 1048575 for f in args.formats for n in args.rows):
+        parser.error("XLSX datasets are limited to 1048575 rows")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    results = []
+    for rows in args.rows:
+        for fmt in args.formats:
+            path = ensure_dataset(args.work_dir, rows, fmt, args.seed, args.messy_rate)
+            loaders = ['-'] if args.parse_only else args.loaders
+            modes = ['-'] if args.parse_only else args.modes
+            for loader in loaders:
+                for mode in modes:
+                    case = {'rows': rows, 'format': fmt, 'loader': loader, 'mode': mode,
+                            'stream': args.stream, 'chunk_size': args.chunk_size, 'parse_only': args.parse_only,
+                            'parse_cache': args.parse_cache}
+                    best = None
+                    for i in range(args.repeat):
+                        print(f"Running {rows} {fmt} loader={loader} mode={mode} stream={args.stream} ({i + 1}/{args.repeat})...")
+                        run = summarize(case, run_case(path, case, args.database_url))
+                        if best is None or (run['status'] != 'error' and run['ingest_s'] < best['ingest_s']):
+                            best = run
+                    results.append(best)
+
+    print()
+    print_table(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': sys.version.split()[0],
+                       'results': results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if any(r['status'] == 'error' for r in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
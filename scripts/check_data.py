@@ -1,17 +1,8 @@
 
-import os
-import sys
-from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
-
-load_dotenv()
-
-DB_URL = os.getenv("DATABASE_URL")
-if DB_URL and DB_URL.startswith("postgresql://"):
-    DB_URL = DB_URL.replace("postgresql://", "postgresql+psycopg://")
+from dbutil import get_engine, text
 
 try:
-    engine = create_engine(DB_URL)
+    engine = get_engine()
     with engine.connect() as conn:
         # Check Columns
         print("Table Columns:")
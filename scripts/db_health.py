@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+import re
+import sys
+import traceback
+
+from dbutil import get_engine, text
+
+# Table-health report: estimated row counts, sizes, dead tuples, unused/missing indexes
+# and (when pg_stat_statements is installed) the slowest queries, as JSON.
+# Everything comes from the statistics catalogs in one round trip; no table is scanned.
+#
+#   python scripts/db_health.py                       # whole schema
+#   python scripts/db_health.py --table fms_fatigue_alerts --table sidak_seatbelt_sessions
+#   python scripts/db_health.py --output health.json
+
+SCHEMA_TS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared', 'schema.ts')
+
+# Thresholds for findings
+DEAD_RATIO_WARN = 0.2
+DEAD_TUPLES_MIN = 1000
+UNUSED_INDEX_MIN_BYTES = 1 << 20
+SEQ_SCAN_ROWS_MIN = 10000
+
+CATALOG_SQL = """
+WITH t AS (
+    SELECT c.oid, c.relname AS name,
+           c.reltuples::bigint AS reltuples,
+           s.n_live_tup, s.n_dead_tup, s.n_mod_since_analyze,
+           s.seq_scan, s.seq_tup_read, s.idx_scan, s.idx_tup_fetch,
+           s.last_vacuum, s.last_autovacuum, s.last_analyze, s.last_autoanalyze,
+           pg_table_size(c.oid) AS table_bytes,
+           pg_indexes_size(c.oid) AS index_bytes,
+           pg_total_relation_size(c.oid) AS total_bytes
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+    WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p')
+), i AS (
+    SELECT si.relname AS table_name, si.indexrelname AS name, si.idx_scan,
+           pg_relation_size(si.indexrelid) AS bytes,
+           x.indisunique AS is_unique, x.indisprimary AS is_primary,
+           pg_get_indexdef(si.indexrelid) AS definition
+    FROM pg_stat_user_indexes si
+    JOIN pg_index x ON x.indexrelid = si.indexrelid
+    WHERE si.schemaname = 'public'
+), fk AS (
+    -- Foreign keys whose columns are not the leading columns of any index
+    SELECT cl.relname AS table_name, con.conname AS name,
+           array_agg(a.attname ORDER BY k.ord) AS columns
+    FROM pg_constraint con
+    JOIN pg_class cl ON cl.oid = con.conrelid
+    JOIN pg_namespace n ON n.oid = cl.relnamespace
+    CROSS JOIN LATERAL unnest(con.conkey) WITH ORDINALITY AS k(attnum, ord)
+    JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+    WHERE con.contype = 'f' AND n.nspname = 'public'
+      AND NOT EXISTS (
+          SELECT 1 FROM pg_index x
+          WHERE x.indrelid = con.conrelid
+            AND (x.indkey::int2[])[0:array_length(con.conkey, 1) - 1] @> con.conkey
+            AND (x.indkey::int2[])[0:array_length(con.conkey, 1) - 1] <@ con.conkey
+      )
+    GROUP BY cl.relname, con.conname
+)
+SELECT json_build_object(
+    'tables', (SELECT COALESCE(json_agg(t ORDER BY total_bytes DESC), '[]') FROM t),
+    'indexes', (SELECT COALESCE(json_agg(i), '[]') FROM i),
+    'unindexed_foreign_keys', (SELECT COALESCE(json_agg(fk), '[]') FROM fk),
+    'has_pg_stat_statements', EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'),
+    'server_version', current_setting('server_version'),
+    'database_bytes', pg_database_size(current_database())
+)
+"""
+
+STATEMENTS_SQL = """
+SELECT queryid, calls, total_exec_time AS total_ms, mean_exec_time AS mean_ms,
+       rows, shared_blks_hit, shared_blks_read, left(query, 500) AS query
+FROM pg_stat_statements
+WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+ORDER BY mean_exec_time DESC
+LIMIT :top
+"""
+# pg_stat_statements before PostgreSQL 13
+STATEMENTS_SQL_OLD = STATEMENTS_SQL.replace('total_exec_time', 'total_time').replace('mean_exec_time', 'mean_time')
+
+def schema_tables(path=SCHEMA_TS):
+    """Table names declared with pgTable(...) in shared/schema.ts."""
+    try:
+        with open(path, encoding='utf-8-sig') as f:
+            return set(re.findall(r'pgTable\(\s*"([^"]+)"', f.read()))
+    except OSError:
+        return set()
+
+def estimated_rows(table):
+    # reltuples is -1 until the first VACUUM/ANALYZE; fall back to the stats collector
+    if table['reltuples'] is not None and table['reltuples'] >= 0:
+        return table['reltuples']
+    return table['n_live_tup'] or 0
+
+def table_report(table, indexes, unindexed_fks):
+    live, dead = table['n_live_tup'] or 0, table['n_dead_tup'] or 0
+    dead_ratio = dead / (live + dead) if live + dead else 0.0
+    findings = []
+
+    if dead >= DEAD_TUPLES_MIN and dead_ratio >= DEAD_RATIO_WARN:
+        findings.append(f"bloat: {dead_ratio:.0%} dead tuples ({dead}); check autovacuum or run VACUUM")
+    if not (table['last_analyze'] or table['last_autoanalyze']) and estimated_rows(table):
+        findings.append("never analyzed; planner estimates may be off")
+
+    seq_scan, idx_scan = table['seq_scan'] or 0, table['idx_scan'] or 0
+    avg_seq_rows = (table['seq_tup_read'] or 0) / seq_scan if seq_scan else 0
+    if estimated_rows(table) >= SEQ_SCAN_ROWS_MIN and seq_scan > idx_scan and avg_seq_rows >= SEQ_SCAN_ROWS_MIN:
+        findings.append(f"possible missing index: {seq_scan} sequential scans reading ~{avg_seq_rows:.0f} rows each "
+                        f"vs {idx_scan} index scans")
+
+    index_reports = []
+    for ix in indexes:
+        unused = not ix['idx_scan'] and not ix['is_unique'] and not ix['is_primary']
+        if unused and ix['bytes'] >= UNUSED_INDEX_MIN_BYTES:
+            findings.append(f"unused index {ix['name']} ({ix['bytes'] >> 20} MB, never scanned since stats reset)")
+        index_reports.append({
+            'name': ix['name'], 'scans': ix['idx_scan'], 'bytes': ix['bytes'],
+            'unique': ix['is_unique'], 'primary': ix['is_primary'], 'unused': unused,
+            'definition': ix['definition'],
+        })
+    for fk in unindexed_fks:
+        findings.append(f"foreign key {fk['name']} ({', '.join(fk['columns'])}) has no supporting index")
+
+    return {
+        'name': table['name'],
+        'estimated_rows': estimated_rows(table),
+        'live_tuples': live,
+        'dead_tuples': dead,
+        'dead_ratio': round(dead_ratio, 4),
+        'modified_since_analyze': table['n_mod_since_analyze'],
+        'table_bytes': table['table_bytes'],
+        'index_bytes': table['index_bytes'],
+        'total_bytes': table['total_bytes'],
+        'seq_scans': seq_scan,
+        'index_scans': idx_scan,
+        'last_vacuum': table['last_vacuum'] or table['last_autovacuum'],
+        'last_analyze': table['last_analyze'] or table['last_autoanalyze'],
+        'indexes': index_reports,
+        'findings': findings,
+    }
+
+def slow_statements(conn, top):
+    for sql in (STATEMENTS_SQL, STATEMENTS_SQL_OLD):
+        try:
+            with conn.begin_nested():
+                return [dict(r._mapping) for r in conn.execute(text(sql), {"top": top})]
+        except Exception:
+            continue
+    return None
+
+def build_report(conn, only_tables=None, top=10):
+    catalog = conn.execute(text(CATALOG_SQL)).scalar()
+    declared = schema_tables()
+
+    indexes_by_table, fks_by_table = {}, {}
+    for ix in catalog['indexes']:
+        indexes_by_table.setdefault(ix['table_name'], []).append(ix)
+    for fk in catalog['unindexed_foreign_keys']:
+        fks_by_table.setdefault(fk['table_name'], []).append(fk)
+
+    tables = [
+        table_report(t, indexes_by_table.get(t['name'], []), fks_by_table.get(t['name'], []))
+        for t in catalog['tables']
+        if not only_tables or t['name'] in only_tables
+    ]
+    present = {t['name'] for t in catalog['tables']}
+
+    report = {
+        'server_version': catalog['server_version'],
+        'database_bytes': catalog['database_bytes'],
+        'tables': tables,
+        'findings': [f"{t['name']}: {f}" for t in tables for f in t['findings']],
+    }
+    if not only_tables and declared:
+        report['missing_tables'] = sorted(declared - present)
+        report['undeclared_tables'] = sorted(present - declared)
+    if catalog['has_pg_stat_statements']:
+        report['slow_statements'] = slow_statements(conn, top)
+    else:
+        report['slow_statements'] = None
+        report['notes'] = ["pg_stat_statements is not installed; CREATE EXTENSION pg_stat_statements to see slow queries"]
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON health report for the database tables")
+    parser.add_argument("--table", action="append", help="limit the report to this table (repeatable)")
+    parser.add_argument("--top", type=int, default=10, help="number of slow statements to report (default 10)")
+    parser.add_argument("--output", help="write the report to this file instead of stdout")
+    args = parser.parse_args()
+
+    try:
+        with get_engine().connect() as conn:
+            report = build_report(conn, set(args.table or []), args.top)
+    except Exception:
+        print("DATABASE ERROR:", file=sys.stderr)
+        traceback.print_exc()
+        sys.exit(1)
+
+    body = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(body)
+        print(f"Report written to {args.output} ({len(report['findings'])} findings)")
+    else:
+        print(body)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""Shared database access for the Python scripts in scripts/.
+
+    from dbutil import get_engine, run_in_transaction, text
+
+URL normalization, the pooled engine, keepalives and retry-with-backoff live here so
+every script connects the same way.
+"""
+from sqlalchemy import text
+
+from .config import database_url, require_database_url
+from .engine import get_engine, dispose_engine, run_in_transaction, connect, connect_args, execute_script
+from .retry import retry, with_retry, is_transient
+
+__all__ = [
+    'text',
+    'database_url', 'require_database_url',
+    'get_engine', 'dispose_engine', 'run_in_transaction', 'connect', 'connect_args', 'execute_script',
+    'retry', 'with_retry', 'is_transient',
+]
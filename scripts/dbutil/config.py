@@ -0,0 +1,34 @@
+import os
+from dotenv import load_dotenv, find_dotenv
+
+# Repo-root .env first, then one found from the working directory; real env vars win over both
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '.env'))
+load_dotenv(find_dotenv(usecwd=True))
+
+def database_url(driver='psycopg'):
+    """DATABASE_URL normalized for SQLAlchemy (postgresql+psycopg://), or None if unset.
+
+    driver=None returns a plain libpq URL (postgresql://) for direct psycopg connections.
+    """
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        return None
+    url = url.strip().strip('"').strip("'")
+    for prefix in ("postgresql+psycopg2://", "postgresql+psycopg://", "postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            url = url[len(prefix):]
+            break
+    return f"postgresql+{driver}://{url}" if driver else f"postgresql://{url}"
+
+def require_database_url(driver='psycopg'):
+    """database_url(), raising RuntimeError when DATABASE_URL is unset (scripts decide whether to exit)."""
+    url = database_url(driver)
+    if not url:
+        raise RuntimeError("DATABASE_URL not found in .env")
+    return url
+
+def env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
@@ -0,0 +1,70 @@
+import os
+import sys
+
+from sqlalchemy import create_engine
+
+from .config import require_database_url, env_int
+from .retry import retry
+
+_engine = None
+
+def connect_args():
+    """libpq settings shared by pooled and direct connections.
+
+    TCP keepalives stop idle connections behind NAT or the Neon pooler from being
+    dropped silently; connect_timeout bounds a hung TLS handshake.
+    """
+    return {
+        'connect_timeout': env_int('DB_CONNECT_TIMEOUT', 10),
+        'keepalives': 1,
+        'keepalives_idle': env_int('DB_KEEPALIVES_IDLE', 30),
+        'keepalives_interval': 10,
+        'keepalives_count': 5,
+        'application_name': os.path.basename(sys.argv[0] or 'python')[:63] or 'python',
+    }
+
+def get_engine():
+    """Process-wide SQLAlchemy engine with a tuned pool; created on first use.
+
+    Pool size/overflow/recycle can be tuned with DB_POOL_SIZE, DB_MAX_OVERFLOW and
+    DB_POOL_RECYCLE (seconds). Connections are pre-pinged on checkout and recycled
+    before the server-side idle timeout, so long-lived processes reuse them safely.
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_engine(
+            require_database_url(),
+            pool_size=env_int('DB_POOL_SIZE', 5),
+            max_overflow=env_int('DB_MAX_OVERFLOW', 5),
+            pool_recycle=env_int('DB_POOL_RECYCLE', 240),
+            pool_pre_ping=True,
+            pool_use_lifo=True,  # reuse the warmest connection, let extras idle out
+            connect_args=connect_args(),
+        )
+    return _engine
+
+def dispose_engine():
+    global _engine
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+
+def run_in_transaction(fn, *args, **kwargs):
+    """Run fn(conn, *args, **kwargs) in one transaction, retrying it on transient errors."""
+    def unit():
+        with get_engine().begin() as conn:
+            return fn(conn, *args, **kwargs)
+    return retry(unit)
+
+def connect(autocommit=False):
+    """Direct psycopg (v3) connection with the same URL handling and keepalives, retried on connect."""
+    import psycopg
+
+    url = require_database_url(driver=None)
+    return retry(psycopg.connect, url, autocommit=autocommit, **connect_args())
+
+def execute_script(conn, sql):
+    """Execute a multi-statement SQL script (e.g. a migration file) on a SQLAlchemy connection."""
+    # The simple query protocol accepts several statements; SQLAlchemy's execute does not
+    with conn.connection.driver_connection.cursor() as cur:
+        cur.execute(sql)
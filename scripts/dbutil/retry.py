@@ -0,0 +1,50 @@
+import functools
+import random
+import time
+
+from sqlalchemy import exc
+
+# SQLSTATEs worth retrying: connection failures (class 08), server shutdown / not
+# accepting connections yet (Neon compute waking up), too many connections,
+# serialization failures, deadlocks and lock_timeout expiry
+TRANSIENT_SQLSTATES = {'57P01', '57P02', '57P03', '53300', '40001', '40P01', '55P03'}
+
+def is_transient(error):
+    """True for errors where running the whole unit of work again may succeed."""
+    if isinstance(error, exc.DBAPIError):
+        if error.connection_invalidated:
+            return True
+        error = error.orig
+    sqlstate = getattr(error, 'sqlstate', None) or getattr(error, 'pgcode', None)
+    if sqlstate:
+        return sqlstate.startswith('08') or sqlstate in TRANSIENT_SQLSTATES
+    # No SQLSTATE: the socket dropped or the connect itself failed
+    name = type(error).__name__
+    return name in ('OperationalError', 'InterfaceError') or isinstance(error, (ConnectionError, TimeoutError))
+
+def retry(fn, *args, attempts=4, base_delay=0.5, max_delay=8.0, **kwargs):
+    """Call fn(*args, **kwargs), retrying transient database errors with exponential backoff.
+
+    fn must be a complete unit of work (e.g. one transaction), so a retry never
+    repeats half of it.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == attempts or not is_transient(e):
+                raise
+            delay = min(max_delay, base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            reason = (str(e).strip().splitlines() or [''])[0]
+            print(f"Transient database error ({type(e).__name__}: {reason}); "
+                  f"retrying in {delay:.1f}s (attempt {attempt + 1}/{attempts})...")
+            time.sleep(delay)
+
+def with_retry(attempts=4, base_delay=0.5, max_delay=8.0):
+    """Decorator form of retry()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return retry(fn, *args, attempts=attempts, base_delay=base_delay, max_delay=max_delay, **kwargs)
+        return wrapper
+    return decorate
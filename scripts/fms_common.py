@@ -0,0 +1,106 @@
+import hashlib
+import time
+
+import pandas as pd
+
+# Helpers shared by ingest_fatigue.py and the fms_* scripts that build on its tables
+# (fms_episodes.py, fms_partitions.py). They live here so those scripts don't have to import
+# ingest_fatigue, which imports them back.
+#
+#   write_frame(conn, frame, 'copy', 'fms_fatigue_episodes', cols=EPISODE_COLS)
+#   offsets = parse_alert_times(df['alert_time'])   # time-of-day Timedelta per row
+
+# Written as YYYY-MM-DD text (validated_at goes out as a timestamp)
+DATE_TEXT_COLS = ['alert_date', 'opr_date']
+# Rows per slice when a frame is turned into text (row hashes, COPY)
+ROW_SLICE_ROWS = 20000
+
+def parse_alert_times(times):
+    """Parse a column of alert times into time-of-day offsets (NaT when unparseable)."""
+    times = times.astype('string').str.strip()
+    # Fast path for the common HH:MM:SS export format, then per-element inference for the rest
+    parsed = pd.to_datetime(times, format='%H:%M:%S', errors='coerce')
+    retry = parsed.isna() & times.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(times[retry], format='mixed', errors='coerce')
+    return parsed - parsed.dt.normalize()
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def format_dates(frame):
+    """frame with its DATE_TEXT_COLS as YYYY-MM-DD text (applied to one slice at a time)."""
+    dates = [c for c in DATE_TEXT_COLS if c in frame.columns and pd.api.types.is_datetime64_any_dtype(frame[c])]
+    if not dates:
+        return frame
+    return frame.assign(**{c: frame[c].dt.strftime('%Y-%m-%d') for c in dates})
+
+def column_values(col):
+    """A column as a list of Python values with None for missing ones."""
+    values = col.astype(object)
+    return values.where(col.notna(), None).tolist()
+
+def insert_records(conn, frame, table, stats=None, verbose=True, cols=None):
+    """Fallback loader: parameterized INSERT in 500-row executemany batches.
+
+    Each batch's parameters are zipped straight from its columns; no per-row dicts.
+    """
+    # Construct dynamic query (DB-API format paramstyle, as psycopg uses)
+    col_list = ", ".join(cols)
+    placeholders = ", ".join(["%s"] * len(cols))
+    sql = f"INSERT INTO {table} ({col_list}) VALUES ({placeholders})"
+
+    raw = conn.connection.driver_connection
+    with raw.cursor() as cur:
+        # Insert in chunks of 500
+        for k in range(0, len(frame), 500):
+            batch = format_dates(frame.iloc[k:k+500])
+            params = list(zip(*(column_values(batch[c]) for c in cols)))
+            started = time.perf_counter()
+            cur.executemany(sql, params)
+            if stats is not None:
+                stats.batch(len(params), time.perf_counter() - started)
+            if verbose:
+                print(f"Inserted batch {k//500 + 1}...")
+
+def copy_records(conn, frame, table, stats=None, verbose=True, cols=None):
+    """Default loader: stream the frame as CSV through a single COPY ... FROM STDIN.
+
+    The CSV is produced ROW_SLICE_ROWS rows at a time, so the text form of the whole
+    frame never exists at once.
+    """
+    sql = f"COPY {table} ({', '.join(cols)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+
+    raw = conn.connection.driver_connection
+    started = time.perf_counter()
+    with raw.cursor() as cur:
+        with cur.copy(sql) as copy:
+            for k in range(0, len(frame), ROW_SLICE_ROWS):
+                block = format_dates(frame.iloc[k:k + ROW_SLICE_ROWS])
+                copy.write(block.to_csv(index=False, header=False, na_rep='\\N', date_format='%Y-%m-%d %H:%M:%S.%f'))
+    if stats is not None:
+        stats.batch(len(frame), time.perf_counter() - started)
+    if verbose:
+        print(f"Copied {len(frame)} rows...")
+
+def supports_copy(conn):
+    # COPY FROM STDIN goes through psycopg 3's cursor.copy(); other drivers use the fallback
+    with conn.connection.driver_connection.cursor() as cur:
+        return hasattr(cur, 'copy')
+
+def write_frame(conn, frame, loader, table, stats=None, verbose=True, cols=None):
+    """Write frame (its `cols`, default all columns) to table with the 'copy' or 'executemany' loader.
+
+    Batch latencies are recorded in stats (an ingest_fatigue.IngestStats) when given.
+    """
+    cols = list(frame.columns) if cols is None else cols
+    if list(frame.columns) != cols:
+        frame = frame[cols]
+    if loader == 'copy':
+        copy_records(conn, frame, table, stats, verbose, cols)
+    else:
+        insert_records(conn, frame, table, stats, verbose, cols)
@@ -0,0 +1,354 @@
+import argparse
+import math
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from dbutil import database_url, get_engine, run_in_transaction
+from fms_common import parse_alert_times, write_frame, supports_copy
+from fms_schema import archived_months
+from fms_validation import KNOWN_SHIFTS, normalize_label, normalize_labels
+
+# Repeat-offender and fatigue-cluster detection over fms_fatigue_alerts.
+#
+# Alerts are loaded into one array sorted by (vehicle, time). Each vehicle's alerts are a
+# contiguous run, and its timestamps are offset by a per-vehicle stride so runs of different
+# vehicles can never fall in one window. Every rule is then a few vectorized passes over the
+# whole array (searchsorted, run boundaries), with no loop over vehicles or alerts.
+# Flagged episodes are written to fms_fatigue_episodes for the dashboard.
+#
+#   python scripts/fms_episodes.py                   # rebuild all episodes
+#   python scripts/fms_episodes.py --window 3 2      # 3 alerts within 2 hours
+#   python scripts/fms_episodes.py --dry-run --json  # detect and print, write nothing
+#
+# ingest_fatigue.py refreshes the episodes after every load; an incremental load only
+# recomputes the vehicles it staged, from shortly before their earliest staged alert.
+
+EPISODES_TABLE = "fms_fatigue_episodes"
+EPISODE_COLS = ['rule', 'vehicle_no', 'started_at', 'ended_at', 'alert_count', 'shift_count']
+
+# Shift names (normalized) -> position within the operating day, from the labels validation
+# accepts (FMS_SHIFTS); the last shift (Shift 2 by default) runs past midnight on the same opr_date
+SHIFTS = {normalize_label(name): i for i, name in enumerate(KNOWN_SHIFTS)}
+
+# Detection rules, applied independently. Episodes of one rule that overlap are merged.
+# Alerts sorted by (vehicle, time): vehicle names, then per alert the vehicle code, epoch
+# seconds, operating shift ordinal and the strided search key
+Alerts = namedtuple('Alerts', ['names', 'codes', 'seconds', 'shift', 'key'])
+
+RULES = [
+    # `count` alerts of one vehicle within `hours`
+    {'rule': 'window', 'count': 3, 'hours': 2},
+    # `count` alerts of one vehicle in one shift (opr_date + shift)
+    {'rule': 'shift', 'count': 5},
+    # Alerts of one vehicle on `shifts` consecutive shifts
+    {'rule': 'consecutive_shifts', 'shifts': 3},
+]
+
+def rule_name(spec):
+    if spec['rule'] == 'window':
+        return f"window_{spec['count']}_in_{spec['hours']:g}h"
+    if spec['rule'] == 'shift':
+        return f"shift_{spec['count']}"
+    return f"consecutive_shifts_{spec['shifts']}"
+
+def context_days(rules):
+    """Days before a new alert that can belong to the same episode as it."""
+    days = 1
+    for spec in rules:
+        if spec['rule'] == 'window':
+            days = max(days, math.ceil(spec['hours'] / 24))
+        elif spec['rule'] == 'consecutive_shifts':
+            days = max(days, math.ceil(spec['shifts'] / len(SHIFTS)))
+    # Plus a day: a night shift's alerts fall on the day after its opr_date
+    return days + 1
+
+def ensure_episode_schema(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {EPISODES_TABLE} (
+            id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid(),
+            rule TEXT NOT NULL,
+            vehicle_no TEXT NOT NULL,
+            started_at TIMESTAMP NOT NULL,
+            ended_at TIMESTAMP NOT NULL,
+            alert_count INTEGER NOT NULL,
+            shift_count INTEGER,
+            detected_at TIMESTAMP DEFAULT NOW()
+        )
+    """))
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS "IDX_fms_fatigue_episodes_vehicle" ON {EPISODES_TABLE} (vehicle_no, started_at)'))
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS "IDX_fms_fatigue_episodes_started" ON {EPISODES_TABLE} (started_at)'))
+
+def load_alerts(conn, bounds=None, archived=()):
+    """Alerts as (vehicle_no, alert_date, alert_time, opr_date, shift) text columns.
+
+    Vehicle numbers are trimmed (exports carry trailing whitespace). bounds is
+    {vehicle_no: lower timestamp}; only those vehicles' alerts from that day on are loaded.
+    Alerts of the archived months (rows waiting in the DEFAULT partition) are left out.
+    """
+    cols = "btrim(a.vehicle_no), a.alert_date, a.alert_time, a.opr_date, a.shift"
+    attached = "left(a.alert_date, 7) <> ALL(CAST(:archived AS TEXT[]))"
+    if bounds is None:
+        rows = conn.execute(text(f"SELECT {cols} FROM fms_fatigue_alerts a WHERE {attached}"),
+                            {"archived": list(archived)})
+    else:
+        rows = conn.execute(text(f"""
+            SELECT {cols} FROM fms_fatigue_alerts a
+            JOIN unnest(CAST(:vehicles AS TEXT[]), CAST(:lower AS TEXT[])) AS b(vehicle_no, lower_date)
+              ON btrim(a.vehicle_no) = b.vehicle_no
+            WHERE a.alert_date >= b.lower_date
+              AND a.alert_date >= :earliest  -- lets the natural key index skip older dates
+              AND {attached}
+        """), {"vehicles": list(bounds), "lower": [str(t.date()) for t in bounds.values()],
+               "earliest": str(min(bounds.values()).date()), "archived": list(archived)})
+    return pd.DataFrame(rows.fetchall(), columns=['vehicle_no', 'alert_date', 'alert_time', 'opr_date', 'shift'])
+
+def parse_distinct(col, parse):
+    """parse(values) applied once per distinct value of col; a year of alerts has few distinct dates and times."""
+    codes, uniques = pd.factorize(col)
+    parsed = parse(pd.Series(uniques, dtype='string'))
+    # Code -1 (missing) takes the appended missing value
+    return pd.Series(pd.concat([parsed, parsed[:0].reindex([-1])]).to_numpy()[codes], index=col.index)
+
+def parse_dates(col):
+    return parse_distinct(col, lambda values: pd.to_datetime(values, format='%Y-%m-%d', errors='coerce'))
+
+def alert_arrays(df, bounds=None):
+    """Sorted alert arrays: vehicle names, per-row vehicle code, time (s), shift ordinal and the stride key.
+
+    Rows without a vehicle or a parseable time are left out. With bounds, rows before their
+    vehicle's lower timestamp are dropped.
+    """
+    vehicle = df['vehicle_no'].astype('string')
+    ts = parse_dates(df['alert_date']) + parse_distinct(df['alert_time'], parse_alert_times)
+    keep = vehicle.notna() & (vehicle != '') & ts.notna()
+    if bounds is not None:
+        lower = pd.to_datetime(vehicle.map(bounds))
+        keep &= ts >= lower
+
+    vehicle, ts = vehicle[keep], ts[keep]
+    codes, names = pd.factorize(vehicle)
+    seconds = ts.to_numpy(dtype='datetime64[s]').astype('int64')
+
+    # Operating shift ordinal: len(SHIFTS) per opr_date (alert_date when opr_date is missing); -1 when unknown
+    opr = parse_dates(df.loc[keep, 'opr_date']).fillna(ts.dt.normalize())
+    shift_pos = parse_distinct(df.loc[keep, 'shift'],
+                               lambda values: normalize_labels(values).map(SHIFTS))
+    days = opr.to_numpy(dtype='datetime64[D]').astype('int64')
+    shift = np.where(shift_pos.notna(), days * len(SHIFTS) + shift_pos.fillna(0).to_numpy(dtype='int64'), -1)
+
+    # Alerts at the same second are ordered by shift, so the order never depends on how they were loaded
+    order = np.lexsort((shift, seconds, codes))
+    codes, seconds, shift = codes[order], seconds[order], shift[order]
+    # Offset every vehicle past the previous one's last alert plus any window length
+    base = seconds.min() if len(seconds) else 0
+    stride = (seconds.max() - base + 1 if len(seconds) else 1) + 366 * 86400
+    key = codes.astype('int64') * stride + (seconds - base)
+    return Alerts(np.asarray(names, dtype=object), codes, seconds, shift, key)
+
+def merge_spans(starts, ends):
+    """Merge sorted, possibly overlapping [start, end] index spans. Returns (firsts, lasts)."""
+    if not len(starts):
+        return starts, ends
+    reach = np.maximum.accumulate(ends)
+    new = np.r_[True, starts[1:] > reach[:-1]]
+    heads = np.flatnonzero(new)
+    return starts[heads], np.maximum.reduceat(ends, heads)
+
+def window_spans(a, count, seconds):
+    """Spans of `count` or more alerts of one vehicle within `seconds`."""
+    # Last alert within the window opened by each alert; the stride keeps it in the same vehicle
+    right = np.searchsorted(a.key, a.key + seconds, side='right') - 1
+    flagged = np.flatnonzero(right - np.arange(len(a.key)) + 1 >= count)
+    firsts, lasts = merge_spans(flagged, right[flagged])
+    return firsts, lasts, None
+
+def shift_runs(a):
+    """Runs of alerts in the same (vehicle, shift), over the alerts with a known shift.
+
+    Returns (order, heads, lengths): order sorts those alerts by (vehicle, shift, time) and
+    the runs start at order[heads].
+    """
+    known = np.flatnonzero(a.shift >= 0)
+    order = known[np.lexsort((a.seconds[known], a.shift[known], a.codes[known]))]
+    if not len(order):
+        return order, order, order
+    codes, shift = a.codes[order], a.shift[order]
+    heads = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (shift[1:] != shift[:-1])])
+    lengths = np.diff(np.r_[heads, len(order)])
+    return order, heads, lengths
+
+def shift_spans(a, count):
+    """Shifts in which one vehicle has `count` or more alerts."""
+    order, heads, lengths = shift_runs(a)
+    hit = lengths >= count
+    return order[heads[hit]], order[heads[hit] + lengths[hit] - 1], np.ones(int(hit.sum()), dtype='int64')
+
+def consecutive_shift_spans(a, shifts):
+    """Chains of `shifts` or more consecutive shifts in each of which one vehicle has an alert."""
+    order, heads, lengths = shift_runs(a)
+    if not len(heads):
+        return order, order, order
+    codes, shift = a.codes[order[heads]], a.shift[order[heads]]
+    # A chain breaks on a new vehicle or a shift without alerts
+    breaks = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (shift[1:] != shift[:-1] + 1)])
+    chain_len = np.diff(np.r_[breaks, len(heads)])
+    hit = chain_len >= shifts
+    first_run, last_run = breaks[hit], breaks[hit] + chain_len[hit] - 1
+    return order[heads[first_run]], order[heads[last_run] + lengths[last_run] - 1], chain_len[hit]
+
+def detect(a, rules=RULES):
+    """Episodes of every rule over alert arrays, as an EPISODE_COLS frame."""
+    frames = []
+    for spec in rules:
+        if spec['rule'] == 'window':
+            firsts, lasts, shift_count = window_spans(a, spec['count'], int(spec['hours'] * 3600))
+        elif spec['rule'] == 'shift':
+            firsts, lasts, shift_count = shift_spans(a, spec['count'])
+        else:
+            firsts, lasts, shift_count = consecutive_shift_spans(a, spec['shifts'])
+        if not len(firsts):
+            continue
+        frames.append(pd.DataFrame({
+            'rule': rule_name(spec),
+            'vehicle_no': a.names[a.codes[firsts]],
+            'started_at': a.seconds[firsts].astype('datetime64[s]'),
+            'ended_at': a.seconds[lasts].astype('datetime64[s]'),
+            # Spans are index ranges of the time-sorted alerts, so this counts every alert in between
+            'alert_count': lasts - firsts + 1,
+            'shift_count': pd.array(shift_count, dtype='Int64') if shift_count is not None else pd.NA,
+        }))
+    if not frames:
+        return pd.DataFrame(columns=EPISODE_COLS)
+    return pd.concat(frames, ignore_index=True)[EPISODE_COLS]
+
+def scope_bounds(conn, scope_table, rules):
+    """{vehicle_no: lower timestamp} to recompute for the rows in scope_table.
+
+    The bound starts context_days() before the vehicle's earliest staged alert and moves back
+    to the start of any stored episode still running at it, so no episode is cut in two.
+    """
+    rows = conn.execute(text(f"""
+        SELECT btrim(vehicle_no), MIN(alert_date) FROM {scope_table}
+        WHERE vehicle_no IS NOT NULL GROUP BY btrim(vehicle_no)
+    """)).fetchall()
+    days = pd.Timedelta(days=context_days(rules))
+    bounds = {}
+    for vehicle, first_date in rows:
+        first = pd.to_datetime(first_date, format='%Y-%m-%d', errors='coerce')
+        if vehicle and not pd.isna(first):
+            bounds[vehicle] = first - days
+    while bounds:
+        moved = conn.execute(text(f"""
+            SELECT e.vehicle_no, MIN(e.started_at) FROM {EPISODES_TABLE} e
+            JOIN unnest(CAST(:vehicles AS TEXT[]), CAST(:lower AS TIMESTAMP[])) AS b(vehicle_no, lower_at) USING (vehicle_no)
+            WHERE e.started_at < b.lower_at AND e.ended_at >= b.lower_at
+            GROUP BY e.vehicle_no
+        """), {"vehicles": list(bounds), "lower": [t.to_pydatetime() for t in bounds.values()]}).fetchall()
+        if not moved:
+            break
+        for vehicle, started_at in moved:
+            bounds[vehicle] = pd.Timestamp(started_at)
+    return bounds
+
+def refresh_episodes(conn, scope_table=None, rules=RULES, loader='copy', verbose=False):
+    """Detect episodes and replace the stored ones. Returns the number of episodes written.
+
+    With scope_table (a staging table of the rows just loaded) only its vehicles are
+    recomputed, from scope_bounds() on; otherwise every episode is rebuilt. Changing the
+    rules needs a full rebuild. Episodes started in months archived by fms_partitions.py are
+    kept as they are, and a new episode overlapping one of them is dropped.
+    """
+    ensure_episode_schema(conn)
+    scoped = scope_table is not None and conn.execute(text(f"SELECT 1 FROM {EPISODES_TABLE} LIMIT 1")).first()
+    bounds = scope_bounds(conn, scope_table, rules) if scoped else None
+    if scoped and not bounds:
+        return 0
+
+    started = time.perf_counter()
+    archived = archived_months(conn)
+    df = load_alerts(conn, bounds, archived)
+    loaded = time.perf_counter()
+    episodes = detect(alert_arrays(df, bounds), rules)
+    if verbose:
+        print(f"Loaded {len(df)} alerts in {loaded - started:.2f}s, "
+              f"detected {len(episodes)} episodes in {time.perf_counter() - loaded:.2f}s.")
+
+    kept = "to_char(e.started_at, 'YYYY-MM') = ANY(CAST(:archived AS TEXT[]))"
+    if bounds is None and not archived:
+        conn.execute(text(f"TRUNCATE TABLE {EPISODES_TABLE}"))
+    elif bounds is None:
+        conn.execute(text(f"DELETE FROM {EPISODES_TABLE} e WHERE NOT {kept}"), {"archived": archived})
+    else:
+        conn.execute(text(f"""
+            DELETE FROM {EPISODES_TABLE} e
+            USING unnest(CAST(:vehicles AS TEXT[]), CAST(:lower AS TIMESTAMP[])) AS b(vehicle_no, lower_at)
+            WHERE e.vehicle_no = b.vehicle_no AND e.started_at >= b.lower_at AND NOT {kept}
+        """), {"vehicles": list(bounds), "lower": [t.to_pydatetime() for t in bounds.values()],
+               "archived": archived})
+    if len(episodes):
+        if loader == 'copy' and not supports_copy(conn):
+            loader = 'executemany'
+        write_frame(conn, episodes, loader, EPISODES_TABLE, verbose=False, cols=EPISODE_COLS)
+        if archived:
+            dropped = conn.execute(text(f"""
+                DELETE FROM {EPISODES_TABLE} n USING {EPISODES_TABLE} e
+                WHERE {kept} AND NOT to_char(n.started_at, 'YYYY-MM') = ANY(CAST(:archived AS TEXT[]))
+                  AND n.rule = e.rule AND n.vehicle_no = e.vehicle_no
+                  AND n.started_at <= e.ended_at AND n.ended_at >= e.started_at
+            """), {"archived": archived}).rowcount
+            return len(episodes) - dropped
+    return len(episodes)
+
+def build_rules(args):
+    rules = []
+    if args.window:
+        rules.append({'rule': 'window', 'count': int(args.window[0]), 'hours': args.window[1]})
+    if args.shift_count:
+        rules.append({'rule': 'shift', 'count': args.shift_count})
+    if args.consecutive_shifts:
+        rules.append({'rule': 'consecutive_shifts', 'shifts': args.consecutive_shifts})
+    return rules or RULES
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect repeat-offender episodes in fms_fatigue_alerts")
+    parser.add_argument("--window", nargs=2, type=float, metavar=("COUNT", "HOURS"),
+                        help="flag COUNT alerts of a vehicle within HOURS")
+    parser.add_argument("--shift-count", type=int, metavar="N", help="flag N alerts of a vehicle in one shift")
+    parser.add_argument("--consecutive-shifts", type=int, metavar="N", help="flag alerts on N consecutive shifts")
+    parser.add_argument("--dry-run", action="store_true", help="detect and report without writing episodes")
+    parser.add_argument("--json", action="store_true", help="print the episodes as JSON lines")
+    args = parser.parse_args()
+    if not database_url():
+        sys.exit("Error: DATABASE_URL not found in .env")
+    rules = build_rules(args)
+    print(f"Rules: {', '.join(rule_name(spec) for spec in rules)}", file=sys.stderr if args.json else sys.stdout)
+
+    if args.dry_run:
+        with get_engine().connect() as conn:
+            started = time.perf_counter()
+            df = load_alerts(conn)
+        loaded = time.perf_counter()
+        episodes = detect(alert_arrays(df), rules)
+        print(f"Loaded {len(df)} alerts in {loaded - started:.2f}s, "
+              f"detected {len(episodes)} episodes in {time.perf_counter() - loaded:.2f}s.",
+              file=sys.stderr if args.json else sys.stdout)
+    else:
+        written = run_in_transaction(refresh_episodes, None, rules, verbose=True)
+        print(f"Episodes rebuilt ({written} rows in {EPISODES_TABLE}).")
+        if not args.json:
+            return
+        with get_engine().connect() as conn:
+            episodes = pd.read_sql(text(f"SELECT {', '.join(EPISODE_COLS)} FROM {EPISODES_TABLE}"), conn)
+
+    if args.json:
+        sys.stdout.write(episodes.to_json(orient='records', lines=True, date_format='iso'))
+    else:
+        counts = episodes.groupby('rule').size().to_dict() if len(episodes) else {}
+        print(f"Episodes per rule: {counts}")
+
+if __name__ == "__main__":
+    main()
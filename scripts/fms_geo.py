@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # coordinates are parsed by pandas' (slower) str.extract instead
+    pa = pc = None
+
+# Coordinates of FMS alerts: the "lat, lon" text of the export is parsed into numbers and
+# each alert gets the geohash of its position, computed for whole columns at once (bit
+# interleaving in NumPy, no per-row Python). A geohash prefix is the enclosing grid cell,
+# so one stored full-precision hash serves every map resolution: fms_fatigue_hotspots
+# counts alerts per left(geohash, HOTSPOT_PRECISION) cell.
+#
+#   lat, lon = parse_coordinates(frame['coordinate'])
+#   frame['geohash'] = geohash(lat, lon)      # e.g. 'qx6pjvvjz'
+
+# Characters stored per alert (~4.8 m x 4.8 m)
+GEOHASH_PRECISION = 9
+# Cell size of the hotspot table: 6 is ~1.2 km x 0.6 km, 7 ~153 m x 153 m, 8 ~38 m x 19 m
+HOTSPOT_PRECISION = int(os.getenv('FMS_HOTSPOT_PRECISION', 7))
+
+BASE32 = np.frombuffer(b'0123456789bcdefghjkmnpqrstuvwxyz', dtype='uint8')
+
+# "lat, lon", also with ';' or blanks between them and optional parentheses
+COORDINATE = r'^\s*\(?\s*(?P<lat>[-+]?\d+(?:\.\d+)?)\s*[,; ]\s*(?P<lon>[-+]?\d+(?:\.\d+)?)\s*\)?\s*$'
+
+def parse_coordinates(col):
+    """(lat, lon) float Series of a coordinate text column; NaN where unparseable or out of range."""
+    if pc is not None:
+        # One regex pass in Arrow over the whole column
+        parts = pc.extract_regex(pa.array(col.astype('string'), type=pa.string()), COORDINATE)
+        lat, lon = (pd.Series(pc.cast(pc.struct_field(parts, f), pa.float64()).to_numpy(zero_copy_only=False),
+                              index=col.index) for f in ('lat', 'lon'))
+    else:
+        parts = col.astype('string').str.extract(COORDINATE)
+        lat = pd.to_numeric(parts['lat'], errors='coerce').astype('float64')
+        lon = pd.to_numeric(parts['lon'], errors='coerce').astype('float64')
+    bad = ~(lat.between(-90, 90) & lon.between(-180, 180))
+    return lat.mask(bad), lon.mask(bad)
+
+def geohash(lat, lon, precision=GEOHASH_PRECISION):
+    """Geohash strings of lat/lon Series (None where either is missing)."""
+    bits = precision * 5
+    lon_bits, lat_bits = (bits + 1) // 2, bits // 2
+    valid = (lat.notna() & lon.notna()).to_numpy()
+    la = lat.to_numpy(dtype='float64', na_value=0.0)
+    lo = lon.to_numpy(dtype='float64', na_value=0.0)
+    # Position as integer steps of the finest cell; the upper bound falls in the last cell
+    lat_q = np.minimum(((la + 90.0) / 180.0 * (1 << lat_bits)).astype('int64'), (1 << lat_bits) - 1)
+    lon_q = np.minimum(((lo + 180.0) / 360.0 * (1 << lon_bits)).astype('int64'), (1 << lon_bits) - 1)
+
+    # Interleave, longitude first: bit i of the hash (from the top) comes from lon when i is even
+    code = np.zeros(len(la), dtype='int64')
+    for i in range(bits):
+        if i % 2 == 0:
+            bit = (lon_q >> (lon_bits - 1 - i // 2)) & 1
+        else:
+            bit = (lat_q >> (lat_bits - 1 - i // 2)) & 1
+        code = (code << 1) | bit
+
+    chars = np.empty((len(la), precision), dtype='uint8')
+    for k in range(precision):
+        chars[:, k] = BASE32[(code >> (5 * (precision - 1 - k))) & 31]
+    hashes = chars.view(f'S{precision}').ravel().astype(str).astype(object)
+    hashes[~valid] = None
+    return pd.Series(hashes, index=lat.index, dtype='string')
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# Header resolution for FMS exports: every known spelling of a column (English export,
+# Indonesian sheet, already-mapped names) maps to one canonical fms_fatigue_alerts column.
+# Headers are matched case-insensitively with whitespace and '_' normalized, through an
+# index compiled once at import; resolving a file costs O(columns), independent of rows.
+#
+#   resolution = resolve_headers(df.columns)
+#   resolution.columns   # {'alert_date': 'Tanggal', ...}
+#   resolution.unknown   # headers that match no alias
+
+# Canonical column -> accepted headers, highest priority first. When several headers of a
+# file match one column, the highest-priority one is used and the others are reported.
+HEADER_ALIASES = {
+    'alert_date': ['Date', 'Tanggal', 'violation_date', 'alert_date'],
+    'alert_time': ['Time', 'Waktu', 'violation_time', 'alert_time'],
+    'vehicle_no': ['Vehicle No', 'Vehicle No Company', 'No Lambung'],
+    'company': ['Company', 'Perusahaan'],
+    'violation': ['Violation', 'Jenis Pelanggaran', 'violation_type'],
+    'location': ['Location', 'Lokasi'],
+    'opr_date': ['Date Opr', 'Tanggal Opr', 'opr_date'],
+    'shift': ['Shift'],
+    'week': ['Week', 'Minggu'],
+    'month': ['Month', 'Bulan'],
+    'coordinate': ['Coordinate', 'Coordinate Level', 'Koordinat'],
+    'level': ['Level'],
+    'validation_status': ['validation_status', 'Validation', 'Status Validasi', 'validate',
+                          'validation_validated', 'Status'],
+    # The supervisor's name is in 'Pengawas FMS'; a 'validated_by' column is only a fallback
+    'validated_by': ['Pengawas FMS', 'validated_by'],
+    'validated_at': ['validated_at', 'Waktu Validasi'],
+}
+
+DATE_COLUMNS = ['alert_date', 'validated_at', 'opr_date']
+
+Resolution = namedtuple('Resolution', ['columns', 'duplicates', 'unknown'])
+Resolution.__doc__ = """columns: {canonical: source header}; duplicates: [(header, canonical)] not used
+because a higher-priority or earlier header won; unknown: headers matching no alias."""
+
+# pandas suffixes repeated header names with .1, .2, ...
+_MANGLED = re.compile(r'^(.*)\.(\d+)$')
+
+def normalize_header(header):
+    return ' '.join(str(header).replace('_', ' ').split()).casefold()
+
+def compile_aliases(aliases):
+    """{normalized header: (canonical, priority)}."""
+    index = {}
+    for canonical, names in aliases.items():
+        for priority, name in enumerate(names):
+            key = normalize_header(name)
+            if key in index and index[key][0] != canonical:
+                raise ValueError(f"header alias {name!r} is listed for both {index[key][0]} and {canonical}")
+            index.setdefault(key, (canonical, priority))
+    return index
+
+ALIAS_INDEX = compile_aliases(HEADER_ALIASES)
+
+def aliases_fingerprint(columns=None):
+    """Short hash of the aliases of `columns` (default all), for cache keys that depend on them."""
+    subset = {c: HEADER_ALIASES[c] for c in (columns or HEADER_ALIASES)}
+    return hashlib.sha256(json.dumps(subset, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+def _lookup(header):
+    match = ALIAS_INDEX.get(normalize_header(header))
+    if match is not None:
+        return match, False
+    mangled = _MANGLED.match(str(header))
+    if mangled:
+        match = ALIAS_INDEX.get(normalize_header(mangled.group(1)))
+        if match is not None:
+            return match, True
+    return None, False
+
+@lru_cache(maxsize=256)
+def _resolve(headers):
+    best = {}
+    unknown = []
+    for position, header in enumerate(headers):
+        match, repeated = _lookup(header)
+        if match is None:
+            unknown.append(header)
+            continue
+        canonical, priority = match
+        # A repeat ('Date.1') ranks after every real alias; ties go to the leftmost header
+        rank = (repeated, priority, position)
+        best.setdefault(canonical, []).append((rank, header))
+
+    columns, duplicates = {}, []
+    for canonical, candidates in best.items():
+        candidates.sort(key=lambda c: c[0])
+        columns[canonical] = candidates[0][1]
+        duplicates.extend((header, canonical) for _, header in candidates[1:])
+    return Resolution(columns, duplicates, unknown)
+
+def resolve_headers(headers):
+    """Resolve a file's headers (any iterable of names) to canonical columns. Memoized per header list."""
+    return _resolve(tuple(headers))
+
+def select_columns(df, resolution, canonical):
+    """The frame's resolved columns renamed to canonical names, in `canonical` order; missing ones are empty."""
+    present = [c for c in canonical if c in resolution.columns]
+    out = df[[resolution.columns[c] for c in present]]
+    out.columns = present
+    return out.reindex(columns=canonical)
+
+def describe(resolution):
+    """Human-readable lines about a resolution, for the ingest log."""
+    lines = [f"Mapped columns: {resolution.columns}"]
+    if resolution.duplicates:
+        lines.append("Ignored duplicate columns: " + ", ".join(f"{h!r} ({c})" for h, c in resolution.duplicates))
+    if resolution.unknown:
+        lines.append(f"Unrecognized columns (ignored): {resolution.unknown}")
+    return lines
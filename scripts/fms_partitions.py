@@ -0,0 +1,470 @@
+import argparse
+import os
+import re
+import sys
+from datetime import date
+
+from sqlalchemy import text
+from dbutil import database_url, get_engine, run_in_transaction
+from fms_common import ROW_SLICE_ROWS, file_sha256
+from fms_episodes import refresh_episodes
+from fms_schema import (ARCHIVES_TABLE, archived_months, ensure_ingest_schema, ensure_natural_key,
+                        refresh_rollup, refresh_hotspots)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # partitions can still be managed; archiving and restoring need pyarrow
+    pa = pq = None
+
+# Monthly range partitions of fms_fatigue_alerts on alert_date, and Parquet archival of old
+# months. alert_date is 'YYYY-MM-DD' text, so a month is the range ['YYYY-MM-01', next month)
+# and queries bounded by alert_date only scan the partitions of the months they touch. Rows
+# outside every monthly partition land in the DEFAULT partition until the next run moves
+# them into their own month.
+#
+#   python scripts/fms_partitions.py --convert            # one-time: partition the table
+#   python scripts/fms_partitions.py                      # create months ahead, archive old ones
+#   python scripts/fms_partitions.py --restore 2024-03    # bring an archived month back
+#   python scripts/fms_partitions.py --status
+#
+# An archived month is written to zstd Parquet under FMS_ARCHIVE_DIR, checked against the
+# partition's row count, recorded in fms_fatigue_archives and only then detached and dropped.
+# The rollup, hotspot and episode rows of an archived month are frozen as they were when it
+# was archived: full rebuilds (--refresh-rollup, --refresh-hotspots, fms_episodes.py, replace
+# ingests) only rebuild the attached months, and the hotspot precision can't change while
+# archived months have cells. Rows loaded into an archived month wait in DEFAULT and are
+# not counted until --restore. A restored month stays attached until it is archived again
+# explicitly (--archive MONTH).
+
+ALERTS_TABLE = "fms_fatigue_alerts"
+DEFAULT_PARTITION = f"{ALERTS_TABLE}_default"
+LEGACY_TABLE = f"{ALERTS_TABLE}_unpartitioned"
+
+# Months created ahead of the current one
+AHEAD_MONTHS = int(os.getenv('FMS_PARTITION_AHEAD', 3))
+# Months kept in the database, the current one included; 0 keeps everything
+RETENTION_MONTHS = int(os.getenv('FMS_RETENTION_MONTHS', 24))
+ARCHIVE_DIR = os.getenv('FMS_ARCHIVE_DIR',
+                        os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'archive', ALERTS_TABLE))
+
+MONTH = re.compile(r'^(\d{4})-(\d{2})$')
+
+# Postgres column types -> Arrow; anything else is archived as its text form
+ARROW_TYPES = {
+    'text': 'string', 'character varying': 'string',
+    'integer': 'int32', 'bigint': 'int64', 'smallint': 'int16',
+    'double precision': 'float64', 'real': 'float32', 'boolean': 'bool',
+    'timestamp without time zone': 'timestamp[us]', 'date': 'date32',
+}
+
+def parse_month(value):
+    """'YYYY-MM' -> (year, month)."""
+    m = MONTH.match(value or '')
+    if not m or not 1 <= int(m.group(2)) <= 12:
+        raise ValueError(f"month must be YYYY-MM, got {value!r}")
+    return int(m.group(1)), int(m.group(2))
+
+def add_months(month, n):
+    year, mon = parse_month(month)
+    index = year * 12 + mon - 1 + n
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+def month_bounds(month):
+    """alert_date range [lower, upper) of a month."""
+    return f"{month}-01", f"{add_months(month, 1)}-01"
+
+def partition_name(month):
+    return f"{ALERTS_TABLE}_{month.replace('-', '_')}"
+
+def current_month():
+    return date.today().strftime('%Y-%m')
+
+def is_partitioned(conn):
+    return conn.execute(text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"
+    ), {"table": ALERTS_TABLE}).scalar() is True
+
+def require_partitioned(conn):
+    if not is_partitioned(conn):
+        raise SystemExit(f"{ALERTS_TABLE} is not partitioned yet; run with --convert first.")
+
+def partitions(conn):
+    """{month: partition name} of the attached monthly partitions."""
+    rows = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:table)
+    """), {"table": ALERTS_TABLE}).scalars().all()
+    prefix = f"{ALERTS_TABLE}_"
+    found = {}
+    for name in rows:
+        month = name[len(prefix):].replace('_', '-')
+        if name.startswith(prefix) and MONTH.match(month):
+            found[month] = name
+    return found
+
+def column_types(conn, table=ALERTS_TABLE):
+    """[(column, data_type)] in table order."""
+    return conn.execute(text("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = :table ORDER BY ordinal_position
+    """), {"table": table}).all()
+
+def ensure_archive_schema(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {ARCHIVES_TABLE} (
+            month TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            archived_at TIMESTAMP DEFAULT NOW(),
+            restored_at TIMESTAMP
+        )
+    """))
+
+def months_in(conn, table):
+    """Distinct months ('YYYY-MM') of the alert dates in a table."""
+    return set(conn.execute(text(
+        f"SELECT DISTINCT left(alert_date, 7) FROM {table} WHERE alert_date ~ '^\\d{{4}}-\\d{{2}}-'"
+    )).scalars().all())
+
+def create_partition(conn, month):
+    """Attach the partition of a month, moving its rows out of the DEFAULT partition.
+
+    Returns the number of rows moved.
+    """
+    name = partition_name(month)
+    lower, upper = month_bounds(month)
+    bounds = {"lower": lower, "upper": upper}
+    waiting = conn.execute(text(
+        f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE alert_date >= :lower AND alert_date < :upper LIMIT 1"
+    ), bounds).first()
+    if not waiting:
+        conn.execute(text(
+            f"CREATE TABLE {name} PARTITION OF {ALERTS_TABLE} FOR VALUES FROM ('{lower}') TO ('{upper}')"
+        ))
+        return 0
+
+    # A new partition can't be attached while the DEFAULT partition holds rows of its range
+    col_list = ", ".join(c for c, _ in column_types(conn))
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {ALERTS_TABLE} INCLUDING DEFAULTS)"))
+    moved = conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE alert_date >= :lower AND alert_date < :upper
+            RETURNING {col_list}
+        )
+        INSERT INTO {name} ({col_list}) SELECT {col_list} FROM moved
+    """), bounds).rowcount
+    conn.execute(text(
+        f"ALTER TABLE {ALERTS_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    ))
+    return moved
+
+def ensure_partitions(conn, ahead=AHEAD_MONTHS, verbose=True):
+    """Create the partitions up to `ahead` months past the current one and give every month
+    waiting in the DEFAULT partition its own. Returns the months created."""
+    existing = partitions(conn)
+    archived = set(archived_months(conn))
+    wanted = {add_months(current_month(), n) for n in range(ahead + 1)}
+    # Rows of an archived month stay in DEFAULT until it is restored; merging them into the
+    # archive is left to --restore
+    wanted.update(m for m in months_in(conn, DEFAULT_PARTITION) if m not in archived)
+    created = []
+    for month in sorted(wanted - set(existing)):
+        moved = create_partition(conn, month)
+        created.append(month)
+        if verbose:
+            print(f"Created partition {partition_name(month)}" + (f" ({moved} rows moved from DEFAULT)" if moved else ""))
+    return created
+
+def ensure_months(conn, scope_table):
+    """Create the partitions of the months in scope_table (rows about to be loaded) that have
+    none yet, so they don't land in the DEFAULT partition. Returns the months created."""
+    if not is_partitioned(conn):
+        return []
+    months = months_in(conn, scope_table) - set(partitions(conn))
+    # Archived months are left to --restore
+    archived = sorted(months & set(archived_months(conn)))
+    if archived:
+        print(f"Warning: rows for archived months {', '.join(archived)} wait in {DEFAULT_PARTITION} "
+              f"and stay out of the rollup, hotspots and episodes until the months are restored.")
+        months -= set(archived)
+    for month in sorted(months):
+        create_partition(conn, month)
+    return sorted(months)
+
+def convert(conn, ahead=AHEAD_MONTHS, dedupe_existing=False):
+    """Turn fms_fatigue_alerts into a table partitioned by month of alert_date (once).
+
+    The rows are copied into the new table in the same transaction; the indexes are
+    recreated afterwards, so each partition builds its own in one pass over loaded data.
+    """
+    if is_partitioned(conn):
+        print(f"{ALERTS_TABLE} is already partitioned.")
+        return False
+    ensure_ingest_schema(conn)
+    # Every unique index of a partitioned table has to include alert_date: the natural key
+    # does, the primary key becomes (id, alert_date)
+    ensure_natural_key(conn, dedupe_existing)
+    conn.execute(text(f"LOCK TABLE {ALERTS_TABLE} IN ACCESS EXCLUSIVE MODE"))
+    indexes = conn.execute(text("""
+        SELECT i.indexname, i.indexdef FROM pg_indexes i
+        WHERE i.tablename = :table AND i.schemaname = current_schema()
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c
+                          WHERE c.conname = i.indexname AND c.conrelid = to_regclass(:table))
+    """), {"table": ALERTS_TABLE}).all()
+    months = months_in(conn, ALERTS_TABLE)
+
+    conn.execute(text(f"ALTER TABLE {ALERTS_TABLE} RENAME TO {LEGACY_TABLE}"))
+    conn.execute(text(f"""
+        CREATE TABLE {ALERTS_TABLE} (LIKE {LEGACY_TABLE} INCLUDING DEFAULTS INCLUDING COMMENTS)
+        PARTITION BY RANGE (alert_date)
+    """))
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {ALERTS_TABLE} DEFAULT"))
+    wanted = months | {add_months(current_month(), n) for n in range(ahead + 1)}
+    for month in sorted(wanted):
+        create_partition(conn, month)
+
+    col_list = ", ".join(c for c, _ in column_types(conn, LEGACY_TABLE))
+    copied = conn.execute(text(
+        f"INSERT INTO {ALERTS_TABLE} ({col_list}) SELECT {col_list} FROM {LEGACY_TABLE}"
+    )).rowcount
+    conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+
+    conn.execute(text(f"ALTER TABLE {ALERTS_TABLE} ADD PRIMARY KEY (id, alert_date)"))
+    for name, definition in indexes:
+        # The definitions name the table as it was before the rename, i.e. the new parent
+        conn.execute(text(definition))
+    print(f"Partitioned {ALERTS_TABLE}: {copied} rows in {len(partitions(conn))} monthly partitions, "
+          f"{len(indexes)} indexes recreated.")
+    return True
+
+def arrow_schema(columns):
+    return pa.schema([(name, pa.type_for_alias(ARROW_TYPES.get(dtype, 'string'))) for name, dtype in columns])
+
+def select_list(columns):
+    return ", ".join(name if dtype in ARROW_TYPES else f"{name}::text AS {name}" for name, dtype in columns)
+
+def archive_path(month, archive_dir=ARCHIVE_DIR):
+    return os.path.join(archive_dir, f"{ALERTS_TABLE}_{month}.parquet")
+
+def write_parquet(conn, table, columns, path):
+    """Write a table to zstd Parquet, ROW_SLICE_ROWS rows per row group. Returns the row count."""
+    schema = arrow_schema(columns)
+    names = [name for name, _ in columns]
+    tmp_path = f"{path}.tmp"
+    rows = 0
+    result = conn.execute(
+        text(f"SELECT {select_list(columns)} FROM {table} ORDER BY alert_date, alert_time"),
+        execution_options={"stream_results": True},
+    )
+    with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+        for part in result.partitions(ROW_SLICE_ROWS):
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array([r[i] for r in part], type=schema.field(i).type) for i in range(len(names))],
+                schema=schema,
+            )
+            writer.write_batch(batch)
+            rows += len(part)
+    os.replace(tmp_path, path)
+    return rows
+
+def archive_month(conn, month, archive_dir=ARCHIVE_DIR):
+    """Write a month to Parquet, then detach and drop its partition. Returns the rows archived."""
+    name = partition_name(month)
+    os.makedirs(archive_dir, exist_ok=True)
+    path = archive_path(month, archive_dir)
+    # No writes to the month while it is being archived
+    conn.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+    expected = conn.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar()
+    written = write_parquet(conn, name, column_types(conn, name), path)
+    stored = pq.ParquetFile(path).metadata.num_rows
+    if not written == stored == expected:
+        raise RuntimeError(f"archive of {month} has {stored} rows, the partition {expected}; partition kept")
+
+    conn.execute(text(f"ALTER TABLE {ALERTS_TABLE} DETACH PARTITION {name}"))
+    conn.execute(text(f"DROP TABLE {name}"))
+    conn.execute(text(f"""
+        INSERT INTO {ARCHIVES_TABLE} (month, path, rows, sha256, archived_at, restored_at)
+        VALUES (:month, :path, :rows, :sha256, NOW(), NULL)
+        ON CONFLICT (month) DO UPDATE SET path = EXCLUDED.path, rows = EXCLUDED.rows,
+            sha256 = EXCLUDED.sha256, archived_at = EXCLUDED.archived_at, restored_at = NULL
+    """), {"month": month, "path": os.path.abspath(path), "rows": expected, "sha256": file_sha256(path)})
+    return expected
+
+def expired_months(conn, retention=RETENTION_MONTHS):
+    """Attached months older than the retention window, except restored ones."""
+    if retention <= 0:
+        return []
+    cutoff = add_months(current_month(), -(retention - 1))
+    restored = set(conn.execute(text(
+        f"SELECT month FROM {ARCHIVES_TABLE} WHERE restored_at IS NOT NULL"
+    )).scalars().all())
+    return sorted(m for m in partitions(conn) if m < cutoff and m not in restored)
+
+def copy_parquet(conn, path, table, columns):
+    """COPY the rows of a Parquet archive into table. Returns the row count."""
+    names = [name for name, _ in columns]
+    col_list = ", ".join(names)
+    rows = 0
+    with conn.connection.driver_connection.cursor() as cur:
+        with cur.copy(f"COPY {table} ({col_list}) FROM STDIN") as copy:
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=ROW_SLICE_ROWS, columns=names):
+                for row in zip(*(batch.column(name).to_pylist() for name in names)):
+                    copy.write_row(row)
+                rows += batch.num_rows
+    return rows
+
+def restore_month(conn, month, verbose=True):
+    """Attach an archived month again from its Parquet file. Returns the rows restored.
+
+    Rows of the month loaded after it was archived wait in the DEFAULT partition; they are
+    moved into the restored partition and win over archived rows with the same natural key.
+    """
+    archive = conn.execute(text(
+        f"SELECT path, rows, sha256, restored_at FROM {ARCHIVES_TABLE} WHERE month = :month"
+    ), {"month": month}).first()
+    if archive is None:
+        raise SystemExit(f"{month} is not archived.")
+    if month in partitions(conn):
+        raise SystemExit(f"{month} is already attached as {partition_name(month)}.")
+    if file_sha256(archive.path) != archive.sha256:
+        raise SystemExit(f"{archive.path} doesn't match the checksum recorded when {month} was archived.")
+
+    name = partition_name(month)
+    lower, upper = month_bounds(month)
+    # Columns added to the table since the month was archived stay NULL
+    archived_cols = set(pq.read_schema(archive.path).names)
+    all_cols = ", ".join(c for c, _ in column_types(conn))
+    columns = [(c, t) for c, t in column_types(conn) if c in archived_cols]
+    col_list = ", ".join(c for c, _ in columns)
+
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {ALERTS_TABLE} INCLUDING DEFAULTS)"))
+    conn.execute(text(
+        f"CREATE TEMP TABLE restore_rows ON COMMIT DROP AS SELECT {col_list} FROM {ALERTS_TABLE} WITH NO DATA"
+    ))
+    restored = copy_parquet(conn, archive.path, 'restore_rows', columns)
+    if restored != archive.rows:
+        raise RuntimeError(f"{archive.path} has {restored} rows, {archive.rows} were archived")
+    newer = conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE alert_date >= :lower AND alert_date < :upper
+            RETURNING {all_cols}
+        )
+        INSERT INTO {name} ({all_cols}) SELECT {all_cols} FROM moved
+    """), {"lower": lower, "upper": upper}).rowcount
+    conn.execute(text(f"""
+        INSERT INTO {name} ({col_list})
+        SELECT {col_list} FROM restore_rows r
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {name} n
+            WHERE n.alert_date = r.alert_date AND n.alert_time = r.alert_time AND n.vehicle_no = r.vehicle_no
+              AND COALESCE(n.violation, '') = COALESCE(r.violation, '')
+        )
+    """))
+    conn.execute(text(
+        f"ALTER TABLE {ALERTS_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    ))
+    conn.execute(text(f"UPDATE {ARCHIVES_TABLE} SET restored_at = NOW() WHERE month = :month"), {"month": month})
+
+    # The month's derived rows were frozen while it was archived; rebuild them with the
+    # rows that waited in DEFAULT
+    refresh_rollup(conn, name)
+    refresh_hotspots(conn, name)
+    refresh_episodes(conn, name)
+    if verbose:
+        print(f"Restored {month}: {restored} archived rows" + (f", {newer} newer rows moved from DEFAULT" if newer else "")
+              + f" into {name}.")
+    return restored
+
+def status(conn):
+    rows = conn.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint,
+               pg_size_pretty(pg_total_relation_size(c.oid))
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname
+    """), {"table": ALERTS_TABLE}).all()
+    print(f"{len(rows)} partitions of {ALERTS_TABLE} (rows are planner estimates):")
+    for name, bound, estimate, size in rows:
+        print(f"  {name:<36} {max(estimate, 0):>10} rows {size:>10}  {bound}")
+    archives = conn.execute(text(
+        f"SELECT month, rows, archived_at, restored_at, path FROM {ARCHIVES_TABLE} ORDER BY month"
+    )).all()
+    if archives:
+        print(f"{len(archives)} archived months:")
+        for a in archives:
+            state = f"restored {a.restored_at:%Y-%m-%d %H:%M}" if a.restored_at else "archived"
+            print(f"  {a.month} {a.rows:>10} rows  {state:<26} {a.path}")
+
+def require_pyarrow():
+    if pq is None:
+        raise SystemExit("Archiving needs pyarrow (pip install pyarrow); use --retention-months 0 to skip it.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Monthly partitions and Parquet archival of fms_fatigue_alerts")
+    parser.add_argument("--convert", action="store_true",
+                        help="partition fms_fatigue_alerts by month of alert_date (one-time; locks the table)")
+    parser.add_argument("--dedupe-existing", action="store_true",
+                        help="--convert: delete rows repeating a natural key (keeping the most recent copy) "
+                             "instead of aborting")
+    parser.add_argument("--ahead", type=int, default=AHEAD_MONTHS, metavar="N",
+                        help=f"months to create past the current one (default {AHEAD_MONTHS}, FMS_PARTITION_AHEAD)")
+    parser.add_argument("--retention-months", type=int, default=RETENTION_MONTHS, metavar="N",
+                        help=f"months kept in the database before archiving, 0 for all "
+                             f"(default {RETENTION_MONTHS}, FMS_RETENTION_MONTHS)")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, metavar="DIR",
+                        help="directory of the Parquet archives (default FMS_ARCHIVE_DIR or archive/ in the repo)")
+    parser.add_argument("--archive", nargs='+', metavar="YYYY-MM", help="archive these months now and exit")
+    parser.add_argument("--restore", nargs='+', metavar="YYYY-MM", help="restore archived months and exit")
+    parser.add_argument("--status", action="store_true", help="list partitions and archives and exit")
+    parser.add_argument("--dry-run", action="store_true", help="report what a maintenance run would do")
+    args = parser.parse_args()
+    if not database_url():
+        sys.exit("Error: DATABASE_URL not found in .env")
+    for month in (args.archive or []) + (args.restore or []):
+        try:
+            parse_month(month)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.convert:
+        run_in_transaction(convert, args.ahead, args.dedupe_existing)
+        return
+    with get_engine().begin() as conn:
+        require_partitioned(conn)
+        ensure_archive_schema(conn)
+    if args.status:
+        with get_engine().connect() as conn:
+            status(conn)
+        return
+    if args.dry_run:
+        with get_engine().connect() as conn:
+            missing = sorted({add_months(current_month(), n) for n in range(args.ahead + 1)} - set(partitions(conn)))
+            print(f"Would create: {', '.join(missing) or 'nothing'}; "
+                  f"waiting in DEFAULT: {', '.join(sorted(months_in(conn, DEFAULT_PARTITION))) or 'nothing'}")
+            print(f"Would archive: {', '.join(expired_months(conn, args.retention_months)) or 'nothing'}")
+        return
+
+    if args.restore:
+        require_pyarrow()
+        for month in args.restore:
+            run_in_transaction(restore_month, month)
+        return
+    if args.archive:
+        months = args.archive
+        attached = run_in_transaction(partitions)
+        for month in months:
+            if month not in attached:
+                sys.exit(f"{month} has no attached partition.")
+    else:
+        run_in_transaction(ensure_partitions, args.ahead)
+        months = run_in_transaction(expired_months, args.retention_months)
+    if months:
+        require_pyarrow()
+    # One transaction per month: a failed archive keeps its partition and the months before it
+    for month in months:
+        rows = run_in_transaction(archive_month, month, args.archive_dir)
+        print(f"Archived {month} ({rows} rows) to {archive_path(month, args.archive_dir)}")
+
+if __name__ == "__main__":
+    main()
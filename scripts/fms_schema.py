@@ -0,0 +1,266 @@
+from sqlalchemy import text
+
+from fms_geo import HOTSPOT_PRECISION
+
+# Tables of the FMS fatigue pipeline and the derived tables rebuilt from fms_fatigue_alerts:
+# their schema fallbacks, the natural key and the rollup/hotspot refreshes. Shared by
+# ingest_fatigue.py and fms_partitions.py; fms_episodes.py keeps its own table.
+#
+#   ensure_ingest_schema(conn)
+#   refresh_rollup(conn, 'fms_fatigue_staging')   # only the dates staged
+#   refresh_hotspots(conn)                        # every attached month
+
+# Core columns of fms_fatigue_alerts (also the text columns of fms_fatigue_rejects)
+TARGET_COLS = [
+    'alert_date', 'alert_time', 'vehicle_no', 'company', 'violation', 'location',
+    'opr_date', 'shift', 'week', 'month', 'coordinate', 'level',
+    'validation_status', 'validated_by', 'validated_at'
+]
+
+# Natural key of an alert; violation is coalesced so NULLs still collide in the unique index
+NATURAL_KEY = ['alert_date', 'alert_time', 'vehicle_no', 'violation']
+NATURAL_KEY_SQL = "alert_date, alert_time, vehicle_no, (COALESCE(violation, ''))"
+NATURAL_KEY_INDEX = "UQ_fms_fatigue_natural_key"
+
+ROLLUP_TABLE = "fms_fatigue_rollup"
+# Alert counts per (month, geohash cell, shift, violation), see fms_geo.py
+HOTSPOTS_TABLE = "fms_fatigue_hotspots"
+# Rows failing validation (fms_validation.py), with the values as read and the reasons
+REJECTS_TABLE = "fms_fatigue_rejects"
+
+# Months archived to Parquet by fms_partitions.py
+ARCHIVES_TABLE = "fms_fatigue_archives"
+
+def archived_months(conn):
+    """The months archived and not restored, oldest first ([] before anything is archived)."""
+    if not conn.execute(text("SELECT to_regclass(:table)"), {"table": ARCHIVES_TABLE}).scalar():
+        return []
+    return conn.execute(text(
+        f"SELECT month FROM {ARCHIVES_TABLE} WHERE restored_at IS NULL ORDER BY month"
+    )).scalars().all()
+
+def missing_columns(conn, table, columns):
+    """The columns of `columns` that table doesn't have (yet)."""
+    present = set(conn.execute(text(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = :table"
+    ), {"table": table}).scalars().all())
+    return [c for c in columns if c not in present]
+
+def missing_indexes(conn, table, names):
+    """The index names of `names` that don't exist on table."""
+    present = set(conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = :table"
+    ), {"table": table}).scalars().all())
+    return [n for n in names if n not in present]
+
+def ensure_ingest_schema(conn):
+    """Add the row fingerprint and employee_id columns and the ingest tables if they are missing.
+
+    The columns are declared in run_migrations.COLUMN_FIXES; this is the fallback for a
+    database the migrations haven't run on. Nothing is altered (and no lock taken on the
+    alerts table) when they are already there.
+    """
+    has_row_hash = conn.execute(text(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = 'fms_fatigue_alerts' AND column_name = 'row_hash'"
+    )).first()
+    if not has_row_hash:
+        print("Adding row_hash column to fms_fatigue_alerts...")
+        conn.execute(text("ALTER TABLE fms_fatigue_alerts ADD COLUMN row_hash BIGINT"))
+        conn.execute(text('CREATE INDEX IF NOT EXISTS "IDX_fms_fatigue_row_hash" ON fms_fatigue_alerts (row_hash)'))
+
+    if missing_columns(conn, 'fms_fatigue_alerts', ['employee_id']):
+        print("Adding employee_id column to fms_fatigue_alerts...")
+        conn.execute(text("ALTER TABLE fms_fatigue_alerts ADD COLUMN employee_id TEXT"))
+    if missing_indexes(conn, 'fms_fatigue_alerts', ['IDX_fms_fatigue_employee']):
+        conn.execute(text('CREATE INDEX IF NOT EXISTS "IDX_fms_fatigue_employee" ON fms_fatigue_alerts (employee_id)'))
+    geo_types = {'lat': "DOUBLE PRECISION", 'lon': "DOUBLE PRECISION", 'geohash': "TEXT"}
+    missing = missing_columns(conn, 'fms_fatigue_alerts', list(geo_types))
+    if missing:
+        print(f"Adding {', '.join(missing)} column(s) to fms_fatigue_alerts...")
+        conn.execute(text(
+            "ALTER TABLE fms_fatigue_alerts " + ", ".join(f"ADD COLUMN {c} {geo_types[c]}" for c in missing)
+        ))
+    if missing_indexes(conn, 'fms_fatigue_alerts', ['IDX_fms_fatigue_geohash']):
+        # text_pattern_ops: a cell is a geohash prefix, so its alerts are found with geohash LIKE 'cell%'
+        conn.execute(text(
+            'CREATE INDEX IF NOT EXISTS "IDX_fms_fatigue_geohash" ON fms_fatigue_alerts (geohash text_pattern_ops)'
+        ))
+
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS fms_ingest_files (
+            id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid(),
+            source TEXT,
+            content_hash TEXT NOT NULL,
+            mode TEXT,
+            rows_written INTEGER,
+            ingested_at TIMESTAMP DEFAULT NOW()
+        )
+    """))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+            id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid(),
+            alert_date TEXT NOT NULL,
+            week INTEGER,
+            month TEXT,
+            shift TEXT,
+            validated_by TEXT,
+            employee_id TEXT,
+            validation_status TEXT,
+            total INTEGER NOT NULL,
+            fast INTEGER NOT NULL,
+            slow5 INTEGER NOT NULL,
+            slow10 INTEGER NOT NULL,
+            slow15 INTEGER NOT NULL,
+            hourly INTEGER[] NOT NULL,
+            refreshed_at TIMESTAMP DEFAULT NOW()
+        )
+    """))
+    if missing_columns(conn, ROLLUP_TABLE, ['employee_id']):
+        conn.execute(text(f"ALTER TABLE {ROLLUP_TABLE} ADD COLUMN employee_id TEXT"))
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS "IDX_fms_fatigue_rollup_date" ON {ROLLUP_TABLE} (alert_date)'))
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS "IDX_fms_fatigue_rollup_employee" ON {ROLLUP_TABLE} (employee_id)'))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {HOTSPOTS_TABLE} (
+            id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid(),
+            period TEXT NOT NULL,
+            precision INTEGER NOT NULL,
+            cell TEXT NOT NULL,
+            shift TEXT,
+            violation TEXT,
+            total INTEGER NOT NULL,
+            lat DOUBLE PRECISION NOT NULL,
+            lon DOUBLE PRECISION NOT NULL,
+            refreshed_at TIMESTAMP DEFAULT NOW()
+        )
+    """))
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS "IDX_fms_fatigue_hotspots_cell" ON {HOTSPOTS_TABLE} (precision, cell)'))
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS "IDX_fms_fatigue_hotspots_period" ON {HOTSPOTS_TABLE} (period)'))
+    reject_cols = ",\n            ".join(f"{c} TEXT" for c in TARGET_COLS)
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {REJECTS_TABLE} (
+            id VARCHAR PRIMARY KEY DEFAULT gen_random_uuid(),
+            source TEXT,
+            source_row INTEGER,
+            reasons TEXT NOT NULL,
+            {reject_cols},
+            rejected_at TIMESTAMP DEFAULT NOW()
+        )
+    """))
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS "IDX_fms_fatigue_rejects_source" ON {REJECTS_TABLE} (source)'))
+
+def has_natural_key(conn):
+    return conn.execute(text(
+        "SELECT 1 FROM pg_indexes WHERE tablename = 'fms_fatigue_alerts' AND indexname = :name"
+    ), {"name": NATURAL_KEY_INDEX}).first() is not None
+
+def ensure_natural_key(conn, dedupe_existing=False):
+    """Create the unique index incremental upserts rely on (first run only).
+
+    Rows loaded by earlier full reloads may repeat a key. They are reported and the run is
+    aborted, unless dedupe_existing is set: then only the most recent copy of each is kept.
+    """
+    if has_natural_key(conn):
+        return
+
+    duplicates = conn.execute(text(f"""
+        SELECT {NATURAL_KEY_SQL}, COUNT(*) - 1 FROM fms_fatigue_alerts
+        GROUP BY {NATURAL_KEY_SQL} HAVING COUNT(*) > 1
+        ORDER BY 1, 2, 3
+    """)).all()
+    if duplicates:
+        extra = sum(row[-1] for row in duplicates)
+        print(f"{extra} duplicate rows repeat {len(duplicates)} natural keys (alert_date, alert_time, vehicle_no, violation):")
+        for row in duplicates[:20]:
+            print(f"  {row[0]} {row[1]} {row[2]!r} {row[3]!r}: {row[-1] + 1} rows")
+        if len(duplicates) > 20:
+            print(f"  ... and {len(duplicates) - 20} more keys")
+        if not dedupe_existing:
+            raise ValueError(f"fms_fatigue_alerts has {extra} duplicate rows; rerun with --dedupe-existing to keep "
+                             f"the most recent copy of each key and create {NATURAL_KEY_INDEX}")
+        removed = conn.execute(text(f"""
+            DELETE FROM fms_fatigue_alerts WHERE ctid IN (
+                SELECT ctid FROM (
+                    SELECT ctid, ROW_NUMBER() OVER (
+                        PARTITION BY {NATURAL_KEY_SQL}
+                        ORDER BY updated_at DESC NULLS LAST, ctid DESC
+                    ) AS rn
+                    FROM fms_fatigue_alerts
+                ) d WHERE rn > 1
+            )
+        """)).rowcount
+        print(f"Removed {removed} duplicate rows before creating the natural key index.")
+    print(f"Creating unique index {NATURAL_KEY_INDEX}...")
+    conn.execute(text(f'CREATE UNIQUE INDEX "{NATURAL_KEY_INDEX}" ON fms_fatigue_alerts ({NATURAL_KEY_SQL})'))
+
+def refresh_rollup(conn, scope_table=None):
+    """Rebuild the dashboard rollup: one row per (alert_date, week, month, shift, supervisor, employee, status).
+
+    The summary route sums these instead of scanning fms_fatigue_alerts. With scope_table
+    (a staging table) only the alert dates it touches are rebuilt; the natural key includes
+    alert_date, so an upsert never moves a row to another date. Dates of archived months
+    (fms_partitions.py) keep the rows they had when the month was archived.
+    """
+    # Same bucketing as the summary route: SLA buckets only count sla_seconds > 0, hour is
+    # the leading number of alert_time (parseInt semantics)
+    hourly = ", ".join(f"COUNT(*) FILTER (WHERE alert_hour = {h})" for h in range(24))
+    scoped = scope_table is not None and conn.execute(text(f"SELECT 1 FROM {ROLLUP_TABLE} LIMIT 1")).first()
+    where = "WHERE left(alert_date, 7) <> ALL(CAST(:archived AS TEXT[]))"
+    if scoped:
+        where += f" AND alert_date IN (SELECT DISTINCT alert_date FROM {scope_table})"
+    params = {"archived": archived_months(conn)}
+
+    conn.execute(text(f"DELETE FROM {ROLLUP_TABLE} {where}"), params)
+    return conn.execute(text(f"""
+        INSERT INTO {ROLLUP_TABLE} (alert_date, week, month, shift, validated_by, employee_id, validation_status,
+                                    total, fast, slow5, slow10, slow15, hourly)
+        SELECT alert_date, week, month, shift, validated_by, employee_id, validation_status,
+               COUNT(*),
+               COUNT(*) FILTER (WHERE sla_seconds > 0 AND sla_seconds <= 300),
+               COUNT(*) FILTER (WHERE sla_seconds > 300 AND sla_seconds <= 600),
+               COUNT(*) FILTER (WHERE sla_seconds > 600 AND sla_seconds <= 900),
+               COUNT(*) FILTER (WHERE sla_seconds > 900),
+               ARRAY[{hourly}]
+        FROM (
+            SELECT *, substring(btrim(alert_time) from '^[0-9]{{1,9}}')::int AS alert_hour
+            FROM fms_fatigue_alerts {where}
+            OFFSET 0  -- keeps the hour from being re-derived in each of the 24 filters
+        ) a
+        GROUP BY alert_date, week, month, shift, validated_by, employee_id, validation_status
+    """), params).rowcount
+
+def refresh_hotspots(conn, scope_table=None, precision=None):
+    """Rebuild the hotspot grid: alerts per (month, geohash cell, shift, violation) with their mean position.
+
+    Cells are the first `precision` characters of the alerts' geohash; by default the grid
+    keeps the precision it was built with (HOTSPOT_PRECISION for a new one). With scope_table
+    only the months it touches are rebuilt. Months archived by fms_partitions.py keep their
+    cells, so the precision can't change while their cells are stored.
+    """
+    stored = set(conn.execute(text(f"SELECT DISTINCT precision FROM {HOTSPOTS_TABLE}")).scalars())
+    if precision is None:
+        precision = next(iter(stored)) if len(stored) == 1 else HOTSPOT_PRECISION
+    archived = archived_months(conn)
+    if archived and stored - {precision} and conn.execute(text(
+        f"SELECT 1 FROM {HOTSPOTS_TABLE} WHERE period = ANY(:archived) AND precision <> :precision LIMIT 1"
+    ), {"archived": archived, "precision": precision}).first():
+        raise ValueError(f"hotspots of archived months are stored at precision {sorted(stored)}, not {precision}; "
+                         f"restore those months (fms_partitions.py --restore) before changing the precision")
+    scoped = scope_table is not None and stored == {precision}
+    months = f"SELECT DISTINCT left(alert_date, 7) FROM {scope_table}"
+    params = {"precision": precision, "archived": archived}
+
+    conn.execute(text(
+        f"DELETE FROM {HOTSPOTS_TABLE} WHERE period <> ALL(CAST(:archived AS TEXT[])) "
+        f"{f'AND period IN ({months})' if scoped else ''}"
+    ), params)
+    return conn.execute(text(f"""
+        INSERT INTO {HOTSPOTS_TABLE} (period, precision, cell, shift, violation, total, lat, lon)
+        SELECT left(alert_date, 7), :precision, left(geohash, :precision), shift, violation,
+               COUNT(*), AVG(lat), AVG(lon)
+        FROM fms_fatigue_alerts
+        WHERE geohash IS NOT NULL AND left(alert_date, 7) <> ALL(CAST(:archived AS TEXT[]))
+          {f'AND left(alert_date, 7) IN ({months})' if scoped else ''}
+        GROUP BY left(alert_date, 7), left(geohash, :precision), shift, violation
+    """), params).rowcount
+
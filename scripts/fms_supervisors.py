@@ -0,0 +1,136 @@
+import re
+import unicodedata
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+# Resolution of the free-text supervisor names of FMS exports ("Pengawas FMS", stored in
+# validated_by) to employee ids. The employee names are indexed once per run: a dict of
+# normalized names for exact matches and a trigram inverted index for near matches (typos,
+# dropped or swapped letters). Each distinct name is resolved once and memoized, so a chunk
+# costs one lookup per distinct supervisor rather than per row.
+#
+#   index = load_supervisor_index(conn)
+#   frame['employee_id'] = index.resolve_column(frame['validated_by'], unresolved)
+#   unresolved            # {name: rows} of names that matched no single employee
+
+# Trigram similarity (shared / union, as pg_trgm's similarity()) a near match must reach
+MIN_SIMILARITY = 0.6
+
+Match = namedtuple('Match', ['employee_id', 'method', 'similarity', 'candidate'])
+NO_MATCH = Match(None, 'none', 0.0, None)
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+def normalize_name(name):
+    """Casefolded, accent-free name with punctuation dropped and whitespace collapsed."""
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+    return _NON_ALNUM.sub(' ', name.casefold()).strip()
+
+def trigrams(normalized):
+    """pg_trgm-style trigrams: each word padded with two spaces in front and one behind."""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class SupervisorIndex:
+    def __init__(self, employees, min_similarity=MIN_SIMILARITY):
+        """employees: (employee_id, name) pairs."""
+        self.min_similarity = min_similarity
+        self.ids = []
+        self.names = []
+        # Normalized name -> employee ids; a name shared by several employees matches none of them
+        self.exact = {}
+        postings = {}
+        sizes = []
+        for employee_id, name in employees:
+            key = normalize_name(name) if name is not None else ''
+            if not key:
+                continue
+            i = len(self.ids)
+            self.ids.append(employee_id)
+            self.names.append(name)
+            self.exact.setdefault(key, set()).add(employee_id)
+            grams = trigrams(key)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self.sizes = np.array(sizes, dtype='int64')
+        self.postings = {gram: np.array(ids, dtype='int64') for gram, ids in postings.items()}
+        self.memo = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def resolve(self, name):
+        """Match for one supervisor name, memoized on the name as written."""
+        match = self.memo.get(name)
+        if match is None:
+            match = self.memo[name] = self._resolve(name)
+        return match
+
+    def _resolve(self, name):
+        key = normalize_name(name)
+        if not key:
+            return NO_MATCH
+        ids = self.exact.get(key)
+        if ids is not None:
+            if len(ids) == 1:
+                return Match(next(iter(ids)), 'exact', 1.0, name)
+            return Match(None, 'ambiguous', 1.0, name)
+        return self._near(key)
+
+    def _near(self, key):
+        grams = trigrams(key)
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        if not lists:
+            return NO_MATCH
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.ids))
+        similarity = shared / (len(grams) + self.sizes - shared)
+        best = int(similarity.argmax())
+        score = float(similarity[best])
+        candidate = self.names[best]
+        if score < self.min_similarity:
+            return Match(None, 'none', score, candidate)
+        # Another employee just as close (e.g. two people with the same name) leaves it open
+        tied = np.flatnonzero(similarity == score)
+        if len({self.ids[i] for i in tied}) > 1:
+            return Match(None, 'ambiguous', score, candidate)
+        return Match(self.ids[best], 'trigram', score, candidate)
+
+    def resolve_column(self, names, unresolved=None):
+        """Employee id per row of a (preferably categorical) name column, as a categorical.
+
+        Names that resolve to no single employee are counted per row in `unresolved`.
+        """
+        if not isinstance(names.dtype, pd.CategoricalDtype):
+            names = names.astype('category')
+        matches = [self.resolve(name) for name in names.cat.categories]
+        # Missing names have code -1, which picks the trailing None
+        lookup = np.array([m.employee_id for m in matches] + [None], dtype=object)
+        ids = pd.Series(lookup[names.cat.codes.to_numpy()], index=names.index).astype('category')
+        if unresolved is not None:
+            counts = np.bincount(names.cat.codes.to_numpy() + 1, minlength=len(matches) + 1)[1:]
+            for name, match, rows in zip(names.cat.categories, matches, counts):
+                if match.employee_id is None and rows:
+                    unresolved[name] = unresolved.get(name, 0) + int(rows)
+        return ids
+
+    def report(self, unresolved):
+        """Unresolved names as a frame: name, rows, reason and the closest employee name."""
+        rows = []
+        for name, count in sorted(unresolved.items(), key=lambda kv: (-kv[1], kv[0])):
+            match = self.resolve(name)
+            rows.append({'name': name, 'rows': count, 'reason': match.method,
+                         'closest': match.candidate, 'similarity': round(match.similarity, 3)})
+        return pd.DataFrame(rows, columns=['name', 'rows', 'reason', 'closest', 'similarity'])
+
+def load_supervisor_index(conn, min_similarity=MIN_SIMILARITY):
+    """Index of all employees (empty when the employees table doesn't exist)."""
+    if conn.execute(text("SELECT to_regclass('employees')")).scalar() is None:
+        return SupervisorIndex([], min_similarity)
+    return SupervisorIndex(conn.execute(text("SELECT id, name FROM employees")).all(), min_similarity)
@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Row-level validation of mapped, typed FMS chunks. Each rule yields a boolean "bad" mask
+# over the whole chunk, so validating costs a handful of vectorized passes no matter how
+# many rows fail. Rows failing any rule are split off with their reasons for quarantine.
+#
+#   accepted, rejected = validate(frame, derived)
+#   rejected['reasons']   # e.g. "required:vehicle_no; date_format:alert_date"
+#
+# A rule with 'severity': 'warn' never rejects; the rows it flags are loaded and counted
+# per rule in the `warnings` dict passed to validate().
+
+# Shift labels of the exports, in their order within an operating day (fms_episodes.py
+# counts consecutive shifts by it). Set FMS_SHIFTS for exports labelled otherwise,
+# e.g. FMS_SHIFTS="Day,Night".
+KNOWN_SHIFTS = [s.strip() for s in os.getenv('FMS_SHIFTS', 'Shift 1,Shift 2').split(',') if s.strip()]
+
+# Declarative rules, applied in order. Every rule only judges values that are present, except
+# 'required'. Columns named in `derived` (alert_offset, sla_delay) are computed by the transform.
+RULES = [
+    {'rule': 'required', 'column': 'alert_date'},
+    {'rule': 'required', 'column': 'alert_time'},
+    {'rule': 'required', 'column': 'vehicle_no'},
+    {'rule': 'date_format', 'column': 'alert_date'},
+    {'rule': 'date_format', 'column': 'opr_date'},
+    {'rule': 'date_format', 'column': 'validated_at'},
+    {'rule': 'time_format', 'column': 'alert_time', 'parsed': 'alert_offset'},
+    # Seconds from alert to validation: a few minutes of clock skew is tolerated (and
+    # clamped to 0), anything beyond 30 days is a wrong date rather than a slow validation
+    {'rule': 'range', 'column': 'sla_delay', 'min': -300, 'max': 30 * 86400},
+    {'rule': 'range', 'column': 'level', 'min': 1, 'max': 5},
+    # An unknown shift label is most likely a site's own naming, not a broken row
+    {'rule': 'allowed', 'column': 'shift', 'values': KNOWN_SHIFTS, 'severity': 'warn'},
+]
+
+def normalize_label(value):
+    """Casefolded label with whitespace collapsed ('  SHIFT  1' -> 'shift 1')."""
+    return ' '.join(str(value).split()).casefold()
+
+def normalize_labels(values):
+    """normalize_label() over a Series."""
+    return values.astype('string').str.split().str.join(' ').str.casefold()
+
+def _per_category(col, test):
+    """Evaluate test on each distinct value of a categorical column and map the result to its rows."""
+    hits = np.asarray(test(pd.Series(col.cat.categories)).fillna(False), dtype=bool)
+    # Missing values have code -1, which picks the trailing False
+    hits = np.append(hits, False)
+    return pd.Series(hits[col.cat.codes.to_numpy()], index=col.index)
+
+def check_required(df, derived, column, **_):
+    col = df[column]
+    if pd.api.types.is_datetime64_any_dtype(col) or pd.api.types.is_numeric_dtype(col):
+        return col.isna()
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col.isna() | _per_category(col, lambda v: v.astype('string').str.strip() == '')
+    return col.isna() | (col.astype('string').str.strip() == '')
+
+def check_date_format(df, derived, column, **_):
+    # A value was given (derived['raw_present']) but parsing coerced it to NaT
+    return derived['raw_present'][column] & df[column].isna()
+
+def check_time_format(df, derived, column, parsed, **_):
+    return df[column].notna() & derived[parsed].isna()
+
+def check_range(df, derived, column, min=None, max=None, **_):
+    values = derived[column] if column in derived else df[column]
+    numbers = pd.to_numeric(values, errors='coerce')
+    bad = values.notna() & numbers.isna()
+    if min is not None:
+        bad |= numbers < min
+    if max is not None:
+        bad |= numbers > max
+    return bad.fillna(False)
+
+def check_allowed(df, derived, column, values, **_):
+    col = df[column]
+    allowed = {normalize_label(v) for v in values}
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return _per_category(col, lambda v: ~normalize_labels(v).isin(allowed))
+    return col.notna() & ~normalize_labels(col).isin(allowed)
+
+CHECKS = {
+    'required': check_required,
+    'date_format': check_date_format,
+    'time_format': check_time_format,
+    'range': check_range,
+    'allowed': check_allowed,
+}
+
+def rule_label(spec):
+    return f"{spec['rule']}:{spec['column']}"
+
+def validate(df, derived, rules=RULES, warnings=None):
+    """Split a chunk into (accepted, rejected). rejected keeps the chunk's columns plus 'reasons'.
+
+    Accepted rows flagged by 'warn' rules are counted per rule label in `warnings`.
+    """
+    if df.empty:
+        return df, df.assign(reasons=pd.Series(dtype='string'))
+    masks = np.column_stack([
+        np.asarray(CHECKS[spec['rule']](df, derived, **{k: v for k, v in spec.items() if k not in ('rule', 'severity')}),
+                   dtype=bool)
+        for spec in rules
+    ])
+    rejecting = np.array([spec.get('severity', 'reject') != 'warn' for spec in rules])
+    bad = masks[:, rejecting].any(axis=1)
+    if warnings is not None:
+        for spec, hits in zip(rules, masks[~bad].sum(axis=0)):
+            if spec.get('severity') == 'warn' and hits:
+                label = rule_label(spec)
+                warnings[label] = warnings.get(label, 0) + int(hits)
+    if not bad.any():
+        return df, df.iloc[0:0].assign(reasons=pd.Series(dtype='string'))
+
+    # Reasons are only assembled for the (few) failing rows
+    labels = [rule_label(spec) for spec, r in zip(rules, rejecting) if r]
+    reasons = ["; ".join(label for label, hit in zip(labels, row) if hit) for row in masks[bad][:, rejecting]]
+    rejected = df[bad].assign(reasons=reasons)
+    return df[~bad], rejected
+
+def reason_counts(rejected):
+    """{rule label: rows} over a rejected frame (a row can count under several rules)."""
+    if rejected.empty:
+        return {}
+    return rejected['reasons'].str.split('; ').explode().value_counts().to_dict()
@@ -1,24 +1,168 @@
+import numpy as np
 import pandas as pd
-from datetime import datetime
-
-data = {
-    'Date': ['2023-10-26', '2023-10-26'],
-    'Time': ['10:00:00', '11:30:00'],
-    'Vehicle No': ['DT-01', 'DT-02'],
-    'Company': ['PT. TEST', 'PT. DEMO'],
-    'Violation': ['Fatigue', 'Distraction'],
-    'Location': ['Pit A', 'Pit B'],
-    'Date Opr': ['2023-10-26', '2023-10-26'],
-    'Shift': ['Day', 'Day'],
-    'Week': [43, 43],
-    'Month': [10, 10],
-    'Coordinate': ['-2.0, 115.0', '-2.1, 115.1'],
-    'Level': ['Medium', 'High'],
-    'validation_status': ['Valid', 'Belum Validasi'],
-    'validated_by': ['Supervisor A', None],
-    'validated_at': ['2023-10-26 10:05:00', None]
-}
-
-df = pd.DataFrame(data)
-df.to_excel('dummy_fatigue.xlsx', index=False)
-print("Dummy Excel created: dummy_fatigue.xlsx")
+import argparse
+import os
+import sys
+import time
+
+# Synthetic FMS fatigue alert exports (same headers as the FMS download) for testing
+# and benchmarking scripts/ingest_fatigue.py.
+
+COMPANIES = ['GECL', 'BUMA', 'SIS', 'PAMA', 'UT', 'PT. TEST']
+VIOLATIONS = [
+    'Mata Tertutup', 'Mengantuk', 'Menguap', 'Distraction (Phone)',
+    'Distraction (Smoking)', 'Tidak Memakai Seatbelt', 'Camera Tampering',
+]
+LOCATIONS = ['Hauling KM 10', 'Hauling KM 22', 'Loading Point A', 'Dumping Point', 'Pit A', 'Pit B', 'Rest Area', 'Simpang 4']
+VEHICLE_PREFIXES = ['DT', 'HD', 'LV', 'GD']
+FIRST_NAMES = ['Agus', 'Budi', 'Dedi', 'Eko', 'Fajar', 'Hendra', 'Irfan', 'Joko', 'Rudi', 'Slamet', 'Wahyu', 'Yusuf']
+LAST_NAMES = ['Santoso', 'Saputra', 'Hidayat', 'Pratama', 'Setiawan', 'Nugroho', 'Siregar', 'Kurniawan']
+MONTHS = ['Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni',
+          'Juli', 'Agustus', 'September', 'Oktober', 'November', 'Desember']
+STATUSES = ['Valid', 'Tidak Valid', 'Belum Validasi']
+
+HEADERS = [
+    'Date', 'Time', 'Vehicle No', 'Company', 'Violation', 'Location', 'Date Opr',
+    'Shift', 'Week', 'Month', 'Coordinate', 'Level', 'validation_status',
+    'validated_by', 'Pengawas FMS', 'validated_at',
+]
+
+XLSX_MAX_ROWS = 1048575  # one sheet, minus the header row
+
+def make_fleet(rng, vehicles, supervisors):
+    fleet = np.array([f"{rng.choice(VEHICLE_PREFIXES)}-{i:03d}" for i in range(1, vehicles + 1)])
+    names = sorted({f"{a} {b}" for a in FIRST_NAMES for b in LAST_NAMES})
+    crew = rng.choice(np.array(names), size=min(supervisors, len(names)), replace=False)
+    return fleet, crew
+
+def messy_times(rng, clock, rate):
+    """Format alert times as HH:MM:SS, with a share in the other layouts seen in exports."""
+    out = clock.dt.strftime('%H:%M:%S').to_numpy(dtype=object)
+    messy = np.flatnonzero(rng.random(len(out)) < rate)
+    if len(messy):
+        picked = clock.iloc[messy]
+        layouts = [
+            picked.dt.strftime('%-H:%M:%S') if sys.platform != 'win32' else picked.dt.strftime('%#H:%M:%S'),
+            picked.dt.strftime('%I:%M:%S %p'),
+            picked.dt.strftime('%H.%M.%S'),
+            picked.dt.strftime('%H:%M'),
+            picked.dt.strftime(' %H:%M:%S '),
+            pd.Series('', index=picked.index),
+        ]
+        which = rng.integers(0, len(layouts), len(messy))
+        out[messy] = np.choose(which, [l.to_numpy(dtype=object) for l in layouts])
+    return out
+
+def generate_chunk(rng, rows, fleet, crew, start, days, messy_rate):
+    """One DataFrame of synthetic alerts with the FMS export headers."""
+    alert = start + pd.to_timedelta(rng.integers(0, days * 86400, rows), unit='s')
+    alert = pd.Series(alert)
+    hour = alert.dt.hour
+    night = (hour < 6) | (hour >= 18)
+    # Night shift after midnight belongs to the previous operating day
+    opr = alert.dt.normalize() - pd.to_timedelta((hour < 6).astype(int), unit='D')
+
+    status = rng.choice(np.array(STATUSES), size=rows, p=[0.6, 0.15, 0.25])
+    validated = status != 'Belum Validasi'
+    # Validation delay: mostly a few minutes, with a long tail
+    delay = pd.to_timedelta(np.minimum(rng.lognormal(np.log(360), 0.9, rows), 86400), unit='s')
+    validated_at = (alert + delay).dt.strftime('%Y-%m-%d %H:%M:%S').where(validated, None)
+    supervisor = pd.Series(rng.choice(crew, size=rows)).where(validated, None)
+
+    lat = -2.0 - rng.random(rows)
+    lon = 115.0 + rng.random(rows)
+    df = pd.DataFrame({
+        'Date': alert.dt.strftime('%Y-%m-%d'),
+        'Time': messy_times(rng, alert, messy_rate),
+        'Vehicle No': rng.choice(fleet, size=rows),
+        'Company': rng.choice(np.array(COMPANIES), size=rows),
+        'Violation': rng.choice(np.array(VIOLATIONS), size=rows),
+        'Location': rng.choice(np.array(LOCATIONS), size=rows),
+        'Date Opr': opr.dt.strftime('%Y-%m-%d'),
+        'Shift': np.where(night, 'Shift 2', 'Shift 1'),
+        'Week': opr.dt.isocalendar().week.astype('Int64').array,
+        'Month': np.array(MONTHS)[opr.dt.month.to_numpy() - 1],
+        'Coordinate': [f"{a:.6f}, {b:.6f}" for a, b in zip(lat, lon)],
+        'Level': pd.array(rng.integers(1, 4, rows), dtype='Int64'),
+        'validation_status': status,
+        # The export carries a stale validated_by next to Pengawas FMS
+        'validated_by': supervisor.where(rng.random(rows) < 0.5, None),
+        'Pengawas FMS': supervisor,
+        'validated_at': validated_at,
+    })
+
+    if messy_rate:
+        # Trailing whitespace on vehicle numbers, blank optional fields and empty rows
+        pad = rng.random(rows) < messy_rate
+        df.loc[pad, 'Vehicle No'] = df.loc[pad, 'Vehicle No'] + ' '
+        for col in ['Company', 'Location', 'Week', 'Level']:
+            df.loc[rng.random(rows) < messy_rate / 4, col] = None
+        df.loc[rng.random(rows) < messy_rate / 10, ['Date', 'Time', 'Vehicle No']] = None
+    return df
+
+def generate(out, rows, vehicles=400, supervisors=30, days=90, messy_rate=0.05,
+             duplicate_rate=0.01, seed=42, chunk_size=100000, start='2025-01-01'):
+    """Write `rows` synthetic alerts to out (.csv or .xlsx), chunk by chunk."""
+    ext = os.path.splitext(out)[1].lower()
+    if ext not in ('.csv', '.xlsx'):
+        raise ValueError(f"Unsupported output format: {out} (use .csv or .xlsx)")
+    if ext == '.xlsx' and rows > XLSX_MAX_ROWS:
+        raise ValueError(f"XLSX holds at most {XLSX_MAX_ROWS} rows per sheet; use .csv for {rows}")
+
+    rng = np.random.default_rng(seed)
+    fleet, crew = make_fleet(rng, vehicles, supervisors)
+    start = pd.Timestamp(start)
+
+    if ext == '.xlsx':
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('Sheet1')
+        ws.append(HEADERS)
+
+    written = 0
+    while written < rows:
+        n = min(chunk_size, rows - written)
+        df = generate_chunk(rng, n, fleet, crew, start, days, messy_rate)
+        if duplicate_rate and n > 1:
+            # Re-exported alerts: exact copies of rows already in the chunk
+            take = np.arange(n)
+            dup = rng.random(n) < duplicate_rate
+            take[dup] = rng.integers(0, n, int(dup.sum()))
+            df = df.iloc[take].reset_index(drop=True)
+        if ext == '.csv':
+            df.to_csv(out, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        else:
+            for row in df.astype(object).where(df.notna(), None).itertuples(index=False):
+                ws.append(list(row))
+        written += n
+
+    if ext == '.xlsx':
+        wb.save(out)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic FMS fatigue alert export (CSV/XLSX)")
+    parser.add_argument("--rows", type=int, default=1000, help="number of alert rows (default 1000)")
+    parser.add_argument("--out", default="dummy_fatigue.xlsx", help="output path, .csv or .xlsx (default dummy_fatigue.xlsx)")
+    parser.add_argument("--vehicles", type=int, default=400, help="fleet size (default 400)")
+    parser.add_argument("--supervisors", type=int, default=30, help="number of FMS supervisors (default 30)")
+    parser.add_argument("--days", type=int, default=90, help="days of alerts from --start (default 90)")
+    parser.add_argument("--start", default="2025-01-01", help="first alert date (default 2025-01-01)")
+    parser.add_argument("--messy-rate", type=float, default=0.05,
+                        help="share of rows with odd time formats, padding or blanks (default 0.05, 0 for clean)")
+    parser.add_argument("--duplicate-rate", type=float, default=0.01, help="share of re-exported duplicate rows (default 0.01)")
+    parser.add_argument("--seed", type=int, default=42, help="random seed (default 42)")
+    parser.add_argument("--chunk-size", type=int, default=100000, help="rows generated per chunk (default 100000)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        rows = generate(args.out, args.rows, args.vehicles, args.supervisors, args.days, args.messy_rate,
+                        args.duplicate_rate, args.seed, args.chunk_size, args.start)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Dummy export created: {args.out} ({rows} rows in {time.perf_counter() - started:.1f}s)")
+
+if __name__ == "__main__":
+    main()
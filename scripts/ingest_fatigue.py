@@ -1,186 +1,1297 @@
-
+import numpy as np
 import pandas as pd
 import sys
 import os
+import time
+import json
+from contextlib import contextmanager
+from types import SimpleNamespace
+import argparse
 import traceback
-from sqlalchemy import create_engine, text
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
+from sqlalchemy import text
+from dbutil import database_url, get_engine, run_in_transaction, with_retry
+from remote_source import open_remote, fetch, DownloadError
+from parse_cache import default_cache
+from fms_headers import HEADER_ALIASES, DATE_COLUMNS, aliases_fingerprint, resolve_headers, select_columns, describe
+from fms_validation import validate, reason_counts
+from fms_supervisors import load_supervisor_index
+from fms_geo import HOTSPOT_PRECISION, parse_coordinates, geohash
+from fms_common import ROW_SLICE_ROWS, file_sha256, parse_alert_times, supports_copy, write_frame
+from fms_episodes import refresh_episodes
+from fms_partitions import ensure_months
+from fms_schema import (TARGET_COLS, NATURAL_KEY, NATURAL_KEY_SQL, REJECTS_TABLE,
+                        ensure_ingest_schema, has_natural_key, ensure_natural_key, refresh_rollup, refresh_hotspots)
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+# Rows per chunk in streaming mode
+DEFAULT_CHUNK_SIZE = 50000
+# Local port of the ingest server (--serve)
+DEFAULT_PORT = 8765
+
+def peak_rss_mb():
+    """Process peak resident memory in MB, or None where it cannot be read."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / 2**20, 1)
+        except (ImportError, AttributeError):
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, KB elsewhere
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+class IngestStats:
+    """Per-stage wall time, rows in/out, memory high-water marks and DB batch latencies of one run.
+
+    Memory is the process peak RSS sampled at the end of each stage; in --serve mode
+    it is the peak over the server's lifetime so far.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.batches = []
+
+    @contextmanager
+    def stage(self, name, rows_in=0):
+        """Time a block; the yielded record's rows_out defaults to rows_in."""
+        st = SimpleNamespace(rows_out=None)
+        started = time.perf_counter()
+        try:
+            yield st
+        finally:
+            rec = self.stages.setdefault(name, {'wall_s': 0.0, 'calls': 0, 'rows_in': 0, 'rows_out': 0})
+            rec['wall_s'] += time.perf_counter() - started
+            rec['calls'] += 1
+            rec['rows_in'] += rows_in
+            rec['rows_out'] += rows_in if st.rows_out is None else st.rows_out
+            rec['peak_rss_mb'] = peak_rss_mb()
+
+    def batch(self, rows, seconds):
+        self.batches.append((rows, seconds))
+
+    def merge(self, other):
+        """Fold in the stats of another worker (process or thread)."""
+        for name, rec in other.stages.items():
+            mine = self.stages.setdefault(name, {'wall_s': 0.0, 'calls': 0, 'rows_in': 0, 'rows_out': 0})
+            for key in ('wall_s', 'calls', 'rows_in', 'rows_out'):
+                mine[key] += rec[key]
+            if rec.get('peak_rss_mb') is not None:
+                mine['peak_rss_mb'] = max(mine.get('peak_rss_mb') or 0, rec['peak_rss_mb'])
+        self.batches.extend(other.batches)
+
+    def summary(self):
+        stages = {
+            name: dict(rec, wall_s=round(rec['wall_s'], 4))
+            for name, rec in self.stages.items()
+        }
+        batches = None
+        if self.batches:
+            latencies = np.array([sec for _, sec in self.batches]) * 1000
+            batches = {
+                'count': len(self.batches),
+                'rows': sum(rows for rows, _ in self.batches),
+                'total_s': round(latencies.sum() / 1000, 4),
+                'min_ms': round(float(latencies.min()), 2),
+                'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+                'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+                'max_ms': round(float(latencies.max()), 2),
+            }
+        return {
+            'stages': stages,
+            'timings': {name: rec['wall_s'] for name, rec in stages.items()},
+            'db_batches': batches,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+# Core columns for DB
+DB_COLS = TARGET_COLS + ['sla_seconds', 'employee_id', 'lat', 'lon', 'geohash', 'row_hash']
+
+LOADERS = ['copy', 'executemany']
+MODES = ['replace', 'incremental']
+
+STAGING_TABLE = "fms_fatigue_staging"
+REJECT_COLS = ['source', 'source_row', 'reasons'] + TARGET_COLS
+
+# Rows with none of these are dropped as empty
+REQUIRED_ANY = ['alert_date', 'alert_time', 'vehicle_no']
+
+# Dtypes of the ingest frame. Low-cardinality text is dictionary-encoded ('category': a small
+# code per row, each distinct value stored once); integers take the smallest nullable type
+# that holds them (Int8 for week and level, usually Int32 for sla_seconds); dates stay
+# datetime64 until they are written, where they are formatted one slice at a time.
+CATEGORY_COLS = ['company', 'violation', 'location', 'shift', 'month', 'validation_status', 'validated_by']
+
+# Alert times are read as text, and the category columns as categories, whatever the export calls them
+READ_DTYPES = {header: str for header in HEADER_ALIASES['alert_time']}
+READ_DTYPES.update({header: 'category' for c in CATEGORY_COLS for header in HEADER_ALIASES[c]})
+# Bump when normalize_source() changes so parse-cache entries written by older code are not
+# reused; entries also depend on which headers are recognized as dates
+NORMALIZE_VERSION = "3-" + aliases_fingerprint(DATE_COLUMNS)
+
+def compute_sla(df):
+    """Compute sla_seconds for the whole frame.
+
+    Returns (sla, offsets, delay): the alert time-of-day offsets (NaT when unparseable) and
+    the unclamped validation delay in seconds are kept for validation.
+    """
+    offsets = parse_alert_times(df['alert_time'])
+    alert_dt = df['alert_date'].dt.normalize() + offsets
+    delay = (df['validated_at'] - alert_dt).dt.total_seconds()
+    # Negative deltas (validated slightly before the alert) are clamped to 0
+    sla = np.floor(delay.clip(lower=0)).astype('Int64')
+    return sla, offsets, delay
+
+def parse_dates(df, formats):
+    """Parse the date columns in place.
+
+    pandas infers a column's format from its first value, which would differ from
+    chunk to chunk; the format seen first is kept in `formats` and reused so a
+    streamed file parses exactly like a whole-file read.
+    """
+    for col in ['alert_date', 'validated_at', 'opr_date']:
+        if col not in formats:
+            present = df[col].dropna()
+            if present.empty:
+                df[col] = pd.to_datetime(df[col], errors='coerce')
+                continue
+            first = present.iloc[0]
+            formats[col] = (guess_datetime_format(first) or 'mixed') if isinstance(first, str) else None
+        df[col] = pd.to_datetime(df[col], format=formats[col], errors='coerce')
+
+def compact_ints(col):
+    """col in the smallest nullable integer dtype that holds it; non-integral columns are returned as is."""
+    # Integer columns come out of pandas as float when they have gaps; keep them integral
+    if not (pd.api.types.is_float_dtype(col) or pd.api.types.is_integer_dtype(col)):
+        return col
+    try:
+        col = col.astype('Int64')
+    except (TypeError, ValueError):
+        return col
+    return pd.to_numeric(col, downcast='integer')
+
+def normalize_int_columns(df):
+    for c in ['week', 'level']:
+        df[c] = compact_ints(df[c])
+
+def apply_schema(df):
+    """Dictionary-encode the CATEGORY_COLS of a mapped frame that were not read as categories."""
+    for c in CATEGORY_COLS:
+        if not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype('category')
+    return df
+
+def _hash_text(col):
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        # A categorical hashes like its text column when its categories are text, so only the
+        # categories are converted
+        names = col.cat.categories.astype('string')
+        return col.cat.rename_categories(names) if names.is_unique else col.astype('string')
+    if pd.api.types.is_datetime64_any_dtype(col):
+        col = col.dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+    return col.astype('string')
+
+def row_hashes(df):
+    """64-bit content hash of each row's mapped source columns, as signed int64 (BIGINT)."""
+    # Hash the text form of every column so the result does not depend on the dtype
+    # pandas happened to infer for a given chunk. The text form is built ROW_SLICE_ROWS rows
+    # at a time, so it never exists for the whole frame.
+    out = np.empty(len(df), dtype='uint64')
+    for k in range(0, len(df), ROW_SLICE_ROWS):
+        part = df.iloc[k:k + ROW_SLICE_ROWS]
+        text_form = pd.DataFrame({c: _hash_text(part[c]) for c in TARGET_COLS}, index=part.index)
+        out[k:k + ROW_SLICE_ROWS] = pd.util.hash_pandas_object(text_form, index=False).to_numpy()
+    return out.view('int64')
+
+def read_file(file_path, sheet=None):
+    """Read the whole file (or one sheet of a workbook, default the first) as a single chunk."""
+    if file_path.endswith('.csv'):
+        # Parsed in chunks: the parser's working memory is bounded by the chunk, not the file
+        yield concat_chunks(pd.read_csv(file_path, dtype=READ_DTYPES, chunksize=DEFAULT_CHUNK_SIZE))
+    else:
+        yield pd.read_excel(file_path, sheet_name=sheet if sheet is not None else 0, dtype=READ_DTYPES)
+
+def sheet_names(file_path):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_path, read_only=True)
+    try:
+        return wb.sheetnames
+    finally:
+        wb.close()
+
+def read_xlsx_chunks(file_path, chunk_size):
+    """Stream the first sheet of a workbook through openpyxl's read-only row iterator."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(h) if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= chunk_size:
+                yield _xlsx_frame(buffer, columns)
+                buffer = []
+        if buffer:
+            yield _xlsx_frame(buffer, columns)
+    finally:
+        wb.close()
+
+def _xlsx_frame(rows, columns):
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    # Same as read_excel(dtype=READ_DTYPES): keep non-empty times as text, encode the categories
+    for col in df.columns.intersection(list(READ_DTYPES)):
+        if READ_DTYPES[col] == 'category':
+            df[col] = df[col].astype('category')
+        else:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+def concat_chunks(chunks):
+    """Concatenate chunks read with READ_DTYPES, keeping the category columns categorical."""
+    parts = list(chunks)
+    if len(parts) == 1:
+        return parts[0]
+    # pd.concat turns categoricals whose categories differ into plain columns, so every part
+    # gets the union of the categories first
+    for col in parts[0].columns:
+        if isinstance(parts[0][col].dtype, pd.CategoricalDtype):
+            categories = pd.Index(pd.concat([pd.Series(p[col].cat.categories) for p in parts]).unique())
+            for p in parts:
+                p[col] = p[col].cat.set_categories(categories)
+    return pd.concat(parts, ignore_index=True)
+
+def read_chunks(file_path, chunk_size):
+    """Read the file in bounded chunks of at most chunk_size rows."""
+    if file_path.endswith('.csv'):
+        yield from pd.read_csv(file_path, dtype=READ_DTYPES, chunksize=chunk_size)
+    else:
+        yield from read_xlsx_chunks(file_path, chunk_size)
+
+def normalize_source(df):
+    """Mapping-independent normalization of a whole file, as stored in the parse cache.
 
-load_dotenv()
+    Headers are kept as read; the columns resolving to dates are parsed the way
+    transform_chunk() would (format guessed from the first value of a row it keeps), and
+    transform_chunk() passes already-parsed dates through unchanged.
+    """
+    resolution = resolve_headers(df.columns)
+    subset_cols = [resolution.columns[c] for c in REQUIRED_ANY if c in resolution.columns]
+    keep = df[subset_cols].notna().any(axis=1) if subset_cols else slice(None)
+    for canonical in DATE_COLUMNS:
+        col = resolution.columns.get(canonical)
+        if col is None or pd.api.types.is_datetime64_any_dtype(df[col]):
+            continue
+        present = df.loc[keep, col].dropna()
+        if present.empty:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+            continue
+        first = present.iloc[0]
+        fmt = (guess_datetime_format(first) or 'mixed') if isinstance(first, str) else None
+        parsed = pd.to_datetime(df[col], format=fmt, errors='coerce')
+        # A column with unparseable values stays as read, so validation can quarantine them verbatim
+        if parsed.count() == df[col].count():
+            df[col] = parsed
+    return df
+
+def read_source(file_path, sheet=None, content_hash=None, cache=None):
+    """A whole file (or sheet) as one normalized frame, from the parse cache when it has it.
+
+    Returns (frame, cache_status), cache_status being 'hit', 'miss' or 'off'.
+    """
+    if cache is None or content_hash is None:
+        return normalize_source(next(read_file(file_path, sheet))), 'off'
+    df = cache.get(content_hash, sheet, NORMALIZE_VERSION)
+    if df is not None:
+        return df, 'hit'
+    df = normalize_source(next(read_file(file_path, sheet)))
+    cache.put(content_hash, df, sheet, NORMALIZE_VERSION)
+    return df, 'miss'
+
+def drop_known_rows(df, ctx):
+    """Drop rows whose row_hash is in ctx['known_hashes'] (or repeated), counting them in ctx['skipped']."""
+    # The last occurrence of a repeated key must win, so drop earlier ones before
+    # hash filtering can skip the last one as already stored
+    repeated = df.duplicated(subset=NATURAL_KEY, keep='last')
+    ctx['skipped'] += int(repeated.sum())
+    df = df[~repeated]
+    hashes = df['row_hash'].to_numpy()
+    fresh = ~np.isin(hashes, ctx['known_hashes']) & ~df['row_hash'].duplicated().to_numpy()
+    ctx['skipped'] += int((~fresh).sum())
+    ctx['known_hashes'] = np.union1d(ctx['known_hashes'], hashes[fresh])
+    return df[fresh]
+
+def transform_chunk(df, ctx, verbose=True):
+    """Clean and map one raw chunk. Returns the DB-ready frame.
+
+    ctx carries per-file state across chunks: 'stats' (IngestStats), 'date_formats',
+    and in incremental mode 'known_hashes' (sorted row hashes already stored or seen)
+    plus a 'skipped' count. Rows failing validation are counted in 'rejected' and
+    appended to ctx['rejects'] (REJECT_COLS minus source) for the caller to quarantine.
+    With ctx['supervisors'] (fms_supervisors.SupervisorIndex) employee_id is resolved from
+    validated_by, and names matching no single employee are counted in ctx['unresolved'].
+    Rows loaded despite a warning rule (fms_validation.py) are counted in ctx['warnings'].
+    """
+    stats = ctx['stats']
+    ctx.setdefault('rejects', [])
+    ctx.setdefault('unresolved', {})
+    ctx.setdefault('warnings', {})
+    if verbose:
+        print(f"Loaded {len(df)} rows. Columns: {df.columns.tolist()}")
+
+    # 1. Column Mapping: headers are resolved once per file (fms_headers.py), then selected by name
+    with stats.stage('map_columns', len(df)):
+        resolution = resolve_headers(df.columns)
+        if 'headers' not in ctx:
+            ctx['headers'] = resolution
+            if verbose or resolution.unknown or resolution.duplicates:
+                for line in describe(resolution):
+                    print(line)
+        # Missing columns are carried as empty so every later step is columnar
+        df = apply_schema(select_columns(df, resolution, TARGET_COLS))
+
+    # 2. Data Cleaning
+    with stats.stage('clean', len(df)) as st:
+        subset_cols = [c for c in REQUIRED_ANY if c in resolution.columns]
+        if subset_cols:
+            before = len(df)
+            df = df.dropna(subset=subset_cols, how='all')
+            ctx['rejected'] += before - len(df)
+        st.rows_out = len(df)
+    if verbose:
+        print(f"Kept {len(df)} valid rows.")
+
+    # 4. Parsing Dates; the values as read are kept for validation and the reject file
+    with stats.stage('parse_dates', len(df)):
+        raw_dates = df[DATE_COLUMNS]
+        parse_dates(df, ctx['date_formats'])
+        normalize_int_columns(df)
+
+    # 4.5 Fingerprint rows; in incremental mode rows already stored are dropped before any SLA work
+    with stats.stage('fingerprint', len(df)) as st:
+        df['row_hash'] = row_hashes(df)
+        if ctx.get('known_hashes') is not None:
+            df = drop_known_rows(df, ctx)
+        st.rows_out = len(df)
+
+    if verbose:
+        print("Calculating SLA and preparing records...")
+    with stats.stage('sla', len(df)):
+        sla, offsets, delay = compute_sla(df)
+        df['sla_seconds'] = compact_ints(sla)
+
+    # 5. Validation: rows failing a rule are split off for quarantine instead of loading with NULLs
+    with stats.stage('validate', len(df)) as st:
+        derived = {'raw_present': raw_dates.loc[df.index].notna(), 'alert_offset': offsets, 'sla_delay': delay}
+        df, rejected = validate(df, derived, warnings=ctx['warnings'])
+        if len(rejected):
+            ctx['rejected'] += len(rejected)
+            ctx['rejects'].append(quarantine_frame(rejected, raw_dates))
+        st.rows_out = len(df)
+
+    # 6. Supervisor -> employee_id, one lookup per distinct name
+    with stats.stage('resolve', len(df)):
+        supervisors = ctx.get('supervisors')
+        if supervisors is not None:
+            df['employee_id'] = supervisors.resolve_column(df['validated_by'], ctx['unresolved'])
+        else:
+            df['employee_id'] = pd.Series(None, index=df.index, dtype='category')
+
+    # 7. Coordinates -> lat/lon and the geohash of the position
+    with stats.stage('geocode', len(df)):
+        df['lat'], df['lon'] = parse_coordinates(df['coordinate'])
+        df['geohash'] = geohash(df['lat'], df['lon'])
+
+    # Dates stay datetime64; write_frame() formats them for SQL slice by slice
+    return df[DB_COLS]
+
+def quarantine_frame(rejected, raw_dates):
+    """Rejected rows as text with their dates as read, a 1-based sheet row number and the reasons."""
+    out = rejected[TARGET_COLS].copy()
+    out[DATE_COLUMNS] = raw_dates.loc[rejected.index]
+    out = out.astype('string')
+    # Header is row 1 of the sheet
+    out.insert(0, 'source_row', rejected.index + 2)
+    out.insert(1, 'reasons', rejected['reasons'])
+    return out
+
+def collect_rejects(parts, source=None):
+    """One REJECT_COLS frame from quarantine_frame() parts (source set on all of them when given)."""
+    if not parts:
+        return pd.DataFrame(columns=REJECT_COLS)
+    rejects = pd.concat(parts, ignore_index=True)
+    if source is not None:
+        rejects['source'] = source
+    return rejects[REJECT_COLS]
+
+def clear_rejects(conn, mode, sources):
+    """Drop quarantined rows the load supersedes: all of them on a replace, the reloaded sources' otherwise."""
+    if mode == 'replace':
+        conn.execute(text(f"TRUNCATE TABLE {REJECTS_TABLE}"))
+    else:
+        conn.execute(text(f"DELETE FROM {REJECTS_TABLE} WHERE source = ANY(:sources)"), {"sources": list(sources)})
+
+def write_rejects(conn, rejects, loader):
+    # Separate stats so the DB batch latencies stay those of the alert load
+    if len(rejects):
+        write_frame(conn, rejects, loader, REJECTS_TABLE, IngestStats(), verbose=False, cols=REJECT_COLS)
+
+def default_reject_file(source):
+    """<file>.rejects.csv next to a local file; fms_rejects_<timestamp>.csv in the working directory otherwise."""
+    if source.startswith("http") or not source.endswith(('.csv', '.xlsx', '.xls')):
+        return f"fms_rejects_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+    return os.path.splitext(source)[0] + '.rejects.csv'
 
-# Database Connection
-DB_URL = os.getenv("DATABASE_URL")
-if DB_URL and DB_URL.startswith("postgresql://"):
-    DB_URL = DB_URL.replace("postgresql://", "postgresql+psycopg://")
+def save_rejects(result, rejects, reject_file):
+    """Write the reject CSV (replacing an older one) and record the quarantine counts in the result dict."""
+    result['rows_quarantined'] = len(rejects)
+    result['reject_reasons'] = reason_counts(rejects)
+    if os.path.exists(reject_file):
+        os.remove(reject_file)
+    if not len(rejects):
+        return
+    rejects.to_csv(reject_file, index=False)
+    result['reject_file'] = reject_file
+    top = ", ".join(f"{k} {v}" for k, v in list(result['reject_reasons'].items())[:5])
+    print(f"Quarantined {len(rejects)} invalid rows in {REJECTS_TABLE} and {reject_file} ({top}).")
+
+def save_warnings(result, warnings):
+    """Record the rows loaded despite a validation warning in the result dict."""
+    result['validation_warnings'] = dict(warnings)
+    if warnings:
+        counts = ", ".join(f"{k} {v}" for k, v in sorted(warnings.items(), key=lambda kv: -kv[1]))
+        hint = " (set FMS_SHIFTS to the export's shift labels)" if 'allowed:shift' in warnings else ""
+        print(f"Loaded rows with validation warnings: {counts}{hint}.")
+
+def save_unresolved(result, supervisors, unresolved):
+    """Record the supervisor names that resolved to no employee in the result dict."""
+    if supervisors is None or not len(supervisors):
+        result['unresolved_supervisors'] = None
+        return
+    report = supervisors.report(unresolved)
+    result['unresolved_supervisors'] = report.to_dict(orient='records')
+    if len(report):
+        top = ", ".join(f"{r.name!r} {r.rows}" for r in report.head(5).itertuples())
+        print(f"{len(report)} supervisor name(s) matched no single employee ({int(report['rows'].sum())} rows): {top}.")
+
+def last_ingested_hash(conn):
+    return conn.execute(text(
+        "SELECT content_hash FROM fms_ingest_files ORDER BY ingested_at DESC LIMIT 1"
+    )).scalar()
+
+def prepare_ingest(conn):
+    ensure_ingest_schema(conn)
+    return last_ingested_hash(conn)
+
+def load_known_hashes(conn):
+    hashes = conn.execute(text(
+        "SELECT DISTINCT row_hash FROM fms_fatigue_alerts WHERE row_hash IS NOT NULL"
+    )).scalars().all()
+    return np.sort(np.array(hashes, dtype='int64'))
+
+def create_staging(conn):
+    col_list = ", ".join(DB_COLS)
+    conn.execute(text(
+        f"CREATE TEMP TABLE {STAGING_TABLE} ON COMMIT DROP AS "
+        f"SELECT {col_list} FROM fms_fatigue_alerts WITH NO DATA"
+    ))
+    # File order, so the last occurrence of a repeated key wins
+    conn.execute(text(f"ALTER TABLE {STAGING_TABLE} ADD COLUMN seq BIGSERIAL"))
+
+def merge_staging(conn, table=STAGING_TABLE):
+    """Upsert staged rows into fms_fatigue_alerts. Returns (inserted, updated)."""
+    col_list = ", ".join(DB_COLS)
+    update_cols = [c for c in DB_COLS if c not in ('alert_date', 'alert_time', 'vehicle_no')]
+    assignments = ", ".join(f"{c} = EXCLUDED.{c}" for c in update_cols)
+    current = ", ".join(f"fms_fatigue_alerts.{c}" for c in update_cols)
+    incoming = ", ".join(f"EXCLUDED.{c}" for c in update_cols)
+
+    row = conn.execute(text(f"""
+        WITH src AS (
+            SELECT DISTINCT ON ({NATURAL_KEY_SQL}) {col_list}
+            FROM {table}
+            ORDER BY {NATURAL_KEY_SQL}, seq DESC
+        ), up AS (
+            INSERT INTO fms_fatigue_alerts ({col_list})
+            SELECT {col_list} FROM src
+            ON CONFLICT ({NATURAL_KEY_SQL}) DO UPDATE
+            SET {assignments}, updated_at = NOW()
+            WHERE ({current}) IS DISTINCT FROM ({incoming})
+            RETURNING 1
+        ), new AS (
+            -- Keys not stored yet, as of the snapshot before the upsert (RETURNING xmax isn't
+            -- available once fms_fatigue_alerts is partitioned, see fms_partitions.py)
+            SELECT COUNT(*) AS n FROM src WHERE NOT EXISTS (
+                SELECT 1 FROM fms_fatigue_alerts a
+                WHERE a.alert_date = src.alert_date AND a.alert_time = src.alert_time
+                  AND a.vehicle_no = src.vehicle_no AND COALESCE(a.violation, '') = COALESCE(src.violation, '')
+            )
+        )
+        SELECT new.n, (SELECT COUNT(*) FROM up) - new.n FROM new
+    """)).one()
+    return row[0], row[1]
+
+def geocode_stored_alerts(conn, slice_rows=ROW_SLICE_ROWS):
+    """Fill lat/lon/geohash of stored alerts that have a coordinate but no geohash. Returns the rows updated."""
+    updated = 0
+    rows = conn.execute(text(
+        "SELECT id, coordinate FROM fms_fatigue_alerts WHERE geohash IS NULL AND coordinate IS NOT NULL"
+    ))
+    while True:
+        part = rows.fetchmany(slice_rows)
+        if not part:
+            break
+        df = pd.DataFrame(part, columns=['id', 'coordinate'])
+        lat, lon = parse_coordinates(df['coordinate'])
+        hashes = geohash(lat, lon)
+        found = hashes.notna()
+        if not found.any():
+            continue
+        updated += conn.execute(text("""
+            UPDATE fms_fatigue_alerts a SET lat = g.lat, lon = g.lon, geohash = g.geohash
+            FROM unnest(CAST(:ids AS TEXT[]), CAST(:lats AS FLOAT8[]), CAST(:lons AS FLOAT8[]),
+                        CAST(:hashes AS TEXT[])) AS g(id, lat, lon, geohash)
+            WHERE a.id = g.id
+        """), {"ids": df['id'][found].tolist(), "lats": lat[found].tolist(), "lons": lon[found].tolist(),
+              "hashes": hashes[found].tolist()}).rowcount
+    return updated
+
+def resolve_stored_supervisors(conn):
+    """Re-resolve employee_id of every stored alert, e.g. after employees were added or renamed.
 
-if not DB_URL:
-    print("Error: DATABASE_URL not found in .env")
-    sys.exit(1)
+    Incremental loads skip rows that are already stored, so their employee_id only changes here.
+    Returns (rows updated, supervisor index, {unresolved name: rows}).
+    """
+    supervisors = load_supervisor_index(conn)
+    names = conn.execute(text(
+        "SELECT validated_by, COUNT(*) FROM fms_fatigue_alerts WHERE validated_by IS NOT NULL GROUP BY validated_by"
+    )).all()
+    ids, unresolved = [], {}
+    for name, rows in names:
+        match = supervisors.resolve(name)
+        ids.append(match.employee_id)
+        if match.employee_id is None:
+            unresolved[name] = rows
+    updated = conn.execute(text("""
+        UPDATE fms_fatigue_alerts a SET employee_id = m.employee_id, updated_at = NOW()
+        FROM unnest(CAST(:names AS TEXT[]), CAST(:ids AS TEXT[])) AS m(validated_by, employee_id)
+        WHERE a.validated_by = m.validated_by AND a.employee_id IS DISTINCT FROM m.employee_id
+    """), {"names": [name for name, _ in names], "ids": ids}).rowcount
+    if updated:
+        refresh_rollup(conn)
+    return updated, supervisors, unresolved
+
+def new_result(source, mode):
+    return {
+        'source': source,
+        'mode': mode,
+        'status': 'ok',
+        'rows_read': 0,
+        'rows_rejected': 0,
+        'rows_quarantined': 0,
+        'rows_skipped': 0,
+        'rows_written': 0,
+        'error': None,
+    }
+
+def finish(result, stats, status=None, error=None):
+    """Close out a result dict, merging in the stats summary (stages, timings, db_batches, peak_rss_mb)."""
+    if status:
+        result['status'] = status
+    if error is not None:
+        result['error'] = str(error)
+    result.update(stats.summary())
+    return result
+
+def ingest_file(file_path, chunk_size=None, loader='copy', mode='replace', source=None, force=False, stats=None,
+                remote=None, parse_cache=True, reject_file=None, dedupe_existing=False):
+    """Ingest a CSV/XLSX export. With chunk_size set, the file is streamed chunk by chunk.
+
+    With parse_cache, a whole-file read goes through the Parquet parse cache (parse_cache.py)
+    and a streamed read uses a cached copy when there is one; streaming never fills the cache.
+
+    remote is an unfinished CSV RemoteFile: its chunks are parsed as they download and the
+    content hash (for the unchanged-file skip) is only known once the body is complete.
+
+    loader is 'copy' (COPY FROM STDIN, default) or 'executemany' (batched INSERTs).
+    mode 'replace' truncates and reloads the table; 'incremental' stages the file and
+    upserts on the natural key, writing only new or changed rows.
+    A file identical to the last one ingested is skipped unless force is set. The first
+    incremental load aborts if stored rows repeat a natural key, unless dedupe_existing is set
+    (ensure_natural_key()).
+
+    Rows failing validation (fms_validation.py) are left out of the load and quarantined in
+    fms_fatigue_rejects and reject_file (default <file>.rejects.csv) with their reasons;
+    they are counted in rows_rejected along with blank rows, and in rows_quarantined.
+
+    Returns a result dict: status, row counts, and the IngestStats summary
+    (per-stage wall time/rows/peak RSS, DB batch latencies).
+    """
+    source = source or file_path
+    result = new_result(source, mode)
+    stats = stats or IngestStats()
+    reject_file = reject_file or default_reject_file(source)
+    content_hash = None
+    try:
+        if remote is None:
+            with stats.stage('hash'):
+                content_hash = file_sha256(file_path)
+    except OSError as e:
+        print(f"Error reading file: {e}")
+        return finish(result, stats, 'error', e)
+
+    engine = get_engine()
+    try:
+        # First contact with the database; retried so a cold or flaky connection doesn't fail the job
+        last_hash = run_in_transaction(prepare_ingest)
+        if not force and content_hash is not None and last_hash == content_hash:
+            print(f"SKIPPED: {source} is unchanged since the last ingest (sha256 {content_hash[:12]}).")
+            return finish(result, stats, 'skipped')
+    except Exception as e:
+        print("DATABASE ERROR:")
+        traceback.print_exc()
+        return finish(result, stats, 'error', e)
 
-def ingest_file(file_path):
     print(f"Reading {file_path}...")
-    
+    streaming = chunk_size is not None
+    cache = default_cache() if parse_cache and content_hash is not None else None
+    result['parse_cache'] = 'off' if cache is None else 'miss'
+    if remote is not None:
+        chunks = pd.read_csv(remote.reader(), dtype=READ_DTYPES, chunksize=chunk_size)
+    elif streaming:
+        chunks = cache and cache.iter_chunks(content_hash, chunk_size, version=NORMALIZE_VERSION)
+        if chunks:
+            result['parse_cache'] = 'hit'
+        else:
+            chunks = read_chunks(file_path, chunk_size)
+    else:
+        try:
+            with stats.stage('read') as st:
+                df, result['parse_cache'] = read_source(file_path, None, content_hash, cache)
+                chunks = [df]
+                st.rows_out = len(df)
+        except Exception as e:
+            print(f"Error reading file: {e}")
+            return finish(result, stats, 'error', e)
+
+    # 5. Direct SQL Insert (TRUNCATE + load, or staged upsert)
+    try:
+        with engine.connect() as conn, conn.begin() as trans:
+            if mode == 'incremental':
+                ensure_natural_key(conn, dedupe_existing)
+            else:
+                # Clear existing data to prevent duplicates
+                print("Clearing existing data (TRUNCATE)...")
+                conn.execute(text("TRUNCATE TABLE fms_fatigue_alerts"))
+
+            # Once the natural key index exists, repeated keys in a file must go through the merge
+            staged = mode == 'incremental' or has_natural_key(conn)
+            if staged:
+                create_staging(conn)
+                table = STAGING_TABLE
+            else:
+                table = 'fms_fatigue_alerts'
+
+            if loader == 'copy' and not supports_copy(conn):
+                print("COPY not supported by this driver, falling back to executemany.")
+                loader = 'executemany'
+
+            total = 0
+            ctx = {'stats': stats, 'date_formats': {}, 'skipped': 0, 'rejected': 0}
+            if mode == 'incremental':
+                ctx['known_hashes'] = load_known_hashes(conn)
+            with stats.stage('supervisors') as st:
+                ctx['supervisors'] = load_supervisor_index(conn)
+                st.rows_out = len(ctx['supervisors'])
+
+            chunks = iter(chunks)
+            n = 0
+            while True:
+                if streaming:
+                    with stats.stage('read') as st:
+                        df = next(chunks, None)
+                        st.rows_out = 0 if df is None else len(df)
+                else:
+                    df = next(chunks, None)
+                if df is None:
+                    break
+                n += 1
+                rows_read = len(df)
+                # Row labels count from the start of the file, so rejects carry their line in the sheet
+                df.index = pd.RangeIndex(result['rows_read'], result['rows_read'] + rows_read)
+                result['rows_read'] += rows_read
+
+                with stats.stage('transform', rows_read) as st:
+                    frame = transform_chunk(df, ctx, verbose=not streaming or n == 1)
+                    st.rows_out = len(frame)
+
+                if not streaming and len(frame):
+                    print(f"Inserting {len(frame)} records via {loader}...")
+                with stats.stage('write', len(frame)):
+                    write_frame(conn, frame, loader, table, stats, verbose=not streaming, cols=DB_COLS)
+                total += len(frame)
+                if streaming:
+                    print(f"Chunk {n}: read {rows_read} rows, inserted {len(frame)} (total {total})")
+
+            if remote is not None:
+                remote.finish()
+                content_hash = remote.sha256
+                if not force and content_hash == last_hash:
+                    print(f"SKIPPED: {source} is unchanged since the last ingest (sha256 {content_hash[:12]}).")
+                    trans.rollback()
+                    return finish(result, stats, 'skipped')
+
+            result['rows_rejected'] = ctx['rejected']
+            result['rows_skipped'] = ctx['skipped']
+            if 'headers' in ctx:
+                result['unknown_headers'] = ctx['headers'].unknown
+            if ctx['skipped']:
+                print(f"Skipped {ctx['skipped']} rows already stored (row_hash match) or repeated in the file.")
+            rejects = collect_rejects(ctx['rejects'], source)
+            save_rejects(result, rejects, reject_file)
+            save_warnings(result, ctx.get('warnings', {}))
+            save_unresolved(result, ctx['supervisors'], ctx.get('unresolved', {}))
+
+            if not total and not ctx['skipped']:
+                # Keep the existing data rather than committing an empty table
+                print("No valid records to insert.")
+                trans.rollback()
+                return finish(result, stats, 'empty')
+
+            with stats.stage('quarantine', len(rejects)):
+                clear_rejects(conn, mode, [source])
+                write_rejects(conn, rejects, loader)
+
+            written = total
+            if staged:
+                with stats.stage('partitions') as st:
+                    st.rows_out = len(ensure_months(conn, STAGING_TABLE))
+                with stats.stage('merge', total) as st:
+                    inserted, updated = merge_staging(conn)
+                    written = st.rows_out = inserted + updated
+                print(f"Upsert: {inserted} new, {updated} changed, {total - written} unchanged or repeated.")
+            result['rows_written'] = written
+
+            with stats.stage('rollup') as st:
+                # A replace reloads every date, so the rollup is rebuilt in full
+                st.rows_out = refresh_rollup(conn, STAGING_TABLE if mode == 'incremental' else None)
+            with stats.stage('hotspots') as st:
+                st.rows_out = refresh_hotspots(conn, STAGING_TABLE if mode == 'incremental' else None)
+            with stats.stage('episodes') as st:
+                st.rows_out = refresh_episodes(conn, STAGING_TABLE if mode == 'incremental' else None, loader=loader)
+
+            conn.execute(text(
+                "INSERT INTO fms_ingest_files (source, content_hash, mode, rows_written) "
+                "VALUES (:source, :content_hash, :mode, :rows_written)"
+            ), {"source": source, "content_hash": content_hash, "mode": mode, "rows_written": written})
+
+        write_time = stats.stages['write']['wall_s'] if 'write' in stats.stages else 0
+        rate = total / write_time if write_time else 0
+        print(f"SUCCESS: Data fully ingested ({total} records, {loader} {rate:.0f} rows/s).")
+    except DownloadError as e:
+        print(f"Error downloading file: {e}")
+        return finish(result, stats, 'error', e)
+    except Exception as e:
+        print("DATABASE ERROR:")
+        traceback.print_exc()
+        return finish(result, stats, 'error', e)
+
+    return finish(result, stats)
+
+def run_job(input_arg, chunk_size=None, loader='copy', mode='replace', force=False, parse_cache=True,
+            reject_file=None, dedupe_existing=False):
+    """Ingest a local path or an http(s) URL. Returns the result dict of ingest_file().
+
+    URLs go through remote_source: an unchanged export costs one 304 and the cached copy
+    is re-checked against the last ingest; a streamed (--stream) CSV is parsed while it downloads.
+    """
+    stats = IngestStats()
+    if not input_arg.startswith("http"):
+        return ingest_file(input_arg, chunk_size, loader, mode, force=force, stats=stats, parse_cache=parse_cache,
+                           reject_file=reject_file, dedupe_existing=dedupe_existing)
+
+    print(f"Downloading {input_arg}...")
+    remote = None
+    try:
+        with stats.stage('download'):
+            remote = open_remote(input_arg)
+            if remote.status == 'not_modified':
+                print("Not modified on the server (HTTP 304); using the cached copy.")
+            elif chunk_size is None or remote.format != 'csv':
+                # Workbooks can only be read once complete (the zip directory is at the end)
+                remote.finish()
+    except DownloadError as e:
+        if remote is not None:
+            remote.close()
+        print(f"Error downloading file: {e}")
+        return finish(new_result(input_arg, mode), stats, 'error', e)
+
     try:
-        if file_path.endswith('.csv'):
-             df = pd.read_csv(file_path, dtype={'Time': str})
+        result = ingest_file(remote.path, chunk_size, loader, mode, source=input_arg, force=force, stats=stats,
+                             remote=None if remote.complete else remote, parse_cache=parse_cache,
+                             reject_file=reject_file, dedupe_existing=dedupe_existing)
+    finally:
+        remote.close()
+    result['download'] = remote.summary()
+    return result
+
+def prepare_source(job):
+    """Process-pool worker: read and transform one file or sheet. Returns (job, frame, ctx, stats)."""
+    stats = IngestStats()
+    # The employee index isn't sent back with the results
+    ctx = {'stats': stats, 'date_formats': {}, 'skipped': 0, 'rejected': 0, 'supervisors': job.pop('supervisors')}
+    try:
+        with stats.stage('read') as st:
+            cache = default_cache() if job['parse_cache'] else None
+            df, job['cache_status'] = read_source(job['path'], job['sheet'], job['hash'], cache)
+            st.rows_out = len(df)
+        job['rows_read'] = len(df)
+        with stats.stage('transform', len(df)) as st:
+            frame = transform_chunk(df, ctx, verbose=False)
+            st.rows_out = len(frame)
+    except Exception as e:
+        raise RuntimeError(f"{job['label']}: {e}") from e
+    del ctx['supervisors']
+    return job, frame, ctx, stats
+
+def expand_inputs(inputs, all_sheets):
+    """Turn paths/URLs (globs allowed) into jobs, one per file or per sheet."""
+    import glob
+
+    files = []
+    for item in inputs:
+        if item.startswith("http"):
+            files.append((item, None))
         else:
-             df = pd.read_excel(file_path, dtype={'Time': str})
+            matches = sorted(glob.glob(item)) if glob.has_magic(item) else [item]
+            if not matches:
+                raise FileNotFoundError(f"No files match {item}")
+            files.extend((m, None) for m in matches)
+
+    jobs = []
+    for source, _ in files:
+        if source.startswith("http"):
+            print(f"Downloading {source}...")
+            path = fetch(source).path
+        else:
+            path = source
+        sheets = sheet_names(path) if all_sheets and not path.endswith('.csv') else [None]
+        for sheet in sheets:
+            label = f"{source} [{sheet}]" if sheet is not None else source
+            jobs.append({'index': len(jobs), 'source': source, 'label': label, 'path': path, 'sheet': sheet})
+    return jobs
+
+def create_batch_staging(conn, table):
+    # A real (unlogged) table, so every writer connection can load into it
+    col_list = ", ".join(DB_COLS)
+    conn.execute(text(
+        f"CREATE UNLOGGED TABLE {table} AS "
+        f"SELECT {col_list} FROM fms_fatigue_alerts WITH NO DATA"
+    ))
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN seq BIGINT"))
+
+def ingest_batch(inputs, loader='copy', mode='replace', workers=None, db_connections=2,
+                 all_sheets=False, force=False, parse_cache=True, reject_file=None, dedupe_existing=False):
+    """Ingest many files (and optionally every sheet of each workbook) in one run.
+
+    Files/sheets are read and transformed in parallel in a process pool of `workers`.
+    Finished frames are loaded into an unlogged staging table by at most `db_connections`
+    writer connections. A single final transaction then applies the batch: in replace
+    mode it truncates and reloads, in incremental mode it upserts. Later inputs win on
+    repeated keys. In incremental mode, files already in fms_ingest_files are skipped
+    unless force is set. Rows failing validation of every source are quarantined together
+    in the final transaction and written to reject_file (default fms_rejects_<timestamp>.csv).
+
+    Returns an aggregated result dict with a per-source list under 'sources'. Stage wall
+    times are summed over workers, so they can exceed the elapsed time.
+    """
+    stats = IngestStats()
+    result = new_result(f"batch of {len(inputs)} input(s)", mode)
+    result['sources'] = []
+    started = time.perf_counter()
+
+    try:
+        with stats.stage('download'):
+            jobs = expand_inputs(inputs, all_sheets)
     except Exception as e:
+        print(f"Error reading inputs: {e}")
+        return finish(result, stats, 'error', e)
+
+    for job in jobs:
+        job['parse_cache'] = parse_cache
+    run_batch(jobs, result, stats, loader, mode, workers or os.cpu_count() or 1, max(1, db_connections), force,
+              reject_file or default_reject_file(''), dedupe_existing)
+    result['elapsed_s'] = round(time.perf_counter() - started, 4)
+    return finish(result, stats)
+
+def run_batch(jobs, result, stats, loader, mode, workers, db_connections, force, reject_file, dedupe_existing=False):
+    """Body of ingest_batch(); fills in result and sets its status on failure."""
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+    started = time.perf_counter()
+    hashes = {}
+    try:
+        with stats.stage('hash'):
+            for job in jobs:
+                if job['path'] not in hashes:
+                    hashes[job['path']] = file_sha256(job['path'])
+                job['hash'] = hashes[job['path']]
+    except OSError as e:
         print(f"Error reading file: {e}")
+        result.update(status='error', error=str(e))
         return
 
-    print(f"Loaded {len(df)} rows. Columns: {df.columns.tolist()}")
+    engine = get_engine()
+    table = f"fms_fatigue_batch_{os.getpid()}_{int(time.time())}"
 
-    # 1. Deduplicate Columns (Critical Step)
-    df.columns = df.columns.str.strip()
-    new_cols = []
-    seen = {}
-    for col in df.columns:
-        if col in seen:
-            seen[col] += 1
-            new_cols.append(f"{col}_{seen[col]}")
-        else:
-            seen[col] = 0
-            new_cols.append(col)
-    df.columns = new_cols
-    print(f"Deduplicated columns: {df.columns.tolist()}")
+    @with_retry()
+    def prepare_batch():
+        """Schema, already-ingested hashes and lookups, read in one retryable transaction."""
+        with engine.begin() as conn:
+            ensure_ingest_schema(conn)
+            seen, known = set(), None
+            if mode == 'incremental':
+                ensure_natural_key(conn, dedupe_existing)
+                if not force:
+                    seen = set(conn.execute(text("SELECT DISTINCT content_hash FROM fms_ingest_files")).scalars())
+                known = load_known_hashes(conn)
+            with stats.stage('supervisors') as st:
+                # Sent along with every job; each worker process memoizes its own lookups
+                supervisors = load_supervisor_index(conn)
+                st.rows_out = len(supervisors)
+            return seen, known, supervisors, supports_copy(conn)
 
-    # 2. Data Cleaning
-    initial_count = len(df)
-    # Safely check for subset columns
-    subset_cols = [c for c in ['Date', 'Time', 'Vehicle No'] if c in df.columns]
-    if subset_cols:
-        df = df.dropna(subset=subset_cols, how='all')
-    final_count = len(df)
-    print(f"Kept {final_count} valid rows.")
-
-    # 2.5 Drop conflicting columns if they exist
-    # If we are mapping 'Pengawas FMS' to 'validated_by', we must drop existing 'validated_by'
-    if 'Pengawas FMS' in df.columns and 'validated_by' in df.columns:
-        print("Dropping original 'validated_by' to replace with 'Pengawas FMS'...")
-        df = df.drop(columns=['validated_by'])
-
-    # 3. Column Mapping
-    column_mapping = {
-        'Date': 'alert_date',
-        'Time': 'alert_time',
-        'Vehicle No': 'vehicle_no',
-        'Company': 'company',
-        'Violation': 'violation',
-        'Location': 'location',
-        'Date Opr': 'opr_date',
-        'Shift': 'shift',
-        'Week': 'week',
-        'Month': 'month',
-        'Coordinate': 'coordinate',
-        'Level': 'level',
-        'validation_status': 'validation_status',
-        'Pengawas FMS': 'validated_by', # Map correct supervisor column
-        'validated_at': 'validated_at'
-    }
-    
-    df = df.rename(columns=column_mapping)
-    
-    # Core columns for DB
-    target_cols = [
-        'alert_date', 'alert_time', 'vehicle_no', 'company', 'violation', 'location', 
-        'opr_date', 'shift', 'week', 'month', 'coordinate', 'level', 
-        'validation_status', 'validated_by', 'validated_at'
-    ]
-    
-    # 4. Parsing Dates
-    for col in ['alert_date', 'validated_at', 'opr_date']:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors='coerce')
+    try:
+        seen, known_hashes, supervisors, copy_ok = prepare_batch()
+        for job in [j for j in jobs if hashes[j['path']] in seen]:
+            print(f"SKIPPED: {job['label']} was already ingested.")
+            result['sources'].append({'source': job['label'], 'status': 'skipped'})
+        jobs = [j for j in jobs if hashes[j['path']] not in seen]
+        for job in jobs:
+            job['supervisors'] = supervisors
+        if loader == 'copy' and not copy_ok:
+            print("COPY not supported by this driver, falling back to executemany.")
+            loader = 'executemany'
+        if jobs:
+            run_in_transaction(create_batch_staging, table)
+    except Exception as e:
+        print("DATABASE ERROR:")
+        traceback.print_exc()
+        result.update(status='error', error=str(e))
+        return
 
-    print("Calculating SLA and preparing records...")
-    final_records = []
-    
-    for i, (_, row) in enumerate(df.iterrows()):
-        # Handle missing columns gracefully
-        record = {}
-        for c in target_cols:
-            if c in row and pd.notnull(row[c]):
-                record[c] = row[c]
-            else:
-                record[c] = None
-        
-        # SLA Calculation
-        sla = None
-        try:
-            if pd.notnull(record['alert_date']) and pd.notnull(record['alert_time']) and pd.notnull(record['validated_at']):
-                time_str = str(record['alert_time'])
-                # Handle time formats
-                try:
-                    t = pd.to_datetime(time_str).time()
-                except:
-                    # Fallback for weird time formats if any
-                    t = datetime.strptime(time_str, "%H:%M:%S").time()
-
-                alert_dt = datetime.combine(record['alert_date'].date(), t)
-                val_dt = record['validated_at']
-                diff = (val_dt - alert_dt).total_seconds()
-                sla = int(diff) if diff >= 0 else 0
-        except Exception: 
-            pass # SLA calc failure should not stop ingestion
-        
-        record['sla_seconds'] = sla
-        
-        # Formatting dates for SQL
-        for c in ['alert_date', 'opr_date']:
-            if pd.notnull(record[c]): record[c] = record[c].strftime('%Y-%m-%d')
-        
-        final_records.append(record)
-
-    if not final_records:
-        print("No valid records to insert.")
+    if not jobs:
+        print("Nothing to ingest.")
+        result['status'] = 'skipped'
         return
 
-    # 5. Direct SQL Insert with TRUNCATE
-    print(f"Inserting {len(final_records)} records via SQL...")
+    print(f"Ingesting {len(jobs)} file(s)/sheet(s) with {workers} worker(s) and {db_connections} DB connection(s)...")
+    ctx = {'skipped': 0, 'known_hashes': known_hashes}
+    unresolved = {}
+    warnings = {}
+    staged_per_file = {}
+    reject_parts = []
+
+    def write_job(job, frame):
+        writer_stats = IngestStats()
+        with writer_stats.stage('write', len(frame)):
+            # Each frame is its own transaction on the staging table, so a dropped connection is simply retried
+            run_in_transaction(write_frame, frame, loader, table, writer_stats, verbose=False, cols=DB_COLS + ['seq'])
+        return job, writer_stats
+
     try:
-        engine = create_engine(DB_URL)
+        with ProcessPoolExecutor(max_workers=workers) as pool, \
+                ThreadPoolExecutor(max_workers=db_connections) as writers:
+            queue = list(jobs)
+            parsing, writing = set(), set()
+            done_count = 0
+            while queue or parsing or writing:
+                # Keep a bounded number of parsed frames in flight so memory stays flat
+                while queue and len(parsing) + len(writing) < workers + db_connections:
+                    parsing.add(pool.submit(prepare_source, queue.pop(0)))
+                finished, _ = wait(parsing | writing, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    if future in parsing:
+                        parsing.discard(future)
+                        job, frame, job_ctx, job_stats = future.result()
+                        stats.merge(job_stats)
+                        skipped_before = ctx['skipped']
+                        if known_hashes is not None:
+                            frame = drop_known_rows(frame, ctx)
+                        # Input order, then row order: the last occurrence of a key wins in the merge
+                        frame = frame.assign(seq=(job['index'] << 32) + np.arange(len(frame), dtype='int64'))
+                        job['summary'] = {
+                            'source': job['label'], 'status': 'ok', 'rows_read': job['rows_read'],
+                            'rows_rejected': job_ctx['rejected'], 'rows_skipped': ctx['skipped'] - skipped_before,
+                            'rows_staged': len(frame), 'parse_cache': job['cache_status'],
+                            'unknown_headers': job_ctx['headers'].unknown,
+                        }
+                        result['rows_read'] += job['rows_read']
+                        result['rows_rejected'] += job_ctx['rejected']
+                        for name, rows in job_ctx['unresolved'].items():
+                            unresolved[name] = unresolved.get(name, 0) + rows
+                        for label, rows in job_ctx.get('warnings', {}).items():
+                            warnings[label] = warnings.get(label, 0) + rows
+                        if job_ctx['rejects']:
+                            reject_parts.append(collect_rejects(job_ctx['rejects'], job['label']))
+                            job['summary']['rows_quarantined'] = len(reject_parts[-1])
+                        print(f"Parsed {job['label']}: {job['rows_read']} rows, "
+                              f"{len(frame)} to write, {job_ctx['rejected']} rejected")
+                        writing.add(writers.submit(write_job, job, frame))
+                    else:
+                        writing.discard(future)
+                        job, writer_stats = future.result()
+                        stats.merge(writer_stats)
+                        done_count += 1
+                        staged_per_file[job['path']] = staged_per_file.get(job['path'], 0) + job['summary']['rows_staged']
+                        result['sources'].append(job['summary'])
+                        print(f"[{done_count}/{len(jobs)}] Staged {job['label']} ({job['summary']['rows_staged']} rows)")
+
+        result['rows_skipped'] = ctx['skipped']
+        rejects = collect_rejects(reject_parts)
+        save_rejects(result, rejects, reject_file)
+        save_warnings(result, warnings)
+        save_unresolved(result, supervisors, unresolved)
+        total = sum(staged_per_file.values())
+        if not total and not ctx['skipped']:
+            print("No valid records to insert.")
+            result['status'] = 'empty'
+            return
+
         with engine.begin() as conn:
-            # Clear existing data to prevent duplicates
-            print("Clearing existing data (TRUNCATE)...")
-            conn.execute(text("TRUNCATE TABLE fms_fatigue_alerts"))
-
-            # Construct dynamic query
-            cols = target_cols + ['sla_seconds']
-            col_list = ", ".join(cols)
-            placeholders = ", ".join([f":{c}" for c in cols])
-            sql = f"INSERT INTO fms_fatigue_alerts ({col_list}) VALUES ({placeholders})"
-            
-            # Insert in chunks of 500
-            for k in range(0, len(final_records), 500):
-                chunk = final_records[k:k+500]
-                conn.execute(text(sql), chunk)
-                print(f"Inserted batch {k//500 + 1}...")
-                
-        print("SUCCESS: Data fully ingested.")
+            if mode == 'replace':
+                print("Clearing existing data (TRUNCATE)...")
+                conn.execute(text("TRUNCATE TABLE fms_fatigue_alerts"))
+            with stats.stage('partitions') as st:
+                st.rows_out = len(ensure_months(conn, table))
+            with stats.stage('merge', total) as st:
+                if has_natural_key(conn):
+                    inserted, updated = merge_staging(conn, table)
+                    print(f"Upsert: {inserted} new, {updated} changed, {total - inserted - updated} unchanged or repeated.")
+                else:
+                    col_list = ", ".join(DB_COLS)
+                    inserted, updated = conn.execute(text(
+                        f"INSERT INTO fms_fatigue_alerts ({col_list}) SELECT {col_list} FROM {table} ORDER BY seq"
+                    )).rowcount, 0
+                result['rows_written'] = st.rows_out = inserted + updated
+
+            with stats.stage('quarantine', len(rejects)):
+                clear_rejects(conn, mode, [job['label'] for job in jobs])
+                write_rejects(conn, rejects, loader)
+
+            with stats.stage('rollup') as st:
+                st.rows_out = refresh_rollup(conn, table if mode == 'incremental' else None)
+            with stats.stage('hotspots') as st:
+                st.rows_out = refresh_hotspots(conn, table if mode == 'incremental' else None)
+            with stats.stage('episodes') as st:
+                st.rows_out = refresh_episodes(conn, table if mode == 'incremental' else None, loader=loader)
+
+            for job in jobs:
+                if job['path'] in staged_per_file:
+                    conn.execute(text(
+                        "INSERT INTO fms_ingest_files (source, content_hash, mode, rows_written) "
+                        "VALUES (:source, :content_hash, :mode, :rows_written)"
+                    ), {"source": job['source'], "content_hash": hashes[job['path']], "mode": mode,
+                        "rows_written": staged_per_file.pop(job['path'])})
+
+        elapsed = time.perf_counter() - started
+        print(f"SUCCESS: Batch ingested ({result['rows_read']} rows read from {len(jobs)} file(s)/sheet(s), "
+              f"{result['rows_written']} written, {result['rows_read'] / elapsed:.0f} rows/s overall).")
     except Exception as e:
         print("DATABASE ERROR:")
         traceback.print_exc()
+        result.update(status='error', error=str(e))
+    finally:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        except Exception:
+            traceback.print_exc()
+
+def serve(host, port):
+    """Run a local HTTP ingest server so imports and the DB pool stay warm between jobs.
+
+    POST /ingest  {"input": path_or_url, "mode", "loader", "stream", "chunk_size", "force", "parse_cache",
+                   "reject_file", "dedupe_existing"}
+                  {"input": [paths_or_urls], "all_sheets", "workers", "db_connections", ...} runs a batch
+    GET  /health
+
+    Jobs are handled one at a time, so a reload and an upsert never interleave.
+    """
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+
+    class IngestHandler(BaseHTTPRequestHandler):
+        def send_json(self, status, payload):
+            body = json.dumps(payload, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self.send_json(200, {'status': 'ok'})
+            else:
+                self.send_json(404, {'error': 'Not found'})
+
+        def do_POST(self):
+            if self.path != '/ingest':
+                return self.send_json(404, {'error': 'Not found'})
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                job = json.loads(self.rfile.read(length) or b'{}')
+                input_arg = job['input']
+                batch = isinstance(input_arg, list) or bool(job.get('all_sheets'))
+                mode = job.get('mode', 'replace')
+                loader = job.get('loader', 'copy')
+                if mode not in MODES or loader not in LOADERS:
+                    raise ValueError(f"unknown mode/loader: {mode}/{loader}")
+                chunk_size = int(job.get('chunk_size', DEFAULT_CHUNK_SIZE)) if job.get('stream') else None
+            except (ValueError, KeyError, TypeError) as e:
+                return self.send_json(400, {'error': f"Bad request: {e}"})
+
+            if batch:
+                inputs = input_arg if isinstance(input_arg, list) else [input_arg]
+                result = ingest_batch(inputs, loader, mode, job.get('workers'), int(job.get('db_connections', 2)),
+                                      bool(job.get('all_sheets')), force=bool(job.get('force')),
+                                      parse_cache=job.get('parse_cache', True), reject_file=job.get('reject_file'),
+                                      dedupe_existing=bool(job.get('dedupe_existing')))
+            else:
+                result = run_job(input_arg, chunk_size, loader, mode, force=bool(job.get('force')),
+                                 parse_cache=job.get('parse_cache', True), reject_file=job.get('reject_file'),
+                                 dedupe_existing=bool(job.get('dedupe_existing')))
+            self.send_json(500 if result['status'] == 'error' else 200, result)
+
+    get_engine()
+    server = HTTPServer((host, port), IngestHandler)
+    print(f"Ingest server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Ingest an FMS fatigue export into fms_fatigue_alerts")
+    parser.add_argument("input", nargs='*', help="path(s), glob(s) or URL(s) of CSV/XLSX exports; several run as a batch")
+    parser.add_argument("--stream", action="store_true",
+                        help="read, clean and insert the file in bounded chunks")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"rows per chunk in streaming mode (default {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--loader", choices=LOADERS, default='copy',
+                        help="write path: COPY FROM STDIN (default) or batched executemany INSERTs")
+    parser.add_argument("--mode", choices=MODES, default='replace',
+                        help="replace: TRUNCATE and reload (default); incremental: upsert new/changed rows only")
+    parser.add_argument("--force", action="store_true",
+                        help="ingest even if the file is identical to the last one ingested")
+    parser.add_argument("--dedupe-existing", action="store_true",
+                        help="first incremental run: delete stored rows repeating a natural key (keeping the most "
+                             "recent copy) instead of aborting")
+    parser.add_argument("--no-parse-cache", action="store_true",
+                        help="read the source file even if a parsed copy is cached (FMS_PARSE_CACHE, FMS_PARSE_CACHE_MB)")
+    parser.add_argument("--reject-file", metavar="PATH",
+                        help="CSV for rows failing validation (default <file>.rejects.csv, or fms_rejects_<time>.csv "
+                             "for URLs and batches)")
+    parser.add_argument("--json", action="store_true",
+                        help="print the structured result as JSON on the last line")
+    parser.add_argument("--all-sheets", action="store_true",
+                        help="batch: ingest every sheet of each workbook, not just the first")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="batch: parse/transform processes (default: CPU count)")
+    parser.add_argument("--db-connections", type=int, default=2,
+                        help="batch: database connections used for loading (default 2)")
+    parser.add_argument("--stats-file", metavar="PATH",
+                        help="also write the structured result (per-stage stats) as JSON to PATH")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="run under cProfile and dump the profile to PATH (view with snakeviz/pstats)")
+    parser.add_argument("--refresh-rollup", action="store_true",
+                        help="rebuild the fms_fatigue_rollup dashboard table from fms_fatigue_alerts and exit")
+    parser.add_argument("--refresh-hotspots", action="store_true",
+                        help="geocode stored alerts that lack a geohash, rebuild the fms_fatigue_hotspots grid "
+                             "(cell size FMS_HOTSPOT_PRECISION, or --hotspot-precision) and exit")
+    parser.add_argument("--hotspot-precision", type=int, default=HOTSPOT_PRECISION, metavar="N",
+                        help=f"geohash characters per hotspot cell for --refresh-hotspots (default {HOTSPOT_PRECISION})")
+    parser.add_argument("--resolve-supervisors", action="store_true",
+                        help="re-resolve employee_id of all stored alerts from the employees table, report "
+                             "unresolved supervisor names and exit")
+    parser.add_argument("--serve", action="store_true",
+                        help="run as a long-lived local HTTP ingest server instead of a one-shot job")
+    parser.add_argument("--host", default="127.0.0.1", help="server bind address (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"server port (default {DEFAULT_PORT})")
+    return parser
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python ingest_fatigue.py <path_or_url>")
+        print("Usage: python ingest_fatigue.py <path_or_url>... [--all-sheets] [--workers N] [--db-connections N] [--stream] [--chunk-size N] [--loader copy|executemany] [--mode replace|incremental] [--force] [--dedupe-existing] [--reject-file PATH] [--json] [--stats-file PATH] [--profile PATH]")
+        print("       python ingest_fatigue.py --serve [--host H] [--port P]")
+        print("       python ingest_fatigue.py --refresh-rollup")
+        print("       python ingest_fatigue.py --refresh-hotspots [--hotspot-precision N]")
+        print("       python ingest_fatigue.py --resolve-supervisors [--json]")
     else:
-        input_arg = sys.argv[1]
-        if input_arg.startswith("http"):
-            import requests, tempfile
-            print(f"Downloading {input_arg}...")
-            r = requests.get(input_arg)
-            # Check content type or extension from url
-            is_csv = 'output=csv' in input_arg or input_arg.endswith('.csv')
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".csv" if is_csv else ".xlsx") as tmp:
-                tmp.write(r.content)
-                path = tmp.name
-            try:
-                ingest_file(path)
-            finally:
-                if os.path.exists(path):
-                    os.remove(path)
+        args = build_arg_parser().parse_args()
+        if not database_url():
+            sys.exit("Error: DATABASE_URL not found in .env")
+        if args.serve:
+            serve(args.host, args.port)
+        elif args.refresh_rollup:
+            run_in_transaction(ensure_ingest_schema)
+            print(f"Rollup rebuilt ({run_in_transaction(refresh_rollup)} rows).")
+        elif args.refresh_hotspots:
+            run_in_transaction(ensure_ingest_schema)
+            print(f"Geocoded {run_in_transaction(geocode_stored_alerts)} stored alerts.")
+            cells = run_in_transaction(refresh_hotspots, None, args.hotspot_precision)
+            print(f"Hotspots rebuilt ({cells} rows, precision {args.hotspot_precision}).")
+        elif args.resolve_supervisors:
+            run_in_transaction(ensure_ingest_schema)
+            updated, supervisors, unresolved = run_in_transaction(resolve_stored_supervisors)
+            report = supervisors.report(unresolved)
+            print(f"Updated employee_id of {updated} alerts ({len(supervisors)} employees indexed).")
+            if args.json:
+                print(json.dumps(report.to_dict(orient='records')))
+            elif len(report):
+                print(f"Unresolved supervisor names ({len(report)}):")
+                print(report.to_string(index=False))
+        elif not args.input:
+            build_arg_parser().error("input is required unless --serve is given")
         else:
-            ingest_file(input_arg)
+            import glob
+            from functools import partial
+
+            if len(args.input) > 1 or args.all_sheets or glob.has_magic(args.input[0]):
+                job = partial(ingest_batch, args.input, args.loader, args.mode, args.workers,
+                              args.db_connections, args.all_sheets, force=args.force,
+                              parse_cache=not args.no_parse_cache, reject_file=args.reject_file,
+                              dedupe_existing=args.dedupe_existing)
+            else:
+                chunk_size = args.chunk_size if args.stream else None
+                job = partial(run_job, args.input[0], chunk_size, args.loader, args.mode, force=args.force,
+                              parse_cache=not args.no_parse_cache, reject_file=args.reject_file,
+                              dedupe_existing=args.dedupe_existing)
+            if args.profile:
+                import cProfile
+                profiler = cProfile.Profile()
+                result = profiler.runcall(job)
+                profiler.dump_stats(args.profile)
+                print(f"Profile written to {args.profile}")
+            else:
+                result = job()
+            if args.stats_file:
+                with open(args.stats_file, 'w') as f:
+                    json.dump(result, f, default=str, indent=2)
+            if args.json:
+                print(json.dumps(result, default=str))
+            if result['status'] == 'error':
+                sys.exit(1)
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import tempfile
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # the cache is simply off without pyarrow
+    pa = pq = None
+
+# On-disk cache of parsed FMS exports as Parquet, keyed by the source file's sha256 (plus
+# sheet and normalization version), so re-ingesting the same file after a mapping change
+# skips read_excel/read_csv. Entries are memory-mapped on read. The directory is kept
+# under a size limit by evicting the least recently used files (mtime is bumped on hits).
+#
+#   from parse_cache import ParseCache
+#   df = ParseCache().get(content_hash)      # None on a miss
+
+CACHE_DIR = os.getenv("FMS_PARSE_CACHE") or os.path.join(tempfile.gettempdir(), "fms_parse_cache")
+DEFAULT_MAX_MB = 1024
+ROW_GROUP_ROWS = 65536
+
+def available():
+    return pq is not None
+
+def max_bytes_from_env():
+    try:
+        return int(float(os.getenv("FMS_PARSE_CACHE_MB", DEFAULT_MAX_MB)) * 2**20)
+    except ValueError:
+        return DEFAULT_MAX_MB * 2**20
+
+def to_arrow(df):
+    """Arrow table for a frame; object columns Arrow can't type (mixed str/int cells) are stored as text."""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        df = df.copy()
+        for col in df.columns:
+            if df[col].dtype == object:
+                try:
+                    pa.array(df[col], from_pandas=True)
+                except (pa.ArrowTypeError, pa.ArrowInvalid):
+                    df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+class ParseCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes_from_env() if max_bytes is None else max_bytes
+
+    def path(self, content_hash, sheet=None, version=''):
+        key = hashlib.sha256(f"{content_hash}|{sheet if sheet is not None else ''}|{version}".encode('utf-8'))
+        return os.path.join(self.directory, key.hexdigest()[:32] + '.parquet')
+
+    def _hit(self, path):
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def get(self, content_hash, sheet=None, version=''):
+        """The cached frame, or None."""
+        path = self.path(content_hash, sheet, version)
+        if not self._hit(path):
+            return None
+        try:
+            return pq.read_table(path, memory_map=True).to_pandas()
+        except (OSError, pa.ArrowException):
+            self._discard(path)
+            return None
+
+    def iter_chunks(self, content_hash, chunk_size, sheet=None, version=''):
+        """The cached frame in chunks of at most chunk_size rows, or None on a miss."""
+        path = self.path(content_hash, sheet, version)
+        if not self._hit(path):
+            return None
+        try:
+            parquet = pq.ParquetFile(path, memory_map=True)
+        except (OSError, pa.ArrowException):
+            self._discard(path)
+            return None
+        return (batch.to_pandas() for batch in parquet.iter_batches(batch_size=chunk_size))
+
+    def put(self, content_hash, df, sheet=None, version=''):
+        """Store a frame (atomically) and evict old entries. Returns the entry path, or None if it failed."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(content_hash, sheet, version)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            pq.write_table(to_arrow(df), tmp, row_group_size=ROW_GROUP_ROWS)
+            os.replace(tmp, path)
+        except (OSError, pa.ArrowException) as e:
+            print(f"Warning: could not write the parse cache ({e}).")
+            self._discard(tmp)
+            return None
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.parquet'):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path != keep:
+                self._discard(path)
+                total -= size
+
+    def _discard(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def default_cache():
+    """The shared cache, or None when pyarrow is missing or FMS_PARSE_CACHE_MB is 0."""
+    if not available() or max_bytes_from_env() <= 0:
+        return None
+    return ParseCache()
@@ -0,0 +1,257 @@
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import time
+from urllib.parse import urlparse, unquote
+
+import requests
+
+# Download of remote CSV/XLSX exports (e.g. a published Google Sheet) for the ingest scripts.
+#
+# - The body is streamed to disk in CHUNK_BYTES blocks with connect/read timeouts, never
+#   held in memory as a whole.
+# - The last copy of each URL is kept in CACHE_DIR with its ETag/Last-Modified, so asking
+#   for an unchanged export costs one 304 and reuses the cached file.
+# - A dropped connection is resumed with a Range request (guarded by If-Range) instead of
+#   starting over.
+# - CSV vs XLSX is decided from Content-Type, then the file name, then the first bytes.
+# - RemoteFile.reader() is a file object over a body that is still downloading, so CSV
+#   parsing starts with the first block.
+
+CACHE_DIR = os.getenv("FMS_DOWNLOAD_CACHE") or os.path.join(tempfile.gettempdir(), "fms_downloads")
+# (connect, read) seconds; the read timeout applies to each block, not the whole body
+TIMEOUT = (10, 60)
+CHUNK_BYTES = 1 << 20
+ATTEMPTS = 4
+
+CSV_TYPES = {'text/csv', 'application/csv', 'text/comma-separated-values', 'text/plain'}
+XLSX_TYPES = {'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+              'application/vnd.ms-excel', 'application/excel'}
+
+class DownloadError(Exception):
+    pass
+
+def cache_paths(url, cache_dir=CACHE_DIR):
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()[:24]
+    return os.path.join(cache_dir, key), os.path.join(cache_dir, key + '.json')
+
+def load_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return meta if os.path.exists(meta['path']) else None
+    except (OSError, ValueError, KeyError):
+        return None
+
+def save_meta(meta_path, meta):
+    tmp = meta_path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+
+def detect_format(response, url, head=b''):
+    """'csv' or 'xlsx' for a response, from Content-Type, then the file name, then the magic bytes."""
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    if content_type in XLSX_TYPES:
+        return 'xlsx'
+    if content_type in CSV_TYPES:
+        return 'csv'
+    if content_type == 'text/html':
+        raise DownloadError(f"{url} returned an HTML page, not a CSV/XLSX export (is the sheet published?)")
+
+    disposition = response.headers.get('Content-Disposition', '')
+    match = re.search(r"filename\*?=(?:UTF-8'')?\"?([^\";]+)", disposition, re.IGNORECASE)
+    name = unquote(match.group(1)) if match else urlparse(url).path
+    query = urlparse(url).query
+    if name.lower().endswith('.xlsx') or 'output=xlsx' in query or 'format=xlsx' in query:
+        return 'xlsx'
+    if name.lower().endswith('.csv') or 'output=csv' in query or 'format=csv' in query:
+        return 'csv'
+    # XLSX is a zip archive
+    return 'xlsx' if head.startswith(b'PK\x03\x04') else 'csv'
+
+class RemoteFile:
+    """One fetch of a URL. path is the cached file once complete; status is 'downloaded' or 'not_modified'."""
+
+    def __init__(self, url, cache_dir=CACHE_DIR, timeout=TIMEOUT, attempts=ATTEMPTS):
+        self.url = url
+        self.timeout = timeout
+        self.attempts = attempts
+        self.base, self.meta_path = cache_paths(url, cache_dir)
+        os.makedirs(cache_dir, exist_ok=True)
+        self.status = None
+        self.format = None
+        self.path = None
+        self.bytes = 0
+        self.resumes = 0
+        self.sha256 = None
+        self.complete = False
+        self._response = None
+        self._blocks = None
+        self._pending = b''
+        self._part = None
+        self._digest = None
+        self.etag = None
+        self.last_modified = None
+
+    # Connection
+
+    def _get(self, headers):
+        response = requests.get(self.url, headers=headers, stream=True, timeout=self.timeout)
+        if response.status_code >= 500:
+            response.close()
+            raise requests.ConnectionError(f"HTTP {response.status_code}")
+        return response
+
+    def _retrying(self, fn, *args):
+        for attempt in range(1, self.attempts + 1):
+            try:
+                return fn(*args)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.attempts:
+                    raise DownloadError(f"{self.url}: {e}") from e
+                delay = min(8.0, 0.5 * 2 ** (attempt - 1))
+                print(f"Download error ({type(e).__name__}); retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{self.attempts})...")
+                time.sleep(delay)
+
+    def open(self):
+        """Send the (conditional) request. Returns self; the body is read by finish() or reader()."""
+        cached = load_meta(self.meta_path)
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = self._retrying(self._get, headers)
+        if response.status_code == 304 and cached:
+            response.close()
+            self.status, self.format, self.path = 'not_modified', cached['format'], cached['path']
+            self.sha256, self.bytes, self.complete = cached.get('sha256'), 0, True
+            return self
+        try:
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            response.close()
+            raise DownloadError(str(e)) from e
+
+        self._response = response
+        self._blocks = response.iter_content(CHUNK_BYTES)
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        self._pending = self._next_block()
+        self.format = detect_format(response, self.url, self._pending)
+        self.path = f"{self.base}.{self.format}"
+        self._part = open(self.path + '.part', 'wb')
+        self._digest = hashlib.sha256()
+        self.status = 'downloaded'
+        return self
+
+    def _next_block(self):
+        try:
+            return next(self._blocks, b'')
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            return self._resume(e)
+
+    def _resume(self, error):
+        """Reconnect after a dropped body and continue from the bytes already written."""
+        validator = self.etag or self.last_modified
+        if not validator:
+            raise DownloadError(f"{self.url}: connection lost after {self.bytes} bytes and the server "
+                                f"sends no ETag/Last-Modified to resume against ({error})")
+        self._response.close()
+        self.resumes += 1
+        print(f"Download interrupted after {self.bytes} bytes ({type(error).__name__}); resuming...")
+        headers = {'Range': f"bytes={self.bytes}-", 'If-Range': validator}
+        response = self._retrying(self._get, headers)
+        if response.status_code != 206:
+            response.close()
+            raise DownloadError(f"{self.url}: changed on the server while downloading (HTTP {response.status_code} "
+                                f"to a resume request); run the ingest again")
+        self._response = response
+        self._blocks = response.iter_content(CHUNK_BYTES)
+        return self._next_block()
+
+    # Body
+
+    def read_block(self):
+        """Next block of the body (b'' at the end), written to the cache file and hashed as it passes."""
+        if self.complete:
+            return b''
+        block = self._pending if self._pending else self._next_block()
+        self._pending = b''
+        if block:
+            self._part.write(block)
+            self._digest.update(block)
+            self.bytes += len(block)
+        else:
+            self._finalize()
+        return block
+
+    def _finalize(self):
+        self._response.close()
+        self._part.close()
+        os.replace(self.path + '.part', self.path)
+        self.sha256 = self._digest.hexdigest()
+        self.complete = True
+        save_meta(self.meta_path, {
+            'url': self.url, 'path': self.path, 'format': self.format, 'sha256': self.sha256,
+            'etag': self.etag, 'last_modified': self.last_modified,
+        })
+
+    def finish(self):
+        """Download whatever is left of the body. Returns the cached file path."""
+        while self.read_block():
+            pass
+        return self.path
+
+    def reader(self):
+        """Binary file object over the body, for parsing while the download is still running."""
+        return io.BufferedReader(_BlockStream(self), buffer_size=CHUNK_BYTES)
+
+    def close(self):
+        """Abandon an unfinished download (the partial file is removed)."""
+        if self._response is not None and not self.complete:
+            self._response.close()
+            self._part.close()
+            if os.path.exists(self.path + '.part'):
+                os.remove(self.path + '.part')
+
+    def summary(self):
+        return {'url': self.url, 'status': self.status, 'format': self.format,
+                'bytes': self.bytes, 'resumes': self.resumes}
+
+class _BlockStream(io.RawIOBase):
+    def __init__(self, remote):
+        self.remote = remote
+        self.buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if not self.buffer:
+            self.buffer = memoryview(self.remote.read_block())
+        n = min(len(b), len(self.buffer))
+        b[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+def open_remote(url, **kwargs):
+    """Start fetching url. The caller reads the body via finish() or reader() (unless not_modified)."""
+    return RemoteFile(url, **kwargs).open()
+
+def fetch(url, **kwargs):
+    """Download url to the cache (or reuse it on a 304). Returns the finished RemoteFile."""
+    remote = open_remote(url, **kwargs)
+    try:
+        remote.finish()
+    except BaseException:
+        remote.close()
+        raise
+    return remote
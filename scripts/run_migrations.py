@@ -0,0 +1,260 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import traceback
+
+from dbutil import get_engine, execute_script, run_in_transaction, with_retry, text
+
+# Schema migration runner.
+#
+# Applies, in order:
+#   1. the SQL files in migrations/ (drizzle-kit output and hand-written files), each in
+#      its own transaction;
+#   2. the column fixes below (formerly fix_schema.py, add_id_column.py,
+#      add_participants_column.py, add_reminder_column.py and fix_activity_schema.py),
+#      diffed against one catalog snapshot and applied per table as a single ALTER TABLE
+#      under a single lock, so a large table is rewritten at most once.
+# Everything applied is recorded in the schema_migrations ledger.
+#
+#   python scripts/run_migrations.py            # apply pending migrations
+#   python scripts/run_migrations.py --dry-run  # print the plan only
+#   python scripts/run_migrations.py --status   # list the ledger
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'migrations')
+LEDGER_TABLE = "schema_migrations"
+
+# Desired columns per table. add: (column, definition) added when missing;
+# retype: (column, information_schema data_type, new type clause) applied when the type differs.
+COLUMN_FIXES = [
+    {
+        'name': 'fix_fms_fatigue_alerts_columns',
+        'table': 'fms_fatigue_alerts',
+        'add': [
+            ('id', "VARCHAR PRIMARY KEY DEFAULT gen_random_uuid()"),
+            ('employee_id', "TEXT"),
+            ('created_at', "TIMESTAMP DEFAULT NOW()"),
+            ('updated_at', "TIMESTAMP DEFAULT NOW()"),
+            ('sla_seconds', "INTEGER"),
+            # Position of the alert (scripts/fms_geo.py)
+            ('lat', "DOUBLE PRECISION"),
+            ('lon', "DOUBLE PRECISION"),
+            ('geohash', "TEXT"),
+        ],
+        # month was created as bigint by early ingests
+        'retype': [('month', 'text', "TEXT USING month::TEXT")],
+    },
+    {
+        'name': 'fix_activity_events_columns',
+        'table': 'activity_events',
+        'add': [
+            ('participants', "TEXT"),
+            ('reminder_sent', "BOOLEAN DEFAULT FALSE"),
+        ],
+        'retype': [('user_id', 'text', "TEXT USING user_id::text")],
+    },
+    {
+        'name': 'fix_fms_fatigue_rollup_columns',
+        'table': 'fms_fatigue_rollup',
+        'add': [
+            ('employee_id', "TEXT"),
+        ],
+        'retype': [],
+    },
+]
+
+def checksum(content):
+    if not isinstance(content, str):
+        content = json.dumps(content, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def ensure_ledger(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {LEDGER_TABLE} (
+            name TEXT PRIMARY KEY,
+            checksum TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT NOW(),
+            duration_ms INTEGER
+        )
+    """))
+
+def load_ledger(conn):
+    rows = conn.execute(text(f"SELECT name, checksum, kind, applied_at FROM {LEDGER_TABLE}")).all()
+    return {r.name: r for r in rows}
+
+def record(conn, name, digest, kind, started):
+    conn.execute(text(f"""
+        INSERT INTO {LEDGER_TABLE} (name, checksum, kind, duration_ms)
+        VALUES (:name, :checksum, :kind, :duration_ms)
+        ON CONFLICT (name) DO UPDATE
+        SET checksum = EXCLUDED.checksum, kind = EXCLUDED.kind,
+            applied_at = NOW(), duration_ms = EXCLUDED.duration_ms
+    """), {"name": name, "checksum": digest, "kind": kind,
+           "duration_ms": int((time.perf_counter() - started) * 1000)})
+
+def snapshot_catalog(conn):
+    """All public tables with their columns' data types, in one query."""
+    catalog = {}
+    for table, column, data_type in conn.execute(text("""
+        SELECT c.relname, a.attname, format_type(a.atttypid, NULL)
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+        WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p')
+    """)):
+        columns = catalog.setdefault(table, {})
+        if column is not None:
+            columns[column] = data_type
+    return catalog
+
+def sql_migrations():
+    """Migration files in apply order: drizzle journal entries first, then the rest by name."""
+    journal_path = os.path.join(MIGRATIONS_DIR, 'meta', '_journal.json')
+    journal = []
+    if os.path.exists(journal_path):
+        with open(journal_path) as f:
+            journal = [e['tag'] + '.sql' for e in sorted(json.load(f)['entries'], key=lambda e: e['idx'])]
+    files = sorted(os.path.basename(p) for p in glob.glob(os.path.join(MIGRATIONS_DIR, '*.sql')))
+    ordered = [f for f in journal if f in files] + [f for f in files if f not in journal]
+    return [(f, f in journal) for f in ordered]
+
+def created_tables(sql):
+    return re.findall(r'CREATE TABLE(?: IF NOT EXISTS)?\s+"?(\w+)"?', sql, re.IGNORECASE)
+
+def plan_sql(ledger, catalog):
+    """Pending SQL files as (name, sql, digest, kind)."""
+    plan = []
+    for name, from_drizzle in sql_migrations():
+        with open(os.path.join(MIGRATIONS_DIR, name), encoding='utf-8-sig') as f:
+            sql = f.read()
+        digest = checksum(sql)
+        if name in ledger:
+            if ledger[name].checksum != digest:
+                print(f"WARNING: {name} changed after it was applied; it is not re-run. Add a new migration instead.")
+            continue
+        kind = 'sql'
+        if from_drizzle:
+            # Databases created with drizzle-kit push already have these tables
+            tables = created_tables(sql)
+            present = [t for t in tables if t in catalog]
+            if tables and len(present) == len(tables):
+                kind = 'baseline'
+            elif present:
+                raise RuntimeError(f"{name}: {len(present)} of its {len(tables)} tables already exist; "
+                                   f"resolve the schema by hand (e.g. drizzle-kit push) and re-run")
+        plan.append((name, sql, digest, kind))
+    return plan
+
+def plan_fixes(catalog):
+    """Pending column fixes grouped per table: {table: [(fix_name, clause), ...]}."""
+    by_table = {}
+    for fix in COLUMN_FIXES:
+        columns = catalog.get(fix['table'])
+        if columns is None:
+            print(f"Skipping {fix['name']}: table {fix['table']} does not exist.")
+            continue
+        clauses = by_table.setdefault(fix['table'], [])
+        for column, definition in fix['add']:
+            if column not in columns:
+                clauses.append((fix['name'], f'ADD COLUMN "{column}" {definition}'))
+        for column, data_type, definition in fix['retype']:
+            if column in columns and columns[column] != data_type:
+                clauses.append((fix['name'], f'ALTER COLUMN "{column}" TYPE {definition}'))
+    return by_table
+
+def read_state(conn):
+    ensure_ledger(conn)
+    return load_ledger(conn), snapshot_catalog(conn)
+
+@with_retry()
+def apply_sql(name, sql, digest, kind):
+    started = time.perf_counter()
+    with get_engine().begin() as conn:
+        if kind != 'baseline':
+            execute_script(conn, sql)
+        record(conn, name, digest, kind, started)
+
+@with_retry()
+def apply_table_fixes(table, clauses, fixes, lock_timeout):
+    """All pending DDL for one table: one lock, one ALTER TABLE, one transaction.
+
+    Postgres applies the subcommands of one ALTER TABLE in a single pass, so several
+    type changes/volatile defaults rewrite the table once instead of once per column.
+    """
+    started = time.perf_counter()
+    with get_engine().begin() as conn:
+        # Fail fast (and retry) instead of queueing behind long-running queries while holding up others
+        if clauses:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{lock_timeout}'"))
+            conn.execute(text(f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE'))
+            conn.execute(text(f'ALTER TABLE "{table}" ' + ", ".join(c for _, c in clauses)))
+        for fix in fixes:
+            record(conn, fix['name'], checksum(fix), 'fix', started)
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations and column fixes")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan without applying it")
+    parser.add_argument("--status", action="store_true", help="list applied migrations and exit")
+    parser.add_argument("--lock-timeout", default="5s", help="lock_timeout for table locks (default 5s)")
+    args = parser.parse_args()
+
+    try:
+        ledger, catalog = run_in_transaction(read_state)
+    except Exception:
+        print("DATABASE ERROR:")
+        traceback.print_exc()
+        sys.exit(1)
+
+    if args.status:
+        for name, row in sorted(ledger.items(), key=lambda kv: kv[1].applied_at):
+            print(f"{row.applied_at:%Y-%m-%d %H:%M:%S}  {row.kind:<8}  {name}")
+        return
+
+    try:
+        sql_plan = plan_sql(ledger, catalog)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    # SQL files can create the tables the fixes target, so the fixes are diffed after
+    # them; in a dry run against such a database they are shown as skipped
+    for name, sql, digest, kind in sql_plan:
+        print(f"{'Would apply' if args.dry_run else 'Applying'} {name}{' (baseline, already in schema)' if kind == 'baseline' else ''}...")
+        if not args.dry_run:
+            try:
+                apply_sql(name, sql, digest, kind)
+            except Exception:
+                print(f"DATABASE ERROR in {name} (rolled back):")
+                traceback.print_exc()
+                sys.exit(1)
+
+    if sql_plan and not args.dry_run:
+        catalog = run_in_transaction(snapshot_catalog)
+
+    fixes_by_table = {}
+    for fix in COLUMN_FIXES:
+        fixes_by_table.setdefault(fix['table'], []).append(fix)
+    for table, clauses in plan_fixes(catalog).items():
+        fixes = fixes_by_table[table]
+        unrecorded = [f for f in fixes if f['name'] not in ledger or ledger[f['name']].checksum != checksum(f)]
+        if not clauses and not unrecorded:
+            continue
+        if clauses:
+            print(f"{'Would alter' if args.dry_run else 'Altering'} {table}: " + ", ".join(c for _, c in clauses))
+        if not args.dry_run:
+            try:
+                apply_table_fixes(table, clauses, fixes, args.lock_timeout)
+            except Exception:
+                print(f"DATABASE ERROR altering {table} (rolled back):")
+                traceback.print_exc()
+                sys.exit(1)
+
+    print("Dry run: nothing applied." if args.dry_run else "Schema is up to date.")
+
+if __name__ == "__main__":
+    main()
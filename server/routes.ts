@@ -14,6 +14,7 @@ import { exec } from "child_process";
 const upload = multer({ dest: 'uploads/' });
 
 import { storage } from "./storage";
+import { nextOrdinal, withOrdinalRetry } from "./sidak-ordinal";
 import { fetchSheetData, listSpreadsheetSheets, getSpreadsheetMetadata, generateVisualizationSuggestions } from "./google-sheets-service";
 import { ObjectStorageService, ObjectNotFoundError } from "./replit_integrations/object_storage";
 import { setupAuth } from "./replitAuth";
@@ -74,6 +75,9 @@ import {
   siAsefDocuments, siAsefChunks, siAsefChatSessions, siAsefChatMessages,
   insertSiAsefChatSessionSchema, insertSiAsefChatMessageSchema,
   fmsFatigueAlerts,
+  type FmsFatigueAlert,
+  fmsFatigueRollup,
+  fmsFatigueHotspots,
   insertActivityEventSchema,
   // Induction Schemas
   insertInductionMaterialSchema,
@@ -83,7 +87,7 @@ import {
   inductionMaterials,
   inductionSchedules,
 } from "@shared/schema";
-import { eq, ilike, and, desc, sql } from "drizzle-orm";
+import { eq, ilike, and, between, desc, sql } from "drizzle-orm";
 import { processAndSaveDocument, deleteDocument, processAndSaveGoogleSheet } from "./services/document-service";
 import * as whatsappService from "./services/whatsapp-service";
 import { buildRAGPrompt, searchSimilarChunks, generateEmbedding } from "./services/rag-service";
@@ -5375,16 +5379,12 @@ Format sebagai bullet points singkat per insight.`;
       const { id } = req.params;
       console.log(`[SidakKecepatan] Adding record to session ${id}:`, req.body);
 
-      // Get existing records to calculate ordinal
-      const existingRecords = await storage.getSidakKecepatanRecords(id);
-      const ordinal = existingRecords.length + 1;
+      const payload = { ...req.body, sessionId: id };
+      console.log(`[SidakKecepatan] Validating payload:`, payload);
 
-      const payload = { ...req.body, sessionId: id, ordinal };
-      console.log(`[SidakKecepatan] Validating payload for ordinal ${ordinal}:`, payload);
+      const validatedData = insertSidakKecepatanRecordSchema.omit({ ordinal: true }).parse(payload);
 
-      const validatedData = insertSidakKecepatanRecordSchema.parse(payload);
-
-      const record = await storage.createSidakKecepatanRecord(validatedData);
+      const record = await withOrdinalRetry(() => storage.createSidakKecepatanRecord({ ...validatedData, ordinal: nextOrdinal("sidak_kecepatan_records", id) }));
 
       res.json(record);
     } catch (error: any) {
@@ -5533,16 +5533,12 @@ Format sebagai bullet points singkat per insight.`;
       const { id } = req.params;
       console.log(`[SidakPencahayaan] Adding record to session ${id}:`, req.body);
 
-      // Get existing records to calculate ordinal
-      const existingRecords = await storage.getSidakPencahayaanRecords(id);
-      const ordinal = existingRecords.length + 1;
-
-      const payload = { ...req.body, sessionId: id, ordinal };
-      console.log(`[SidakPencahayaan] Validating payload for ordinal ${ordinal}:`, payload);
+      const payload = { ...req.body, sessionId: id };
+      console.log(`[SidakPencahayaan] Validating payload:`, payload);
 
-      const validatedData = insertSidakPencahayaanRecordSchema.parse(payload);
+      const validatedData = insertSidakPencahayaanRecordSchema.omit({ ordinal: true }).parse(payload);
 
-      const record = await storage.createSidakPencahayaanRecord(validatedData);
+      const record = await withOrdinalRetry(() => storage.createSidakPencahayaanRecord({ ...validatedData, ordinal: nextOrdinal("sidak_pencahayaan_records", id) }));
 
       res.json(record);
     } catch (error: any) {
@@ -5659,22 +5655,18 @@ Format sebagai bullet points singkat per insight.`;
       const { id } = req.params;
       console.log(`[SidakWorkshop] Adding equipment to session ${id}:`, req.body);
 
-      // Get existing equipment to calculate ordinal
-      const existingEquipment = await storage.getSidakWorkshopEquipment(id);
-      const ordinal = existingEquipment.length + 1;
-
-      const payload = { ...req.body, sessionId: id, ordinal };
+      const payload = { ...req.body, sessionId: id };
 
       // Convert empty string dueDate to null for database
       if (payload.dueDate === "" || payload.dueDate === undefined) {
         payload.dueDate = null;
       }
 
-      console.log(`[SidakWorkshop] Validating payload for ordinal ${ordinal}:`, payload);
+      console.log(`[SidakWorkshop] Validating payload:`, payload);
 
-      const validatedData = insertSidakWorkshopEquipmentSchema.parse(payload);
+      const validatedData = insertSidakWorkshopEquipmentSchema.omit({ ordinal: true }).parse(payload);
 
-      const equipment = await storage.createSidakWorkshopEquipment(validatedData);
+      const equipment = await withOrdinalRetry(() => storage.createSidakWorkshopEquipment({ ...validatedData, ordinal: nextOrdinal("sidak_workshop_equipment", id) }));
 
       res.json(equipment);
     } catch (error: any) {
@@ -5791,16 +5783,12 @@ Format sebagai bullet points singkat per insight.`;
       const { id } = req.params;
       console.log(`[SidakLOTO] Adding record to session ${id}:`, req.body);
 
-      // Get existing records to calculate ordinal
-      const existingRecords = await storage.getSidakLotoRecords(id);
-      const ordinal = existingRecords.length + 1;
-
-      const payload = { ...req.body, sessionId: id, ordinal };
-      console.log(`[SidakLOTO] Validating payload for ordinal ${ordinal}:`, payload);
+      const payload = { ...req.body, sessionId: id };
+      console.log(`[SidakLOTO] Validating payload:`, payload);
 
-      const validatedData = insertSidakLotoRecordSchema.parse(payload);
+      const validatedData = insertSidakLotoRecordSchema.omit({ ordinal: true }).parse(payload);
 
-      const record = await storage.createSidakLotoRecord(validatedData);
+      const record = await withOrdinalRetry(() => storage.createSidakLotoRecord({ ...validatedData, ordinal: nextOrdinal("sidak_loto_records", id) }));
 
       res.json(record);
     } catch (error: any) {
@@ -6018,16 +6006,12 @@ Format sebagai bullet points singkat per insight.`;
       const { id } = req.params;
       console.log(`[SidakDigital] Adding record to session ${id}:`, req.body);
 
-      // Get existing records to calculate ordinal
-      const existingRecords = await storage.getSidakDigitalRecords(id);
-      const ordinal = existingRecords.length + 1;
+      const payload = { ...req.body, sessionId: id };
+      console.log(`[SidakDigital] Validating payload:`, payload);
 
-      const payload = { ...req.body, sessionId: id, ordinal };
-      console.log(`[SidakDigital] Validating payload for ordinal ${ordinal}:`, payload);
+      const validatedData = insertSidakDigitalRecordSchema.omit({ ordinal: true }).parse(payload);
 
-      const validatedData = insertSidakDigitalRecordSchema.parse(payload);
-
-      const record = await storage.createSidakDigitalRecord(validatedData);
+      const record = await withOrdinalRetry(() => storage.createSidakDigitalRecord({ ...validatedData, ordinal: nextOrdinal("sidak_digital_records", id) }));
 
       res.json(record);
     } catch (error: any) {
@@ -6812,8 +6796,8 @@ Format sebagai bullet points singkat per insight.`;
 
   app.post("/api/sidak-antrian/:id/records", async (req, res) => {
     try {
-      const validatedData = insertSidakAntrianRecordSchema.parse({ ...req.body, sessionId: req.params.id });
-      const record = await storage.createSidakAntrianRecord(validatedData);
+      const validatedData = insertSidakAntrianRecordSchema.omit({ ordinal: true }).parse({ ...req.body, sessionId: req.params.id });
+      const record = await withOrdinalRetry(() => storage.createSidakAntrianRecord({ ...validatedData, ordinal: nextOrdinal("sidak_antrian_records", req.params.id) }));
       res.status(201).json(record);
     } catch (error: any) {
       if (error.name === 'ZodError') return res.status(400).json({ message: "Data tidak valid", errors: error.errors });
@@ -6886,11 +6870,8 @@ Format sebagai bullet points singkat per insight.`;
   app.post("/api/sidak-jarak/:id/records", async (req, res) => {
     try {
       const sessionId = req.params.id;
-      const existingRecords = await storage.getSidakJarakRecords(sessionId);
-      const ordinal = existingRecords.length + 1;
-
-      const validatedData = insertSidakJarakRecordSchema.parse({ ...req.body, sessionId, ordinal });
-      const record = await storage.createSidakJarakRecord(validatedData);
+      const validatedData = insertSidakJarakRecordSchema.omit({ ordinal: true }).parse({ ...req.body, sessionId });
+      const record = await withOrdinalRetry(() => storage.createSidakJarakRecord({ ...validatedData, ordinal: nextOrdinal("sidak_jarak_records", sessionId) }));
       res.status(201).json(record);
     } catch (error: any) {
       if (error.name === 'ZodError') return res.status(400).json({ message: "Data tidak valid", errors: error.errors });
@@ -7735,14 +7716,11 @@ Format sebagai bullet points singkat per insight.`;
     try {
       const { sessionId } = req.params;
       console.log(`[SidakKecepatan] Adding record to session ${sessionId}:`, req.body);
-      const existingRecords = await storage.getSidakKecepatanRecords(sessionId);
-      const ordinal = existingRecords.length + 1;
-
-      const payload = { ...req.body, sessionId, ordinal };
-      console.log(`[SidakKecepatan] Validating payload for ordinal ${ordinal}:`, payload);
+      const payload = { ...req.body, sessionId };
+      console.log(`[SidakKecepatan] Validating payload:`, payload);
 
-      const validatedData = insertSidakKecepatanRecordSchema.parse(payload);
-      const record = await storage.createSidakKecepatanRecord(validatedData);
+      const validatedData = insertSidakKecepatanRecordSchema.omit({ ordinal: true }).parse(payload);
+      const record = await withOrdinalRetry(() => storage.createSidakKecepatanRecord({ ...validatedData, ordinal: nextOrdinal("sidak_kecepatan_records", sessionId) }));
       console.log(`[SidakKecepatan] Record saved:`, record);
       res.json(record);
     } catch (error: any) {
@@ -8994,13 +8972,8 @@ Format sebagai bullet points singkat per insight.`;
   app.post("/api/sidak-rambu/:id/observations", async (req, res) => {
     try {
       const sessionId = req.params.id;
-      // count existing observations to determine ordinal
-      const existing = await storage.getSidakRambuObservations(sessionId);
-      const ordinal = existing.length + 1;
-
       const observationData = {
         sessionId,
-        ordinal,
         nama: req.body.nama,
         noKendaraan: req.body.noKendaraan,
         perusahaan: req.body.perusahaan,
@@ -9014,7 +8987,7 @@ Format sebagai bullet points singkat per insight.`;
         keterangan: req.body.keterangan || ""
       };
 
-      const observation = await storage.createSidakRambuObservation(observationData);
+      const observation = await withOrdinalRetry(() => storage.createSidakRambuObservation({ ...observationData, ordinal: nextOrdinal("sidak_rambu_observations", sessionId) }));
 
       // Update total sampel
       await storage.updateSidakRambuSessionSampleCount(sessionId);
@@ -10552,74 +10525,84 @@ Format sebagai bullet points singkat per insight.`;
 
   app.get("/api/fms/fatigue/summary", async (req, res) => {
     try {
-      const { week, month, shift, supervisor } = req.query;
+      const { week, month, shift, supervisor, supervisorId } = req.query;
 
-      // Build conditions
+      // Build conditions (the rollup carries the same filter columns as the alerts)
       const conditions = [];
-      if (week && week !== 'all') conditions.push(eq(fmsFatigueAlerts.week, parseInt(week as string)));
-      if (month && month !== 'all') conditions.push(eq(fmsFatigueAlerts.month, month as string));
-      if (shift && shift !== 'all') conditions.push(ilike(fmsFatigueAlerts.shift, `%${shift as string}%`));
-      if (supervisor && supervisor !== 'all') conditions.push(ilike(fmsFatigueAlerts.validatedBy, `%${supervisor as string}%`));
-
-      const alerts = await db.select().from(fmsFatigueAlerts)
-        .where(
-          and(...conditions)
-        );
+      const rollupConditions = [];
+      if (week && week !== 'all') {
+        conditions.push(eq(fmsFatigueAlerts.week, parseInt(week as string)));
+        rollupConditions.push(eq(fmsFatigueRollup.week, parseInt(week as string)));
+      }
+      if (month && month !== 'all') {
+        conditions.push(eq(fmsFatigueAlerts.month, month as string));
+        rollupConditions.push(eq(fmsFatigueRollup.month, month as string));
+      }
+      if (shift && shift !== 'all') {
+        conditions.push(ilike(fmsFatigueAlerts.shift, `%${shift as string}%`));
+        rollupConditions.push(ilike(fmsFatigueRollup.shift, `%${shift as string}%`));
+      }
+      if (supervisorId && supervisorId !== 'all') {
+        // Resolved at ingest (scripts/fms_supervisors.py), so this is an indexed equality
+        conditions.push(eq(fmsFatigueAlerts.employeeId, supervisorId as string));
+        rollupConditions.push(eq(fmsFatigueRollup.employeeId, supervisorId as string));
+      } else if (supervisor && supervisor !== 'all') {
+        conditions.push(ilike(fmsFatigueAlerts.validatedBy, `%${supervisor as string}%`));
+        rollupConditions.push(ilike(fmsFatigueRollup.validatedBy, `%${supervisor as string}%`));
+      }
+
+      // Aggregates come from the rollup maintained by scripts/ingest_fatigue.py;
+      // only the preview sample touches the alerts table
+      const groups = await db.select().from(fmsFatigueRollup).where(and(...rollupConditions));
+
+      // Bounding the sample by the dates the rollup found lets Postgres scan only the
+      // monthly partitions of those dates (scripts/fms_partitions.py)
+      let sample: FmsFatigueAlert[] = [];
+      if (groups.length > 0) {
+        const dates = groups.map(g => g.alertDate).sort();
+        sample = await db.select().from(fmsFatigueAlerts)
+          .where(and(between(fmsFatigueAlerts.alertDate, dates[0], dates[dates.length - 1]), ...conditions))
+          .limit(50);
+      }
 
       // Aggregations
-      const total = alerts.length;
+      let total = 0;
       let fast = 0, slow = 0; // fast < 300s (5min)
       const hourlyCounts = Array(24).fill(0);
-      const supervisorStats: Record<string, { fast: number, slow5: number, slow10: number, slow15: number }> = {};
+      const supervisorStats: Record<string, { employeeId: string | null, fast: number, slow5: number, slow10: number, slow15: number }> = {};
       const statusCounts: Record<string, number> = {};
       const dailyTrendMap: Record<string, { date: string, fast: number, slow5: number, slow10: number, slow15: number }> = {};
 
-      alerts.forEach(a => {
+      groups.forEach(g => {
+        total += g.total;
+
         // Status Counts
-        const status = a.validationStatus || "Unknown";
-        statusCounts[status] = (statusCounts[status] || 0) + 1;
+        const status = g.validationStatus || "Unknown";
+        statusCounts[status] = (statusCounts[status] || 0) + g.total;
 
         // SLA Buckets
-        const sla = a.slaSeconds || 0;
-
-        if (sla > 0) {
-          if (sla <= 300) { fast++; }
-          else slow++;
-        }
+        fast += g.fast;
+        slow += g.slow5 + g.slow10 + g.slow15;
 
         // Supervisor Stats
-        const supName = a.validatedBy || "Unknown";
-        if (!supervisorStats[supName]) supervisorStats[supName] = { fast: 0, slow5: 0, slow10: 0, slow15: 0 };
-
-        if (sla > 0) {
-          if (sla <= 300) supervisorStats[supName].fast++;
-          else if (sla <= 600) supervisorStats[supName].slow5++; // 5-10m
-          else if (sla <= 900) supervisorStats[supName].slow10++; // 10-15m
-          else supervisorStats[supName].slow15++; // >15m
-        }
+        const supName = g.validatedBy || "Unknown";
+        if (!supervisorStats[supName]) supervisorStats[supName] = { employeeId: g.employeeId, fast: 0, slow5: 0, slow10: 0, slow15: 0 };
+        supervisorStats[supName].fast += g.fast;
+        supervisorStats[supName].slow5 += g.slow5;
+        supervisorStats[supName].slow10 += g.slow10;
+        supervisorStats[supName].slow15 += g.slow15;
 
         // Hourly Trend
-        if (a.alertTime) {
-          const hour = parseInt(a.alertTime.split(':')[0]);
-          if (!isNaN(hour) && hour >= 0 && hour < 24) {
-            hourlyCounts[hour]++;
-          }
-        }
+        g.hourly.forEach((count, hour) => { hourlyCounts[hour] += count; });
 
         // Daily Trend (by Date)
-        if (a.alertDate) {
-          const dateKey = typeof a.alertDate === 'string' ? a.alertDate : new Date(a.alertDate).toISOString().split('T')[0];
-          if (!dailyTrendMap[dateKey]) {
-            dailyTrendMap[dateKey] = { date: dateKey, fast: 0, slow5: 0, slow10: 0, slow15: 0 };
-          }
-
-          if (sla > 0) {
-            if (sla <= 300) dailyTrendMap[dateKey].fast++;
-            else if (sla <= 600) dailyTrendMap[dateKey].slow5++;
-            else if (sla <= 900) dailyTrendMap[dateKey].slow10++;
-            else dailyTrendMap[dateKey].slow15++;
-          }
+        if (!dailyTrendMap[g.alertDate]) {
+          dailyTrendMap[g.alertDate] = { date: g.alertDate, fast: 0, slow5: 0, slow10: 0, slow15: 0 };
         }
+        dailyTrendMap[g.alertDate].fast += g.fast;
+        dailyTrendMap[g.alertDate].slow5 += g.slow5;
+        dailyTrendMap[g.alertDate].slow10 += g.slow10;
+        dailyTrendMap[g.alertDate].slow15 += g.slow15;
       });
 
       // Convert dailyTrendMap to array and sort
@@ -10637,7 +10620,7 @@ Format sebagai bullet points singkat per insight.`;
         supervisorLeaderboard: supervisorStats,
         statusDistribution: statusCounts,
         // Send a small sample for table preview
-        sample: alerts.slice(0, 50)
+        sample
       });
 
     } catch (error) {
@@ -10646,6 +10629,39 @@ Format sebagai bullet points singkat per insight.`;
     }
   });
 
+  // Hotspot map: alerts per geohash cell over the whole history (or one month), busiest first
+  app.get("/api/fms/fatigue/hotspots", async (req, res) => {
+    try {
+      const { period, shift, violation } = req.query;
+      const limit = Math.min(parseInt(req.query.limit as string) || 500, 5000);
+
+      // Read from the grid maintained by scripts/ingest_fatigue.py, never from the alerts
+      const conditions = [];
+      if (period && period !== 'all') conditions.push(eq(fmsFatigueHotspots.period, period as string));
+      if (shift && shift !== 'all') conditions.push(eq(fmsFatigueHotspots.shift, shift as string));
+      if (violation && violation !== 'all') conditions.push(eq(fmsFatigueHotspots.violation, violation as string));
+
+      const total = sql<number>`SUM(${fmsFatigueHotspots.total})::int`;
+      const cells = await db.select({
+        cell: fmsFatigueHotspots.cell,
+        total,
+        // Mean position of the cell's alerts, weighted over its rows
+        lat: sql<number>`SUM(${fmsFatigueHotspots.lat} * ${fmsFatigueHotspots.total}) / SUM(${fmsFatigueHotspots.total})`,
+        lon: sql<number>`SUM(${fmsFatigueHotspots.lon} * ${fmsFatigueHotspots.total}) / SUM(${fmsFatigueHotspots.total})`,
+      })
+        .from(fmsFatigueHotspots)
+        .where(and(...conditions))
+        .groupBy(fmsFatigueHotspots.cell)
+        .orderBy(desc(total))
+        .limit(limit);
+
+      res.json({ cells });
+    } catch (error) {
+      console.error("Error fetching FMS fatigue hotspots:", error);
+      res.status(500).json({ error: "Internal server error", details: error instanceof Error ? error.message : String(error) });
+    }
+  });
+
   // FMS Fatigue Ingest Route
   app.post("/api/fms/fatigue/ingest", upload.single('file'), async (req, res) => {
     try {
@@ -10669,14 +10685,10 @@ Format sebagai bullet points singkat per insight.`;
         return res.status(400).json({ error: "No file uploaded or URL provided" });
       }
 
-      // Execute Python script
-      const scriptPath = path.join(process.cwd(), 'scripts', 'ingest_fatigue.py');
-      const pythonPath = "C:\\Users\\SDM UTAMA\\AppData\\Local\\Programs\\Python\\Python313\\python.exe";
-
-      console.log(`Executing Python script...`);
+      // Published sheets are re-synced repeatedly: upsert instead of truncate-and-reload
+      const mode = req.file ? 'replace' : 'incremental';
 
-      exec(`"${pythonPath}" "${scriptPath}" "${inputPath}"`, async (error, stdout, stderr) => {
-        // Clean up file
+      const cleanupUpload = async () => {
         try {
           if (req.file && inputPath && fs.existsSync(inputPath)) {
             await fs.promises.unlink(inputPath);
@@ -10684,6 +10696,51 @@ Format sebagai bullet points singkat per insight.`;
         } catch (cleanupError) {
           console.error(`Cleanup error: ${cleanupError}`);
         }
+      };
+
+      // Prefer the long-running ingest server (ingest_fatigue.py --serve) when configured
+      const ingestServerUrl = process.env.FMS_INGEST_SERVER_URL;
+      if (ingestServerUrl) {
+        let response: Response | null = null;
+        try {
+          response = await fetch(`${ingestServerUrl}/ingest`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            // multer's path is relative to this process; the server may run elsewhere
+            body: JSON.stringify({ input: req.file ? path.resolve(inputPath) : inputPath, mode }),
+          });
+        } catch (fetchError: any) {
+          // A configured server that isn't running falls back to executing the script below
+          const code = fetchError?.cause?.code;
+          if (!['ECONNREFUSED', 'ECONNRESET', 'ENOTFOUND', 'EHOSTUNREACH'].includes(code)) {
+            await cleanupUpload();
+            throw fetchError;
+          }
+          console.warn(`Ingest server ${ingestServerUrl} unreachable (${code}), executing the script instead.`);
+        }
+        if (response) {
+          try {
+            const result = await response.json();
+            console.log(`Ingest server result: ${JSON.stringify(result)}`);
+            if (!response.ok) {
+              return res.status(500).json({ error: "Failed to process file", details: result.error, result });
+            }
+            return res.json({ message: "Ingestion successful", result });
+          } finally {
+            await cleanupUpload();
+          }
+        }
+      }
+
+      // Execute Python script
+      const scriptPath = path.join(process.cwd(), 'scripts', 'ingest_fatigue.py');
+      const pythonPath = "C:\\Users\\SDM UTAMA\\AppData\\Local\\Programs\\Python\\Python313\\python.exe";
+
+      console.log(`Executing Python script...`);
+
+      exec(`"${pythonPath}" "${scriptPath}" "${inputPath}" --mode ${mode}`, async (error, stdout, stderr) => {
+        // Clean up file
+        await cleanupUpload();
 
         if (error) {
           console.error(`Exec Error: ${error.message}`);
@@ -11256,13 +11313,34 @@ Format sebagai bullet points singkat per insight.`;
 
       console.log("[FMS Upload] Raw Row 0:", rawData[0]);
 
+      // Header index built once per file: normalized header -> actual key. sheet_to_json
+      // omits empty cells, so the keys are collected over all rows.
+      const headerIndex = new Map<string, string>();
+      for (const row of rawData as any[]) {
+        for (const key of Object.keys(row)) {
+          const normalized = key.trim().toLowerCase();
+          if (!headerIndex.has(normalized)) headerIndex.set(normalized, key);
+        }
+      }
+      // Actual keys for each alias list, resolved once instead of per row and field
+      const resolvedKeys = new Map<string, string[]>();
+      const keysFor = (possibleKeys: string[]) => {
+        const id = possibleKeys.join('|');
+        let keys = resolvedKeys.get(id);
+        if (!keys) {
+          keys = possibleKeys
+            .map(pk => headerIndex.get(pk.toLowerCase()))
+            .filter((k): k is string => k !== undefined);
+          resolvedKeys.set(id, keys);
+        }
+        return keys;
+      };
+
       const violations = rawData.map((row: any, index: number) => {
         // Safe mapping - find keys regardless of case/whitespace
         const getValue = (possibleKeys: string[]) => {
-          const keys = Object.keys(row);
-          for (const pk of possibleKeys) {
-            const foundKey = keys.find(k => k.trim().toLowerCase() === pk.toLowerCase());
-            if (foundKey && row[foundKey] !== undefined) return row[foundKey];
+          for (const key of keysFor(possibleKeys)) {
+            if (row[key] !== undefined) return row[key];
           }
           return undefined;
         };
@@ -0,0 +1,32 @@
+import { sql } from "drizzle-orm";
+
+// Ordinal numbering for SIDAK records.
+//
+// The ordinal is computed by the INSERT itself as MAX(ordinal) + 1 of the session, so adding
+// a record no longer loads every record of the session first. Two concurrent inserts can
+// still read the same MAX; the unique (session_id, ordinal) index rejects the second one and
+// withOrdinalRetry runs it again.
+//
+//   const record = await withOrdinalRetry(() =>
+//     storage.createSidakLotoRecord({ ...validatedData, ordinal: nextOrdinal("sidak_loto_records", id) }));
+
+const MAX_RETRIES = 5;
+
+// Scalar subquery rendered into the INSERT. Typed as number so it fits the Insert* types.
+export function nextOrdinal(tableName: string, sessionId: string): number {
+  return sql`(SELECT COALESCE(MAX(ordinal), 0) + 1 FROM ${sql.identifier(tableName)} WHERE session_id = ${sessionId})` as unknown as number;
+}
+
+export async function withOrdinalRetry<T>(insert: () => Promise<T>): Promise<T> {
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await insert();
+    } catch (error: any) {
+      // Retry on unique constraint violation (concurrent insert to same ordinal)
+      if (error?.code !== '23505' || attempt >= MAX_RETRIES - 1) {
+        throw error;
+      }
+      await new Promise(resolve => setTimeout(resolve, 20 * Math.pow(2, attempt)));
+    }
+  }
+}
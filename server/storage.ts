@@ -3829,13 +3829,10 @@ export class DrizzleStorage implements IStorage {
   }
 
   async createSidakRambuObservation(observation: InsertSidakRambuObservation): Promise<SidakRambuObservation> {
-    // Get the next ordinal number
-    const existingObservations = await this.getSidakRambuObservations(observation.sessionId);
-    const nextOrdinal = existingObservations.length + 1;
-
+    // The ordinal comes from the caller (nextOrdinal() numbers it inside this INSERT)
     const [result] = await this.db
       .insert(sidakRambuObservations)
-      .values({ ...observation, ordinal: nextOrdinal })
+      .values(observation)
       .returning();
     return result;
   }
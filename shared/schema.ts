@@ -1,5 +1,5 @@
 ﻿import { sql, relations } from "drizzle-orm";
-import { pgTable, text, varchar, timestamp, boolean, integer, unique, jsonb, index, uniqueIndex, real, date, time, uuid, numeric } from "drizzle-orm/pg-core";
+import { pgTable, text, varchar, timestamp, boolean, integer, bigint, unique, jsonb, index, uniqueIndex, primaryKey, real, doublePrecision, date, time, uuid, numeric } from "drizzle-orm/pg-core";
 import { createInsertSchema } from "drizzle-zod";
 import { z } from "zod";
 
@@ -1153,7 +1153,9 @@ export const sidakRambuObservations = pgTable("sidak_rambu_observations", {
   rambuLaranganUTurn: boolean("rambu_larangan_uturn").notNull().default(true),
   keterangan: text("keterangan").default(""),
   createdAt: timestamp("created_at").defaultNow(),
-});
+}, (table) => [
+  uniqueIndex("sidak_rambu_session_ordinal_unique").on(table.sessionId, table.ordinal),
+]);
 
 export const sidakRambuObservers = pgTable("sidak_rambu_observers", {
   id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
@@ -1219,6 +1221,7 @@ export const sidakAntrianRecords = pgTable("sidak_antrian_records", {
   createdAt: timestamp("created_at").defaultNow(),
 }, (table) => [
   index("IDX_antrian_records_session").on(table.sessionId),
+  uniqueIndex("sidak_antrian_session_ordinal_unique").on(table.sessionId, table.ordinal),
 ]);
 
 export const sidakAntrianObservers = pgTable("sidak_antrian_observers", {
@@ -1308,6 +1311,7 @@ export const sidakApdRecords = pgTable("sidak_apd_records", {
   createdAt: timestamp("created_at").defaultNow(),
 }, (table) => [
   index("IDX_apd_records_session").on(table.sessionId),
+  uniqueIndex("sidak_apd_session_ordinal_unique").on(table.sessionId, table.ordinal),
 ]);
 
 export const sidakApdObservers = pgTable("sidak_apd_observers", {
@@ -1383,6 +1387,7 @@ export const sidakJarakRecords = pgTable("sidak_jarak_records", {
   createdAt: timestamp("created_at").defaultNow(),
 }, (table) => [
   index("IDX_jarak_records_session").on(table.sessionId),
+  uniqueIndex("sidak_jarak_session_ordinal_unique").on(table.sessionId, table.ordinal),
 ]);
 
 export const sidakJarakObservers = pgTable("sidak_jarak_observers", {
@@ -1457,6 +1462,7 @@ export const sidakKecepatanRecords = pgTable("sidak_kecepatan_records", {
   createdAt: timestamp("created_at").defaultNow(),
 }, (table) => [
   index("IDX_kecepatan_records_session").on(table.sessionId),
+  uniqueIndex("sidak_kecepatan_session_ordinal_unique").on(table.sessionId, table.ordinal),
 ]);
 
 export const sidakKecepatanObservers = pgTable("sidak_kecepatan_observers", {
@@ -1546,7 +1552,10 @@ export const sidakLotoRecords = pgTable("sidak_loto_records", {
 
   keterangan: text("keterangan"), // Remarks/Notes
   createdAt: timestamp("created_at").defaultNow(),
-}, (table) => [index("IDX_loto_records_session").on(table.sessionId)]);
+}, (table) => [
+  index("IDX_loto_records_session").on(table.sessionId),
+  uniqueIndex("sidak_loto_session_ordinal_unique").on(table.sessionId, table.ordinal),
+]);
 
 export const sidakLotoObservers = pgTable("sidak_loto_observers", {
   id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
@@ -1608,7 +1617,10 @@ export const sidakDigitalRecords = pgTable("sidak_digital_records", {
 
   keterangan: text("keterangan"), // Remarks
   createdAt: timestamp("created_at").defaultNow(),
-}, (table) => [index("IDX_digital_records_session").on(table.sessionId)]);
+}, (table) => [
+  index("IDX_digital_records_session").on(table.sessionId),
+  uniqueIndex("sidak_digital_session_ordinal_unique").on(table.sessionId, table.ordinal),
+]);
 
 export const sidakDigitalObservers = pgTable("sidak_digital_observers", {
   id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
@@ -1667,7 +1679,10 @@ export const sidakPencahayaanRecords = pgTable("sidak_pencahayaan_records", {
   keterangan: text("keterangan"), // Remarks (explanation of visual assessment)
 
   createdAt: timestamp("created_at").defaultNow(),
-}, (table) => [index("IDX_pencahayaan_records_session").on(table.sessionId)]);
+}, (table) => [
+  index("IDX_pencahayaan_records_session").on(table.sessionId),
+  uniqueIndex("sidak_pencahayaan_session_ordinal_unique").on(table.sessionId, table.ordinal),
+]);
 
 export const sidakPencahayaanObservers = pgTable("sidak_pencahayaan_observers", {
   id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
@@ -1720,7 +1735,10 @@ export const sidakWorkshopEquipment = pgTable("sidak_workshop_equipment", {
   tindakLanjutPerbaikan: text("tindak_lanjut_perbaikan"), // Corrective action
   dueDate: date("due_date"), // Due date for corrective action
   createdAt: timestamp("created_at").defaultNow(),
-}, (table) => [index("IDX_workshop_equipment_session").on(table.sessionId)]);
+}, (table) => [
+  index("IDX_workshop_equipment_session").on(table.sessionId),
+  uniqueIndex("sidak_workshop_session_ordinal_unique").on(table.sessionId, table.ordinal),
+]);
 
 // Inspectors (different from observers - this form uses "Inspektor")
 export const sidakWorkshopInspectors = pgTable("sidak_workshop_inspectors", {
@@ -2329,8 +2347,10 @@ export type InsertSiAsefChatMessage = z.infer<typeof insertSiAsefChatMessageSche
 // For high-volume automated ingestion from Excel/API
 // ============================================
 
+// Partitioned by month of alert_date (scripts/fms_partitions.py), hence the primary key
+// (id, alert_date); months past the retention window are archived to Parquet
 export const fmsFatigueAlerts = pgTable("fms_fatigue_alerts", {
-  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  id: varchar("id").notNull().default(sql`gen_random_uuid()`),
 
   // Alert Metadata from FMS
   alertDate: text("alert_date").notNull(), // YYYY-MM-DD
@@ -2348,29 +2368,154 @@ export const fmsFatigueAlerts = pgTable("fms_fatigue_alerts", {
 
   // Coordinates
   coordinate: text("coordinate"),
+  lat: doublePrecision("lat"), // Parsed from coordinate by scripts/ingest_fatigue.py
+  lon: doublePrecision("lon"),
+  geohash: text("geohash"), // 9-character geohash of lat/lon; any prefix is a grid cell
   level: integer("level"),
 
   // Validation Tracking
   validationStatus: text("validation_status").default("Belum Validasi"), // Valid / Tidak Valid
   validatedBy: text("validated_by"), // Supervisor Name from Roster
+  employeeId: text("employee_id"), // Employee the supervisor name resolves to (scripts/fms_supervisors.py)
   validatedAt: timestamp("validated_at"),
 
   // Speed/Performance
   slaSeconds: integer("sla_seconds"), // Difference between validatedAt and alert datetime
 
+  // Content fingerprint of the source row (set by scripts/ingest_fatigue.py)
+  rowHash: bigint("row_hash", { mode: "number" }),
+
   createdAt: timestamp("created_at").defaultNow(),
   updatedAt: timestamp("updated_at").defaultNow(),
 }, (table) => [
+  primaryKey({ columns: [table.id, table.alertDate] }),
   index("IDX_fms_fatigue_date").on(table.alertDate),
   index("IDX_fms_fatigue_vehicle").on(table.vehicleNo),
   index("IDX_fms_fatigue_week").on(table.week),
   index("IDX_fms_fatigue_sla").on(table.slaSeconds),
+  index("IDX_fms_fatigue_row_hash").on(table.rowHash),
+  index("IDX_fms_fatigue_employee").on(table.employeeId),
+  index("IDX_fms_fatigue_geohash").on(sql`${table.geohash} text_pattern_ops`),
+  // Natural key used by incremental ingest (scripts/ingest_fatigue.py --mode incremental)
+  uniqueIndex("UQ_fms_fatigue_natural_key").on(table.alertDate, table.alertTime, table.vehicleNo, sql`COALESCE(${table.violation}, '')`),
 ]);
 
 export const insertFmsFatigueAlertSchema = createInsertSchema(fmsFatigueAlerts).omit({ id: true, createdAt: true, updatedAt: true });
 export type FmsFatigueAlert = typeof fmsFatigueAlerts.$inferSelect;
 export type InsertFmsFatigueAlert = z.infer<typeof insertFmsFatigueAlertSchema>;
 
+// Log of ingested FMS files; a file whose hash matches the latest entry is skipped
+export const fmsIngestFiles = pgTable("fms_ingest_files", {
+  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  source: text("source"), // File path or published sheet URL
+  contentHash: text("content_hash").notNull(), // sha256 of the file
+  mode: text("mode"), // replace / incremental
+  rowsWritten: integer("rows_written"),
+  ingestedAt: timestamp("ingested_at").defaultNow(),
+});
+
+export type FmsIngestFile = typeof fmsIngestFiles.$inferSelect;
+
+// Dashboard rollup of fms_fatigue_alerts, rebuilt by scripts/ingest_fatigue.py on every ingest
+export const fmsFatigueRollup = pgTable("fms_fatigue_rollup", {
+  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  alertDate: text("alert_date").notNull(),
+  week: integer("week"),
+  month: text("month"),
+  shift: text("shift"),
+  validatedBy: text("validated_by"),
+  employeeId: text("employee_id"),
+  validationStatus: text("validation_status"),
+  total: integer("total").notNull(),
+  fast: integer("fast").notNull(), // SLA <= 5m
+  slow5: integer("slow5").notNull(), // 5-10m
+  slow10: integer("slow10").notNull(), // 10-15m
+  slow15: integer("slow15").notNull(), // > 15m
+  hourly: integer("hourly").array().notNull(), // Alert counts per hour of day (24)
+  refreshedAt: timestamp("refreshed_at").defaultNow(),
+}, (table) => [
+  index("IDX_fms_fatigue_rollup_date").on(table.alertDate),
+  index("IDX_fms_fatigue_rollup_employee").on(table.employeeId),
+]);
+
+export type FmsFatigueRollup = typeof fmsFatigueRollup.$inferSelect;
+
+// Hotspot grid of fms_fatigue_alerts, rebuilt by scripts/ingest_fatigue.py on every ingest
+export const fmsFatigueHotspots = pgTable("fms_fatigue_hotspots", {
+  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  period: text("period").notNull(), // YYYY-MM of alert_date
+  precision: integer("precision").notNull(), // Geohash characters per cell
+  cell: text("cell").notNull(), // Geohash prefix of the alerts
+  shift: text("shift"),
+  violation: text("violation"),
+  total: integer("total").notNull(),
+  lat: doublePrecision("lat").notNull(), // Mean position of the cell's alerts
+  lon: doublePrecision("lon").notNull(),
+  refreshedAt: timestamp("refreshed_at").defaultNow(),
+}, (table) => [
+  index("IDX_fms_fatigue_hotspots_cell").on(table.precision, table.cell),
+  index("IDX_fms_fatigue_hotspots_period").on(table.period),
+]);
+
+export type FmsFatigueHotspot = typeof fmsFatigueHotspots.$inferSelect;
+
+// Rows of an FMS export that failed validation in scripts/ingest_fatigue.py, kept as read with the reasons
+export const fmsFatigueRejects = pgTable("fms_fatigue_rejects", {
+  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  source: text("source"), // File path or published sheet URL
+  sourceRow: integer("source_row"), // Line in the sheet (header = 1)
+  reasons: text("reasons").notNull(), // e.g. "required:vehicle_no; date_format:alert_date"
+  alertDate: text("alert_date"),
+  alertTime: text("alert_time"),
+  vehicleNo: text("vehicle_no"),
+  company: text("company"),
+  violation: text("violation"),
+  location: text("location"),
+  oprDate: text("opr_date"),
+  shift: text("shift"),
+  week: text("week"),
+  month: text("month"),
+  coordinate: text("coordinate"),
+  level: text("level"),
+  validationStatus: text("validation_status"),
+  validatedBy: text("validated_by"),
+  validatedAt: text("validated_at"),
+  rejectedAt: timestamp("rejected_at").defaultNow(),
+}, (table) => [
+  index("IDX_fms_fatigue_rejects_source").on(table.source),
+]);
+
+export type FmsFatigueReject = typeof fmsFatigueRejects.$inferSelect;
+
+// Repeat-offender episodes detected over fms_fatigue_alerts by scripts/fms_episodes.py
+export const fmsFatigueEpisodes = pgTable("fms_fatigue_episodes", {
+  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  rule: text("rule").notNull(), // e.g. "window_3_in_2h", "shift_5", "consecutive_shifts_3"
+  vehicleNo: text("vehicle_no").notNull(),
+  startedAt: timestamp("started_at").notNull(), // First alert of the episode
+  endedAt: timestamp("ended_at").notNull(), // Last alert of the episode
+  alertCount: integer("alert_count").notNull(),
+  shiftCount: integer("shift_count"), // Shifts spanned (shift rules only)
+  detectedAt: timestamp("detected_at").defaultNow(),
+}, (table) => [
+  index("IDX_fms_fatigue_episodes_vehicle").on(table.vehicleNo, table.startedAt),
+  index("IDX_fms_fatigue_episodes_started").on(table.startedAt),
+]);
+
+export type FmsFatigueEpisode = typeof fmsFatigueEpisodes.$inferSelect;
+
+// Months of fms_fatigue_alerts archived to Parquet and detached by scripts/fms_partitions.py
+export const fmsFatigueArchives = pgTable("fms_fatigue_archives", {
+  month: text("month").primaryKey(), // YYYY-MM of alert_date
+  path: text("path").notNull(), // Parquet file of the month's rows
+  rows: integer("rows").notNull(),
+  sha256: text("sha256").notNull(), // Checked before a restore
+  archivedAt: timestamp("archived_at").defaultNow(),
+  restoredAt: timestamp("restored_at"), // Set while the month is attached again
+});
+
+export type FmsFatigueArchive = typeof fmsFatigueArchives.$inferSelect;
+
 // ============================================
 // ACTIVITY CALENDAR (Mystic AI)
 // ============================================
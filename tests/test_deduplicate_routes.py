@@ -0,0 +1,82 @@
+from deduplicate_routes import deduplicate_routes, find_duplicates, normalize_path, scan_routes, shadows
+
+FIXTURE = '''\
+import express from "express";
+
+export function registerRoutes(app) {
+  app.get("/api/items/:id", async (req, res) => {
+    // app.get("/api/in-comment", handler) is not a route
+    const note = "app.post('/api/in-string', handler)";
+    const pattern = /[})]+/g;
+    res.json({ id: req.params.id, note, pattern });
+  });
+
+  app.get("/api/items/export", (req, res) => {
+    res.send(`items ${req.query.q ? `for ${req.query.q}` : "all"} }`);
+  });
+
+  app.post('/api/items', (req, res) => { res.sendStatus(201); });
+
+  app.post("/API/items/", (req, res) => { res.sendStatus(201); });
+
+  app.get("/api/users/:userId", (req, res) => { res.json({ user: 1 }); });
+
+  app.get("/api/users/:id", (req, res) => { res.json({ user: 2 }); });
+
+  app.get(`/api/dynamic/${"x"}`, (req, res) => res.end());
+}
+'''
+
+
+def test_scan_skips_comments_strings_templates_and_regexes():
+    routes = scan_routes(FIXTURE)
+    assert [(r['method'], r['path']) for r in routes] == [
+        ('get', '/api/items/:id'),
+        ('get', '/api/items/export'),
+        ('post', '/api/items'),
+        ('post', '/API/items/'),
+        ('get', '/api/users/:userId'),
+        ('get', '/api/users/:id'),
+        ('get', None),
+    ]
+    assert [r['line'] for r in routes[:3]] == [4, 11, 15]
+
+
+def test_duplicates_and_shadowed_routes():
+    duplicates, shadowed = find_duplicates(scan_routes(FIXTURE))
+    assert [(d['kind'], d['method'], d['path'], d['first']['line']) for d in duplicates] == [
+        ('exact', 'POST', '/API/items/', 15),
+        ('duplicate', 'GET', '/api/users/:id', 19),
+    ]
+    assert [(s['path'], s['first']['path']) for s in shadowed] == [('/api/items/export', '/api/items/:id')]
+
+
+def test_normalize_path():
+    assert normalize_path('/API//Items/:itemId/') == '/api/items/:'
+    assert normalize_path('/') == '/'
+
+
+def test_shadows():
+    assert shadows('/api/items/:', '/api/items/export')
+    assert not shadows('/api/items/:', '/api/items/:')
+    assert not shadows('/api/items/:', '/api/items/export/csv')
+    assert shadows('/api/*', '/api/items/export/csv')
+
+
+def test_duplicates_are_cut_out(tmp_path):
+    source = tmp_path / 'routes.ts'
+    source.write_text(FIXTURE, encoding='utf-8')
+    report = deduplicate_routes(str(source), str(source))
+    cleaned = source.read_text(encoding='utf-8')
+    assert report['written'] and report['dynamic_paths'] == 1
+    assert 'app.post("/API/items/"' not in cleaned
+    assert 'res.json({ user: 2 })' not in cleaned
+    assert find_duplicates(scan_routes(cleaned))[0] == []
+
+
+def test_check_mode_writes_nothing(tmp_path):
+    source = tmp_path / 'routes.ts'
+    source.write_text(FIXTURE, encoding='utf-8')
+    report = deduplicate_routes(str(source), str(source), check=True)
+    assert len(report['duplicates']) == 2 and not report['written']
+    assert source.read_text(encoding='utf-8') == FIXTURE
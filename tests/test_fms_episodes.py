@@ -0,0 +1,103 @@
+import pandas as pd
+
+from fms_episodes import alert_arrays, context_days, detect, RULES
+
+WINDOW = [{'rule': 'window', 'count': 3, 'hours': 2}]
+SHIFT = [{'rule': 'shift', 'count': 5}]
+CONSECUTIVE = [{'rule': 'consecutive_shifts', 'shifts': 3}]
+
+
+def alerts(*rows):
+    """Alerts frame as load_alerts() returns it, from (vehicle, 'YYYY-MM-DD HH:MM:SS', opr_date, shift) tuples."""
+    return pd.DataFrame(
+        [(vehicle, at[:10], at[11:], opr_date, shift) for vehicle, at, opr_date, shift in rows],
+        columns=['vehicle_no', 'alert_date', 'alert_time', 'opr_date', 'shift'],
+    )
+
+
+def episodes(df, rules):
+    return detect(alert_arrays(df), rules)
+
+
+def test_window_includes_an_alert_exactly_at_its_end():
+    df = alerts(('DT-1', '2025-01-01 10:00:00', '2025-01-01', 'Shift 1'),
+                ('DT-1', '2025-01-01 11:00:00', '2025-01-01', 'Shift 1'),
+                ('DT-1', '2025-01-01 12:00:00', '2025-01-01', 'Shift 1'))
+    found = episodes(df, WINDOW)
+    assert found[['rule', 'vehicle_no', 'alert_count']].values.tolist() == [['window_3_in_2h', 'DT-1', 3]]
+    assert str(found['started_at'][0]) == '2025-01-01 10:00:00'
+    assert str(found['ended_at'][0]) == '2025-01-01 12:00:00'
+
+
+def test_window_misses_an_alert_one_second_late():
+    df = alerts(('DT-1', '2025-01-01 10:00:00', '2025-01-01', 'Shift 1'),
+                ('DT-1', '2025-01-01 11:00:00', '2025-01-01', 'Shift 1'),
+                ('DT-1', '2025-01-01 12:00:01', '2025-01-01', 'Shift 1'))
+    assert episodes(df, WINDOW).empty
+
+
+def test_windows_never_span_two_vehicles():
+    df = alerts(('DT-1', '2025-01-01 10:00:00', '2025-01-01', 'Shift 1'),
+                ('DT-1', '2025-01-01 10:30:00', '2025-01-01', 'Shift 1'),
+                ('DT-2 ', '2025-01-01 10:45:00', '2025-01-01', 'Shift 1'))
+    assert episodes(df, WINDOW).empty
+
+
+def test_overlapping_windows_merge_into_one_episode():
+    times = ['10:00:00', '11:00:00', '12:00:00', '13:00:00']
+    df = alerts(*[('DT-1', f'2025-01-01 {t}', '2025-01-01', 'Shift 1') for t in times])
+    found = episodes(df, WINDOW)
+    assert found['alert_count'].tolist() == [4]
+    assert str(found['ended_at'][0]) == '2025-01-01 13:00:00'
+
+
+def test_night_shift_counts_alerts_past_midnight_by_opr_date():
+    times = ['2025-01-01 19:00:00', '2025-01-01 21:00:00', '2025-01-01 23:30:00',
+             '2025-01-02 01:00:00', '2025-01-02 04:00:00']
+    df = alerts(*[('DT-1', t, '2025-01-01', 'Shift 2') for t in times])
+    found = episodes(df, SHIFT)
+    assert found[['rule', 'alert_count', 'shift_count']].values.tolist() == [['shift_5', 5, 1]]
+    assert str(found['ended_at'][0]) == '2025-01-02 04:00:00'
+
+
+def test_shift_below_count_is_not_flagged():
+    times = ['06:00:00', '08:00:00', '10:00:00', '12:00:00']
+    df = alerts(*[('DT-1', f'2025-01-01 {t}', '2025-01-01', 'Shift 1') for t in times],
+                ('DT-1', '2025-01-01 19:00:00', '2025-01-01', 'Shift 2'))
+    assert episodes(df, SHIFT).empty
+
+
+def test_consecutive_shifts_chain_across_the_operating_day():
+    df = alerts(('DT-1', '2025-01-01 08:00:00', '2025-01-01', 'Shift 1'),
+                ('DT-1', '2025-01-01 20:00:00', '2025-01-01', 'Shift 2'),
+                ('DT-1', '2025-01-02 09:00:00', '2025-01-02', 'shift  1'))
+    found = episodes(df, CONSECUTIVE)
+    assert found[['rule', 'alert_count', 'shift_count']].values.tolist() == [['consecutive_shifts_3', 3, 3]]
+
+
+def test_a_shift_without_alerts_breaks_the_chain():
+    df = alerts(('DT-1', '2025-01-01 08:00:00', '2025-01-01', 'Shift 1'),
+                ('DT-1', '2025-01-01 20:00:00', '2025-01-01', 'Shift 2'),
+                ('DT-1', '2025-01-02 20:00:00', '2025-01-02', 'Shift 2'))
+    assert episodes(df, CONSECUTIVE).empty
+
+
+def test_unknown_shift_labels_are_left_out_of_shift_rules():
+    times = ['06:00:00', '08:00:00', '10:00:00', '12:00:00', '14:00:00']
+    df = alerts(*[('DT-1', f'2025-01-01 {t}', '2025-01-01', 'Day') for t in times])
+    assert episodes(df, SHIFT + CONSECUTIVE).empty
+
+
+def test_alerts_at_the_same_second_are_ordered_by_shift():
+    # Two alerts at one timestamp but of different shifts: the order they are loaded in must not matter
+    rows = [('DT-1', f'2025-01-01 {t}', '2025-01-01', 'Shift 1') for t in ['06:00:00', '07:00:00', '08:00:00', '09:00:00']]
+    rows += [('DT-1', '2025-01-01 10:00:00', '2025-01-01', 'Shift 1'),
+             ('DT-1', '2025-01-01 10:00:00', '2024-12-31', 'Shift 2')]
+    first = episodes(alerts(*rows), SHIFT)
+    second = episodes(alerts(*rows[::-1]), SHIFT)
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_context_days_covers_the_longest_rule():
+    assert context_days(RULES) >= 2
+    assert context_days([{'rule': 'window', 'count': 3, 'hours': 50}]) >= 3
@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+from fms_geo import geohash, parse_coordinates
+
+
+@pytest.mark.parametrize('lat, lon, precision, expected', [
+    # Reference values from the geohash.org / Wikipedia examples
+    (57.64911, 10.40744, 11, 'u4pruydqqvj'),
+    (42.6, -5.6, 5, 'ezs42'),
+    (0.0, 0.0, 8, 's0000000'),
+    (-90.0, -180.0, 5, '00000'),
+    # The upper bounds fall in the last cell
+    (90.0, 180.0, 5, 'zzzzz'),
+])
+def test_geohash_reference_values(lat, lon, precision, expected):
+    assert geohash(pd.Series([lat]), pd.Series([lon]), precision).tolist() == [expected]
+
+
+def test_geohash_prefix_is_the_coarser_cell():
+    lat, lon = pd.Series([-2.495232]), pd.Series([115.619499])
+    full = geohash(lat, lon)[0]
+    assert len(full) == 9
+    assert geohash(lat, lon, 6)[0] == full[:6]
+
+
+def test_geohash_of_missing_position_is_missing():
+    hashes = geohash(pd.Series([1.0, None]), pd.Series([None, 1.0]))
+    assert hashes.isna().all()
+
+
+def test_parse_coordinates():
+    col = pd.Series(['-2.495232, 115.619499', '(1.5;2)', '3 4', '91, 0', 'Pit B', None])
+    lat, lon = parse_coordinates(col)
+    assert lat[:3].tolist() == [-2.495232, 1.5, 3.0]
+    assert lon[:3].tolist() == [115.619499, 2.0, 4.0]
+    # Out of range, unparseable and missing
+    assert lat[3:].isna().all() and lon[3:].isna().all()
@@ -0,0 +1,69 @@
+import os
+
+import pandas as pd
+import pytest
+
+from fms_headers import compile_aliases, resolve_headers, select_columns
+
+DUMMY_XLSX = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dummy_fatigue.xlsx')
+
+
+def test_dummy_export_headers_map_to_columns():
+    headers = pd.read_excel(DUMMY_XLSX, nrows=0).columns
+    resolution = resolve_headers(headers)
+    assert resolution.columns == {
+        'alert_date': 'Date',
+        'alert_time': 'Time',
+        'vehicle_no': 'Vehicle No',
+        'company': 'Company',
+        'violation': 'Violation',
+        'location': 'Location',
+        'opr_date': 'Date Opr',
+        'shift': 'Shift',
+        'week': 'Week',
+        'month': 'Month',
+        'coordinate': 'Coordinate',
+        'level': 'Level',
+        'validation_status': 'validation_status',
+        'validated_by': 'validated_by',
+        'validated_at': 'validated_at',
+    }
+    assert resolution.duplicates == []
+    assert resolution.unknown == []
+
+
+def test_indonesian_headers_match_case_and_spacing_insensitively():
+    resolution = resolve_headers(['TANGGAL', ' waktu ', 'No_Lambung', 'Jenis  Pelanggaran', 'Catatan'])
+    assert resolution.columns == {
+        'alert_date': 'TANGGAL',
+        'alert_time': ' waktu ',
+        'vehicle_no': 'No_Lambung',
+        'violation': 'Jenis  Pelanggaran',
+    }
+    assert resolution.unknown == ['Catatan']
+
+
+def test_highest_priority_header_wins():
+    # 'Pengawas FMS' outranks 'validated_by' even when it comes later
+    resolution = resolve_headers(['validated_by', 'Pengawas FMS'])
+    assert resolution.columns == {'validated_by': 'Pengawas FMS'}
+    assert resolution.duplicates == [('validated_by', 'validated_by')]
+
+
+def test_repeated_header_ranks_after_the_original():
+    resolution = resolve_headers(['Date.1', 'Date'])
+    assert resolution.columns == {'alert_date': 'Date'}
+    assert resolution.duplicates == [('Date.1', 'alert_date')]
+
+
+def test_alias_listed_for_two_columns_is_rejected():
+    with pytest.raises(ValueError):
+        compile_aliases({'alert_date': ['Date'], 'opr_date': ['date']})
+
+
+def test_select_columns_renames_and_fills_missing():
+    df = pd.DataFrame({'Tanggal': ['2025-01-01'], 'Shift': ['Shift 1']})
+    out = select_columns(df, resolve_headers(df.columns), ['alert_date', 'alert_time', 'shift'])
+    assert list(out.columns) == ['alert_date', 'alert_time', 'shift']
+    assert out.iloc[0].tolist()[0] == '2025-01-01'
+    assert pd.isna(out.iloc[0]['alert_time'])
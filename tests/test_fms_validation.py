@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+
+from fms_validation import reason_counts, validate
+
+DATE_COLS = ['alert_date', 'opr_date', 'validated_at']
+
+
+def chunk(**overrides):
+    """One valid mapped row, with `overrides` applied, plus the derived columns validate() reads."""
+    row = {
+        'alert_date': '2025-01-16',
+        'alert_time': '17:38:41',
+        'vehicle_no': 'HD-389',
+        'opr_date': '2025-01-16',
+        'validated_at': '2025-01-16 17:45:00',
+        'shift': 'Shift 1',
+        'level': '2',
+        'sla_delay': 379,
+    }
+    row.update(overrides)
+    raw = pd.DataFrame([row])
+    df = raw.drop(columns='sla_delay')
+    for col in DATE_COLS:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    derived = {
+        'raw_present': {col: raw[col].notna() for col in DATE_COLS},
+        'alert_offset': pd.to_datetime(raw['alert_time'], format='%H:%M:%S', errors='coerce'),
+        'sla_delay': raw['sla_delay'],
+    }
+    return df, derived
+
+
+def test_valid_row_is_accepted():
+    warnings = {}
+    accepted, rejected = validate(*chunk(), warnings=warnings)
+    assert len(accepted) == 1
+    assert rejected.empty
+    assert warnings == {}
+
+
+@pytest.mark.parametrize('overrides, reason', [
+    ({'alert_date': None}, 'required:alert_date'),
+    ({'alert_time': None}, 'required:alert_time'),
+    ({'vehicle_no': None}, 'required:vehicle_no'),
+    ({'opr_date': 'not a date'}, 'date_format:opr_date'),
+    ({'validated_at': '2025-13-45'}, 'date_format:validated_at'),
+    ({'alert_time': '25:61'}, 'time_format:alert_time'),
+    ({'sla_delay': -301}, 'range:sla_delay'),
+    ({'sla_delay': 30 * 86400 + 1}, 'range:sla_delay'),
+    ({'level': '6'}, 'range:level'),
+    ({'level': 'High'}, 'range:level'),
+])
+def test_rejecting_rules(overrides, reason):
+    accepted, rejected = validate(*chunk(**overrides))
+    assert accepted.empty
+    assert rejected['reasons'].tolist() == [reason]
+
+
+def test_tolerated_clock_skew_is_accepted():
+    accepted, _ = validate(*chunk(sla_delay=-300))
+    assert len(accepted) == 1
+
+
+def test_unknown_shift_only_warns():
+    warnings = {}
+    accepted, rejected = validate(*chunk(shift='Day'), warnings=warnings)
+    assert len(accepted) == 1
+    assert rejected.empty
+    assert warnings == {'allowed:shift': 1}
+
+
+def test_shift_labels_match_case_and_spacing_insensitively():
+    warnings = {}
+    validate(*chunk(shift='  SHIFT   2 '), warnings=warnings)
+    assert warnings == {}
+
+
+def test_rejected_rows_are_not_counted_as_warnings():
+    warnings = {}
+    _, rejected = validate(*chunk(shift='Day', vehicle_no=''), warnings=warnings)
+    assert rejected['reasons'].tolist() == ['required:vehicle_no']
+    assert warnings == {}
+
+
+def test_reasons_list_every_failing_rule():
+    _, rejected = validate(*chunk(alert_date=None, level='0'))
+    assert reason_counts(rejected) == {'required:alert_date': 1, 'range:level': 1}
+